@@ -12,10 +12,12 @@ from geopy.geocoders import Nominatim
 from geopy.distance import geodesic
 import folium
 import requests
-import re
 from IPython.display import display
 from datetime import datetime, timedelta
 
+import horaires
+from villes import clean_city_name
+
 # --- Connexion à la base de données ---
 # !!! ATTENTION : Modifiez ce chemin si nécessaire !!!
 db_path = "/content/drive/MyDrive/Colab Notebook/SNCF/tgvmax.db"
@@ -23,6 +25,9 @@ try:
     conn = sqlite3.connect(db_path)
     cur = conn.cursor()
     print("✅ Connexion à la base de données réussie.")
+    if not horaires.schema_normalise_present(conn):
+        print("⏳ Construction du schéma horaire normalisé (une seule fois)...")
+        horaires.construire_schema_normalise(conn)
 except Exception as e:
     print(f"❌ Erreur de connexion à la base de données : {e}")
     print("Veuillez vérifier que le chemin d'accès est correct et que votre Drive est monté.")
@@ -34,19 +39,6 @@ geolocator = Nominatim(user_agent="mon_appli_itineraire_v2", timeout=10)
 # BLOC 2 : FONCTIONS UTILITAIRES (HELPERS)
 # ==============================================================================
 
-def clean_city_name(city_name):
-    """Nettoie le nom d'une ville en supprimant les mentions comme '(intramuros)' et les gares."""
-    if not isinstance(city_name, str):
-        return ""
-    # Remove "(intramuros)" and any leading/trailing whitespace
-    cleaned_name = re.sub(r'\s*\([^)]*\)$', '', city_name).strip()
-    # Remove common station names like "MATABIAU", "ST JEAN", "VILLE BOURBON", "ST CHARLES", "PART DIEU", etc.
-    cleaned_name = re.sub(r'\s*(ST JEAN|MATABIAU|VILLE BOURBON|ST CHARLES|PART DIEU|SAINT LAUD|MONTPARNASSE|EST|NORD|LYON|AUSTERLITZ)\s*$', '', cleaned_name, flags=re.IGNORECASE).strip()
-    # Specifically handle "TOULOUSE MATABIAU"
-    if cleaned_name.lower() == "toulouse":
-        return "TOULOUSE" # Or "TOULOUSE MATABIAU" depending on how the database is structured
-    return cleaned_name
-
 def estimer_temps_visite(tags):
     """Estime le temps de visite en minutes basé sur les tags OSM."""
     if tags.get('tourism') == 'museum' or tags.get('historic') == 'castle':
@@ -79,18 +71,7 @@ def calculer_temps_trajet_a_pied(coords1, coords2, vitesse_kmh=4.5):
 
 def trouver_destinations_par_temps(ville_depart, temps_trajet_max_str):
     """Trouve les villes accessibles depuis une ville de départ dans un temps de trajet donné."""
-    pattern = f"%{clean_city_name(ville_depart)}%"
-    sql = """
-    SELECT Origine, Destination,
-           strftime('%H:%M:%S', (julianday(Heure_arrivee) - julianday(Heure_depart)) * 86400, 'unixepoch') AS duree,
-           TIME(Heure_depart) AS heure_depart,
-           TIME(Heure_arrivee) AS heure_arrivee
-    FROM tgvmax_trajets
-    WHERE LOWER(Origine) LIKE LOWER(?) AND duree > '00:00:00' AND duree <= ?
-    ORDER BY duree
-    """
-    cur.execute(sql, (pattern, temps_trajet_max_str))
-    return cur.fetchall()
+    return horaires.trouver_destinations_par_temps(cur, ville_depart, temps_trajet_max_str)
 
 def get_lieux_touristiques(nom_ville):
     """Récupère les lieux touristiques d'une ville via Overpass API."""
@@ -170,20 +151,7 @@ def trouver_train_ideal(ville_depart, ville_arrivee, heure_min_depart_str):
     Trouve le premier train disponible après une heure donnée pour un trajet direct.
     Retourne un tuple (origine, destination, duree, heure_depart, heure_arrivee) ou None.
     """
-    pattern_dep = f"%{clean_city_name(ville_depart)}%"
-    pattern_arr = f"%{clean_city_name(ville_arrivee)}%"
-    sql = """
-    SELECT Origine, Destination,
-           strftime('%H:%M:%S', (julianday(Heure_arrivee) - julianday(Heure_depart)) * 86400, 'unixepoch') AS duree,
-           TIME(Heure_depart) AS heure_depart,
-           TIME(Heure_arrivee) AS heure_arrivee
-    FROM tgvmax_trajets
-    WHERE LOWER(Origine) LIKE LOWER(?) AND LOWER(Destination) LIKE LOWER(?) AND TIME(Heure_depart) >= ?
-    ORDER BY TIME(Heure_depart) ASC
-    LIMIT 1
-    """
-    cur.execute(sql, (pattern_dep, pattern_arr, heure_min_depart_str))
-    return cur.fetchone()
+    return horaires.trouver_train_ideal(cur, ville_depart, ville_arrivee, heure_min_depart_str)
 
 
 def generer_carte_recommandation(ville_depart, destinations, itineraire_choisi, ville_choisie, geolocator):
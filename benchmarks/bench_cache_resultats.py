@@ -0,0 +1,90 @@
+"""
+Cache des recherches devant un calcul simulé (attente fixe) : charge concurrente à
+popularité très inégale (loi de Zipf, comme les exemples de l'interface), puis rafale
+de requêtes identiques simultanées.
+
+Usage : python benchmarks/bench_cache_resultats.py [nb_requetes] [duree_calcul_s] [taille_max]
+"""
+
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cache_resultats import CacheResultats
+
+NB_CLES = 200
+NB_THREADS = 16
+
+
+def main(nb_requetes=2000, duree_calcul_s=0.05, taille_max=64):
+    rng = random.Random(3)
+    poids = [1 / rang for rang in range(1, NB_CLES + 1)]
+    requetes = rng.choices(range(NB_CLES), weights=poids, k=nb_requetes)
+    nb_calculs, verrou = 0, threading.Lock()
+
+    def calculer(cle):
+        nonlocal nb_calculs
+        with verrou:
+            nb_calculs += 1
+        time.sleep(duree_calcul_s)
+        return f"résultat {cle}"
+
+    with ThreadPoolExecutor(NB_THREADS) as pool:
+        debut = time.perf_counter()
+        list(pool.map(calculer, requetes))
+        t_sans_cache, calculs_sans_cache = time.perf_counter() - debut, nb_calculs
+
+        cache, nb_calculs = CacheResultats(taille_max=taille_max, ttl_s=3600), 0
+        debut = time.perf_counter()
+        resultats = list(pool.map(lambda cle: cache.obtenir(cle, lambda: calculer(cle)), requetes))
+        t_cache = time.perf_counter() - debut
+    assert resultats == [f"résultat {cle}" for cle in requetes]
+    stats = cache.statistiques()
+    print(f"{nb_requetes} requêtes sur {NB_CLES} clés (Zipf), {NB_THREADS} threads, calcul {duree_calcul_s * 1000:.0f} ms, "
+          f"cache de {taille_max} entrées")
+    print(f"  sans cache : {calculs_sans_cache} calculs, {t_sans_cache:.2f} s")
+    print(f"  avec cache : {nb_calculs} calculs, {t_cache:.2f} s  (taux de succès {stats['taux_succes']:.0%}, "
+          f"{stats['regroupees']} regroupées, {stats['evictions_taille']} évictions)")
+
+    # Rafale : 32 clics simultanés sur le même exemple, un seul calcul.
+    cache, nb_calculs = CacheResultats(), 0
+    with ThreadPoolExecutor(32) as pool:
+        list(pool.map(lambda _: cache.obtenir("NICE", lambda: calculer("NICE")), range(32)))
+    print(f"  rafale de 32 requêtes identiques : {nb_calculs} calcul, {cache.statistiques()['regroupees']} regroupées")
+
+    # Calcul en flux abandonné par son demandeur (client déconnecté) : l'appel regroupé sur lui le reprend.
+    cache, nb_calculs = CacheResultats(), 0
+    demarre = threading.Event()
+
+    def etapes():
+        demarre.set()
+        yield "provisoire"
+        yield calculer("NICE")
+
+    premier = cache.obtenir_en_flux("NICE", etapes)
+    next(premier)
+    resultat = []
+    second = threading.Thread(target=lambda: resultat.extend(cache.obtenir_en_flux("NICE", etapes)))
+    second.start()
+    while cache.statistiques()['regroupees'] < 1:
+        time.sleep(0.001)
+    premier.close()
+    second.join()
+    assert resultat[-1] == "résultat NICE", resultat
+    print(f"  demandeur déconnecté : la requête regroupée reprend le calcul ({resultat[-1]!r}, {nb_calculs} calcul)")
+
+    # Expiration.
+    cache = CacheResultats(ttl_s=0.05)
+    cache.obtenir("NICE", lambda: "v1")
+    time.sleep(0.06)
+    cache.obtenir("NICE", lambda: "v2")
+    print(f"  TTL 50 ms : {cache.statistiques()['evictions_ttl']} entrée expirée et recalculée")
+
+
+if __name__ == "__main__":
+    main(*(float(x) if i == 1 else int(x) for i, x in enumerate(sys.argv[1:4])))
@@ -0,0 +1,73 @@
+"""
+Carte de résultat : taille du HTML et temps de génération (construction puis rendu, comme le fait
+`gradio_folium` à chaque réponse) selon le mode de `carte.py`, pour 200 destinations et 50 étapes.
+
+"marqueurs" reproduit le rendu historique (carte de base reconstruite, un Marker par point) ;
+les autres modes copient la carte de base gardée par `CartesDeBase`.
+
+Usage : python benchmarks/bench_carte.py [nb_destinations] [nb_etapes] [nb_repetitions]
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import folium
+
+import carte
+from benchmarks.bench_marche import generer_lieux
+
+
+def generer_destinations(nb, graine=5):
+    rng = random.Random(graine)
+    return [(rng.uniform(43.0, 49.0), rng.uniform(-1.0, 7.0),
+             carte.popup_destination(f"GARE SYNTHETIQUE {i:04d}", f"0{rng.randint(0, 2)}:{rng.randint(10, 59)}:00"))
+            for i in range(nb)]
+
+
+def construire_base():
+    m = folium.Map(location=[44.5, 0.17], zoom_start=7)
+    folium.Marker(location=[44.5, 0.17], popup="<b>Départ : MARMANDE</b>",
+                  icon=folium.Icon(color='red', icon='train', prefix='fa')).add_to(m)
+    return m
+
+
+def generer_carte(mode, bases, destinations, etapes):
+    m = construire_base() if mode == "marqueurs" else bases.obtenir('marmande', construire_base)
+    carte.ajouter_points(m, destinations, 'destination', mode)
+    carte.ajouter_points(m, etapes, 'etape', mode)
+    return m
+
+
+def main(nb_destinations=200, nb_etapes=50, nb_repetitions=10):
+    destinations = generer_destinations(nb_destinations)
+    lieux = generer_lieux(nb_etapes, graine=2)
+    for lieu in lieux[1:]:
+        lieu.trajet_depuis_precedent = 7
+    etapes = [(lieu.latitude, lieu.longitude, carte.popup_etape(i + 1, lieu)) for i, lieu in enumerate(lieux)]
+
+    print(f"{nb_destinations} destinations, {nb_etapes} étapes, moyenne sur {nb_repetitions} cartes")
+    reference = None
+    for mode in ("marqueurs", "geojson", "cluster"):
+        bases = carte.CartesDeBase()
+        t_construction = t_rendu = 0.0
+        for _ in range(nb_repetitions):
+            debut = time.perf_counter()
+            m = generer_carte(mode, bases, destinations, etapes)
+            t_construction += time.perf_counter() - debut
+            debut = time.perf_counter()
+            page = m.get_root().render()
+            t_rendu += time.perf_counter() - debut
+        octets = len(page.encode())
+        total = (t_construction + t_rendu) * 1000 / nb_repetitions
+        reference = reference or (octets, total)
+        print(f"  {mode:9s} : {octets / 1024:7.1f} Kio ({octets / reference[0]:4.0%}), construction "
+              f"{t_construction * 1000 / nb_repetitions:6.1f} ms + rendu {t_rendu * 1000 / nb_repetitions:6.1f} ms "
+              f"= {total:6.1f} ms ({reference[1] / total:4.1f}x)")
+
+
+if __name__ == "__main__":
+    main(*(int(x) for x in sys.argv[1:4]))
@@ -0,0 +1,85 @@
+"""
+Classement des destinations : évaluation exhaustive (`classement.classer_en_parallele` sans
+élagage possible) contre top K avec élagage par borne.
+
+Chaque évaluation simule l'appel Overpass par une attente, puis calcule l'itinéraire
+optimisé ; les scores sont figés au premier calcul pour que les deux méthodes comparent
+exactement les mêmes valeurs. Enfin, les lieux sont chargés par lots à la demande
+(`classement.ChargeurParLots`) : villes demandées à Overpass contre toutes avant l'élagage.
+
+Usage : python benchmarks/bench_classement.py [nb_villes] [latence_s] [heures_sur_place]
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_marche import generer_lieux
+from classement import TOP_K, ChargeurParLots, borne_score, classer_en_parallele, ordre_evaluation, resumer_lieux
+from itineraire import optimiser_itineraire
+from lieux import TAILLE_LOT
+
+
+def generer_villes(nb_villes, graine=7):
+    """Villes au nombre de lieux très variable (quelques-unes n'en ont aucun, quelques grandes villes)."""
+    rng = random.Random(graine)
+    return [(f"VILLE {i:03d}", generer_lieux(min(600, int(rng.lognormvariate(2.0, 1.3))), graine=i))
+            for i in range(nb_villes)]
+
+
+def main(nb_villes=150, latence_s=0.05, heures_sur_place=5.0):
+    temps_sur_place = int(heures_sur_place * 60)
+    villes = generer_villes(nb_villes)
+    scores = {}
+    for nom, lieux in villes:
+        itineraire, _ = optimiser_itineraire(lieux, temps_sur_place) if lieux else ([], 0)
+        scores[nom] = (len(itineraire), itineraire) if lieux else None
+    nb_evaluations = 0
+
+    def evaluer(ville):
+        nonlocal nb_evaluations
+        nb_evaluations += 1
+        time.sleep(latence_s)
+        return scores[ville[0]]
+
+    debut = time.perf_counter()
+    # Un top de toutes les villes, bornes égales : rien ne peut être écarté.
+    tous, _ = classer_en_parallele(villes, evaluer, [temps_sur_place] * nb_villes, k=nb_villes)
+    t_exhaustif, evaluations_exhaustif = time.perf_counter() - debut, nb_evaluations
+    attendu = [(score, ville[0]) for score, ville, _ in tous[:TOP_K]]
+
+    nb_evaluations = 0
+    debut = time.perf_counter()
+    bornes = [borne_score(resumer_lieux(lieux), temps_sur_place) for _, lieux in villes]
+    top, nb_elagues = classer_en_parallele(villes, evaluer, bornes)
+    t_elagage = time.perf_counter() - debut
+
+    # Lots à la demande, bornes tirées des résumés (villes déjà vues) : seules les villes qui arrivent à
+    # l'évaluation et la fin de leur lot sont demandées.
+    lieux_par_nom, demandes = dict(villes), []
+
+    def charger_lot(noms):
+        demandes.append(len(noms))
+        time.sleep(latence_s)
+        return {nom: lieux_par_nom[nom] for nom in noms}
+
+    lots = ChargeurParLots((villes[i][0] for i in ordre_evaluation(bornes)), charger_lot, TAILLE_LOT)
+    debut = time.perf_counter()
+    top_lots, _ = classer_en_parallele(villes, lambda ville: (lots.obtenir(ville[0]), scores[ville[0]])[1], bornes)
+    t_lots = time.perf_counter() - debut
+    assert top_lots == top
+
+    assert [(score, ville[0]) for score, ville, _ in top] == attendu
+    print(f"{nb_villes} villes, {heures_sur_place:g} h sur place, latence simulée {latence_s * 1000:.0f} ms, top {TOP_K}")
+    print(f"  exhaustif : {evaluations_exhaustif:4d} évaluations, {t_exhaustif:6.2f} s")
+    print(f"  élagage   : {nb_evaluations:4d} évaluations, {t_elagage:6.2f} s  ({nb_elagues} villes écartées, "
+          f"même top {TOP_K} : {', '.join(f'{ville[0]} ({score})' for score, ville, _ in top)})")
+    print(f"  lots à la demande : {sum(demandes):4d} villes en {len(demandes)} requêtes (contre {nb_villes} avant "
+          f"l'élagage), {t_lots:6.2f} s, même top {TOP_K}")
+
+
+if __name__ == "__main__":
+    main(*(float(x) if i else int(x) for i, x in enumerate(sys.argv[1:4])))
@@ -0,0 +1,114 @@
+"""
+Client HTTP partagé face au serveur Overpass local : réutilisation des connexions,
+compression, reprises sur pannes injectées, délais bornés et disjoncteur.
+
+Usage : python benchmarks/bench_client_http.py [nb_requetes]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+
+import collecte
+from benchmarks.serveurs_stub import ServeurStub
+from client_http import CircuitOuvert, ClientHTTP, DelaiDepasse
+from lieux import requete_overpass
+
+BBOX = (43.65, 43.75, 7.2, 7.3)
+
+
+def _chronometrer(appels):
+    debut = time.perf_counter()
+    resultats = [appel() for appel in appels]
+    return time.perf_counter() - debut, resultats
+
+
+def main(nb_requetes=200):
+    collecte.DEBITS_PAR_HOTE['127.0.0.1'] = 10000.0
+    params = {'data': requete_overpass(BBOX)}
+    with ServeurStub(nb_elements=80) as stub:
+        url = stub.url_overpass
+
+        # 1. requests.get nu (une connexion par appel, sans compression) contre le client partagé.
+        stub.nb_connexions = stub.octets_envoyes = 0
+        t_nu, nus = _chronometrer([lambda: requests.get(url, params=params, timeout=30,
+                                                        headers={'Accept-Encoding': 'identity'})] * nb_requetes)
+        connexions_nu, octets_nu = stub.nb_connexions, stub.octets_envoyes
+        partage = ClientHTTP()
+        stub.nb_connexions = stub.octets_envoyes = 0
+        t_client, reponses = _chronometrer([lambda: partage.get(url, params=params)] * nb_requetes)
+        connexions_client, octets_client = stub.nb_connexions, stub.octets_envoyes
+        assert all(r.json() == n.json() for r, n in zip(reponses, nus))
+        print(f"{nb_requetes} requêtes Overpass locales")
+        print(f"  requests.get nu  : {t_nu * 1000 / nb_requetes:5.2f} ms/req, {connexions_nu} connexions, "
+              f"{octets_nu / nb_requetes / 1024:5.1f} Kio/réponse")
+        print(f"  client partagé   : {t_client * 1000 / nb_requetes:5.2f} ms/req, {connexions_client} connexion(s), "
+              f"{octets_client / nb_requetes / 1024:5.1f} Kio/réponse (gzip)")
+
+        # 2. Reprises : 429 (Retry-After), 504, puis connexion coupée ; le 4e essai réussit.
+        client = ClientHTTP(attente_initiale_s=0.05)
+        stub.injecter(429, 504, "coupure")
+        debut = time.perf_counter()
+        reponse = client.get(url, params=params)
+        stats = client.statistiques()[stub.domaine_nominatim]
+        print(f"  pannes 429/504/coupure : HTTP {reponse.status_code} après {stats['reprises']} reprises "
+              f"en {(time.perf_counter() - debut) * 1000:.0f} ms")
+
+        # 3. Délai borné : une réponse qui traîne 3 s n'immobilise pas l'appelant plus que son budget.
+        client = ClientHTTP(nb_essais=1)
+        stub.injecter(("lent", 3.0))
+        debut = time.perf_counter()
+        try:
+            client.get(url, params=params, timeout=0.5)
+        except requests.exceptions.Timeout:
+            pass
+        print(f"  réponse lente (3 s), budget 0.5 s : abandon après {(time.perf_counter() - debut) * 1000:.0f} ms")
+
+        # 4. Disjoncteur : amont en panne permanente ; après 5 échecs, les appels échouent sans réseau.
+        client = ClientHTTP(nb_essais=1, seuil_echecs=5, delai_reouverture_s=0.5)
+        stub.panne_permanente = 503
+        avant = stub.nb_requetes
+        durees = []
+        for _ in range(50):
+            debut = time.perf_counter()
+            try:
+                client.get(url, params=params)
+            except CircuitOuvert:
+                pass
+            durees.append(time.perf_counter() - debut)
+        print(f"  panne permanente : {stub.nb_requetes - avant} requêtes envoyées sur 50, "
+              f"rejet en {sorted(durees)[len(durees) // 2] * 1e6:.0f} µs (médiane)")
+        stub.panne_permanente = None
+        time.sleep(0.5)
+        reponse = client.get(url, params=params)
+        print(f"  après {client.delai_reouverture_s} s : essai HTTP {reponse.status_code}, "
+              f"disjoncteur {client.statistiques()[stub.domaine_nominatim]['disjoncteur']}")
+
+        # 5. Essai semi-ouvert sorti par un délai local : il est rendu, le disjoncteur ne reste pas semi-ouvert.
+        client = ClientHTTP(nb_essais=1, seuil_echecs=2, delai_reouverture_s=0.2)
+        stub.injecter(503, 503)
+        for _ in range(2):
+            client.get(url, params=params)
+        time.sleep(0.2)
+        for _ in range(2):
+            try:
+                client.get(url, params=params, timeout=1e-9)  # budget épuisé avant l'envoi : DelaiDepasse
+            except DelaiDepasse:
+                pass
+        reponse = client.get(url, params=params)
+        etat = client.statistiques()[stub.domaine_nominatim]['disjoncteur']
+        assert reponse.status_code == 200 and etat == "fermé", (reponse.status_code, etat)
+        print(f"  essai semi-ouvert en délai dépassé (x2) : appel suivant HTTP {reponse.status_code}, disjoncteur {etat}")
+
+    latences = partage.statistiques()[stub.domaine_nominatim]['latences']
+    print(f"  latences du client partagé : p50 {latences['p50_ms']:.0f} ms, p95 {latences['p95_ms']:.0f} ms, "
+          f"max {latences['max_ms']:.1f} ms")
+    print("   ", "  ".join(f"{seau}: {nb}" for seau, nb in latences['seaux'].items() if nb))
+
+
+if __name__ == "__main__":
+    main(*(int(x) for x in sys.argv[1:2]))
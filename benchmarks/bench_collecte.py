@@ -0,0 +1,52 @@
+"""
+Collecte des lieux touristiques de N villes : boucle séquentielle contre pool de threads
+limité en débit (celui de `classement.classer_en_parallele`, sans élagage) et requêtes
+groupées, face à un serveur Overpass local qui ajoute de la latence. Un way sur dix déborde
+de l'emprise de sa ville : les requêtes groupées doivent quand même le lui rendre.
+
+Usage : python benchmarks/bench_collecte.py [nb_villes] [latence_s] [debit_par_s]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import collecte
+from classement import classer_en_parallele
+from benchmarks.serveurs_stub import ServeurStub
+from lieux import lieux_dans_bbox, lieux_par_lot
+
+
+def main(nb_villes=30, latence_s=0.3, debit_par_s=20.0):
+    collecte.DEBITS_PAR_HOTE['127.0.0.1'] = debit_par_s
+    bboxes = [(43.0 + i * 0.2, 43.1 + i * 0.2, 1.0, 1.1) for i in range(nb_villes)]
+    with ServeurStub(latence_s=latence_s, nb_elements=80, debordement=0.1) as stub:
+        debut = time.perf_counter()
+        sequentiel = [lieux_dans_bbox(bbox, url=stub.url_overpass) for bbox in bboxes]
+        t_sequentiel = time.perf_counter() - debut
+
+        debut = time.perf_counter()
+        # Toutes les villes dans le top, bornes égales : aucune n'est écartée.
+        top, _ = classer_en_parallele(list(enumerate(bboxes)),
+                                      lambda ville: (0, lieux_dans_bbox(ville[1], url=stub.url_overpass)),
+                                      [0] * nb_villes, k=nb_villes)
+        parallele = [lieux for _, _, lieux in top]
+        t_parallele = time.perf_counter() - debut
+
+        debut = time.perf_counter()
+        avant = stub.nb_requetes
+        groupe = lieux_par_lot({i: bbox for i, bbox in enumerate(bboxes)}, url=stub.url_overpass)
+        t_groupe, requetes_groupe = time.perf_counter() - debut, stub.nb_requetes - avant
+
+    assert parallele == sequentiel
+    assert [groupe[i] for i in range(nb_villes)] == sequentiel
+    print(f"{nb_villes} villes, latence {latence_s * 1000:.0f} ms, limite {debit_par_s:.0f} req/s, {collecte.NB_WORKERS} threads")
+    print(f"  séquentiel          : {t_sequentiel:6.2f} s")
+    print(f"  parallèle           : {t_parallele:6.2f} s  (x{t_sequentiel / t_parallele:.1f}, résultats identiques)")
+    print(f"  requêtes groupées   : {t_groupe:6.2f} s  ({requetes_groupe} requêtes, résultats identiques)")
+
+
+if __name__ == "__main__":
+    main(*(float(x) if i else int(x) for i, x in enumerate(sys.argv[1:4])))
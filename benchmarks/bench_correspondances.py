@@ -0,0 +1,47 @@
+"""
+Temps d'un profil Connection Scan complet (toutes les gares atteignables en une journée)
+sur un réseau synthétique de taille nationale.
+
+Usage : python benchmarks/bench_correspondances.py [nb_connexions_par_jour] [nb_gares]
+"""
+
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import horaires
+from benchmarks.donnees_synthetiques import generer_tgvmax
+from correspondances import ReseauConnexions
+
+VILLES = ["BORDEAUX ST JEAN", "MARMANDE", "NICE", "PARIS", "MARSEILLE ST CHARLES"]
+
+
+def main(nb_connexions=20_000, nb_gares=300):
+    with tempfile.TemporaryDirectory() as dossier:
+        chemin = os.path.join(dossier, "tgvmax.db")
+        generer_tgvmax(chemin, nb_connexions, nb_gares)
+        conn = sqlite3.connect(chemin)
+        horaires.construire_schema_normalise(conn)
+        reseau = ReseauConnexions(conn)
+        conn.close()
+
+    print(f"Réseau : {len(reseau)} connexions, {len(reseau.noms)} gares\n")
+    print(f"{'départ':<22} {'trains max':>10} {'gares atteintes':>16} {'médiane (ms)':>13}")
+    for ville in VILLES:
+        for nb_trains in (1, 2, 3):
+            mesures = []
+            for _ in range(5):
+                debut = time.perf_counter()
+                arrivee, _ = reseau.scanner(reseau.stations_correspondantes(ville), 6 * 60, 10, nb_trains)
+                mesures.append((time.perf_counter() - debut) * 1000)
+            atteintes = sum(1 for g in range(len(reseau.noms)) if any(arrivee[k][g] < float('inf') for k in range(1, nb_trains + 1)))
+            print(f"{ville:<22} {nb_trains:>10} {atteintes:>16} {statistics.median(mesures):>13.1f}")
+
+
+if __name__ == "__main__":
+    main(*(int(x) for x in sys.argv[1:3]))
@@ -0,0 +1,81 @@
+"""
+Temps sur place de toutes les destinations directes (`horaires.fenetres_sur_place`, une requête,
+et son équivalent NumPy) contre deux requêtes par destination : premier aller par
+`trouver_train_ideal`, puis dernier retour. Compte aussi les villes candidates sans retour le
+jour même, dont la recherche de lieux est désormais évitée.
+
+Usage : python benchmarks/bench_fenetres.py [nb_trajets] [nb_stations]
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import horaires
+from benchmarks.donnees_synthetiques import generer_tgvmax
+from index_gares import IndexGares
+from moteur_numpy import MoteurHoraires
+
+RECHERCHES = [("MARMANDE", "08:00:00", "02:00:00"), ("NICE", "09:00:00", "01:30:00"),
+              ("BORDEAUX ST JEAN", "07:30:00", "02:00:00"), ("MARSEILLE ST CHARLES", "16:00:00", "01:45:00")]
+
+SQL_DERNIER_RETOUR = """
+SELECT MAX(depart_min) FROM trajets
+WHERE origine_id IN (SELECT value FROM json_each(?)) AND destination_id IN (SELECT value FROM json_each(?))
+  AND depart_min >= ? AND duree_min > 0
+"""
+
+
+def fenetres_une_par_une(cur, index, ville_depart, heure, destinations):
+    """Ancienne façon : deux allers-retours SQL par destination candidate."""
+    fenetres, gares_depart = {}, horaires.json.dumps(index.resoudre(ville_depart))
+    for destination in destinations:
+        aller = horaires.trouver_train_ideal(cur, ville_depart, destination, heure, index)
+        if aller is None:
+            continue
+        arrivee = horaires.heure_en_minutes(aller[3]) + horaires.heure_en_minutes(aller[2])
+        (retour,) = cur.execute(SQL_DERNIER_RETOUR, (horaires.json.dumps(index.resoudre(destination)), gares_depart,
+                                                      arrivee)).fetchone()
+        if retour is not None:
+            fenetres[destination] = retour - arrivee
+    return fenetres
+
+
+def chronometrer_ms(fonction, repetitions=20):
+    debut = time.perf_counter()
+    for _ in range(repetitions):
+        fonction()
+    return (time.perf_counter() - debut) * 1000 / repetitions
+
+
+def main(nb_trajets=300_000, nb_stations=300):
+    with tempfile.TemporaryDirectory() as dossier:
+        chemin = os.path.join(dossier, "tgvmax.db")
+        generer_tgvmax(chemin, nb_trajets, nb_stations)
+        conn = sqlite3.connect(chemin)
+        horaires.construire_schema_normalise(conn)
+        cur, index = conn.cursor(), IndexGares.depuis_base(conn)
+        moteur = MoteurHoraires(conn, index)
+        print(f"{nb_trajets} trajets, {nb_stations} gares")
+        print(f"  {'recherche':<40} {'candidates':>10} {'sans retour':>11} {'1 par 1 (ms)':>13} {'SQL (ms)':>9} {'NumPy (ms)':>10}")
+        for ville_depart, heure, temps_max in RECHERCHES:
+            candidates = {dest[1] for dest in horaires.trouver_destinations_par_temps(cur, ville_depart, temps_max, index)}
+            fenetres = horaires.fenetres_sur_place(cur, ville_depart, heure, index)
+            assert fenetres == moteur.fenetres_sur_place(ville_depart, heure)
+            anciennes = fenetres_une_par_une(cur, index, ville_depart, heure, sorted(candidates))
+            assert anciennes == {nom: fenetres[nom][2] for nom in candidates if nom in fenetres}
+            sans_retour = sum(1 for nom in candidates if fenetres.get(nom, (None, None, 0))[2] <= 0)
+            t_ancien = chronometrer_ms(lambda: fenetres_une_par_une(cur, index, ville_depart, heure, sorted(candidates)), 5)
+            t_sql = chronometrer_ms(lambda: horaires.fenetres_sur_place(cur, ville_depart, heure, index))
+            t_numpy = chronometrer_ms(lambda: moteur.fenetres_sur_place(ville_depart, heure))
+            print(f"  {ville_depart + ' ' + heure[:5] + ' ' + temps_max[:5]:<40} {len(candidates):>10} {sans_retour:>11} "
+                  f"{t_ancien:>13.1f} {t_sql:>9.2f} {t_numpy:>10.2f}")
+        conn.close()
+
+
+if __name__ == "__main__":
+    main(*(int(x) for x in sys.argv[1:3]))
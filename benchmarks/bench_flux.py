@@ -0,0 +1,67 @@
+"""
+Affichage progressif : délai avant le premier résultat utile (classement provisoire) avec
+`classement.classer_au_fil_de_l_eau`, contre le classement complet de `classer_en_parallele`
+qu'attendait l'interface avant d'afficher quoi que ce soit.
+
+Latence simulée par ville variable (lognormale autour de `latence_s`), comme les appels
+Overpass réels. Les étapes passent par `CacheResultats.obtenir_en_flux`, comme dans l'application.
+
+Usage : python benchmarks/bench_flux.py [nb_villes] [latence_s] [heures_sur_place]
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_classement import generer_villes
+from cache_resultats import CacheResultats
+from classement import borne_score, classer_au_fil_de_l_eau, classer_en_parallele, resumer_lieux
+from itineraire import optimiser_itineraire
+
+
+def main(nb_villes=150, latence_s=0.2, heures_sur_place=5.0):
+    temps_sur_place = int(heures_sur_place * 60)
+    villes = generer_villes(nb_villes)
+    rng = random.Random(3)
+    latences = {nom: rng.lognormvariate(0, 0.6) * latence_s for nom, _ in villes}
+    bornes = [borne_score(resumer_lieux(lieux), temps_sur_place) for _, lieux in villes]
+
+    def evaluer(ville):
+        time.sleep(latences[ville[0]])
+        if not ville[1]:
+            return None
+        itineraire, _ = optimiser_itineraire(ville[1], temps_sur_place)
+        return len(itineraire), itineraire
+
+    debut = time.perf_counter()
+    top_bloquant, _ = classer_en_parallele(villes, evaluer, bornes)
+    t_bloquant = time.perf_counter() - debut
+
+    def etapes():
+        for _, resultat, top, traites, _ in classer_au_fil_de_l_eau(villes, evaluer, bornes):
+            if resultat is not None:
+                yield time.perf_counter() - debut, traites, top
+
+    cache = CacheResultats()
+    debut = time.perf_counter()
+    instants = list(cache.obtenir_en_flux('recherche', etapes))
+    t_premier, t_total, top = instants[0][0], instants[-1][0], instants[-1][2]
+    assert [ville[0] for _, ville, _ in top] == [ville[0] for _, ville, _ in top_bloquant]
+
+    debut = time.perf_counter()
+    rejoue = list(cache.obtenir_en_flux('recherche', etapes))
+    t_cache = time.perf_counter() - debut
+
+    print(f"{nb_villes} villes, latence simulée ~{latence_s * 1000:.0f} ms par ville, {heures_sur_place:g} h sur place")
+    print(f"  classement bloquant : premier affichage après {t_bloquant:6.2f} s")
+    print(f"  classement en flux  : premier affichage après {t_premier:6.2f} s "
+          f"(latence min/médiane d'une ville : {min(latences.values()):.2f}/{sorted(latences.values())[nb_villes // 2]:.2f} s), "
+          f"{len(instants)} étapes, dernière à {t_total:.2f} s")
+    print(f"  même recherche en cache : {len(rejoue)} étape (résultat final) en {t_cache * 1e6:.0f} µs")
+
+
+if __name__ == "__main__":
+    main(*(float(x) if i else int(x) for i, x in enumerate(sys.argv[1:4])))
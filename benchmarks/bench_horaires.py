@@ -0,0 +1,70 @@
+"""
+Compare les requêtes historiques (LIKE + julianday sur `tgvmax_trajets`) aux requêtes
+indexées du schéma normalisé, sur une table synthétique d'un million de lignes.
+
+Usage : python benchmarks/bench_horaires.py [nb_trajets]
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import horaires
+from benchmarks.donnees_synthetiques import generer_tgvmax
+from villes import clean_city_name
+
+ANCIEN_SQL_DESTINATIONS = "SELECT Origine, Destination, strftime('%H:%M:%S', (julianday(Heure_arrivee) - julianday(Heure_depart)) * 86400, 'unixepoch') AS duree, TIME(Heure_depart) AS heure_depart, TIME(Heure_arrivee) AS heure_arrivee FROM tgvmax_trajets WHERE LOWER(Origine) LIKE LOWER(?) AND duree > '00:00:00' AND duree <= ? ORDER BY duree"
+ANCIEN_SQL_TRAIN = "SELECT Origine, Destination, strftime('%H:%M:%S', (julianday(Heure_arrivee) - julianday(Heure_depart)) * 86400, 'unixepoch') AS duree, TIME(Heure_depart) AS heure_depart, TIME(Heure_arrivee) AS heure_arrivee FROM tgvmax_trajets WHERE LOWER(Origine) LIKE LOWER(?) AND LOWER(Destination) LIKE LOWER(?) AND TIME(Heure_depart) >= ? ORDER BY TIME(Heure_depart) ASC LIMIT 1"
+
+REQUETES = [("ANTIBES", "NICE VILLE", "09:00:00", "02:00:00"), ("MARMANDE", "BORDEAUX ST JEAN", "08:00:00", "02:00:00"),
+            ("BORDEAUX ST JEAN", "TOULOUSE MATABIAU", "07:30:00", "02:00:00"), ("MARSEILLE ST CHARLES", "AVIGNON TGV", "10:00:00", "01:45:00")]
+
+
+def chronometrer(fonction, repetitions=5):
+    """Renvoie la meilleure durée (en ms) de `repetitions` appels."""
+    meilleur = float('inf')
+    for _ in range(repetitions):
+        debut = time.perf_counter()
+        fonction()
+        meilleur = min(meilleur, time.perf_counter() - debut)
+    return meilleur * 1000
+
+
+def main(nb_trajets=1_000_000):
+    with tempfile.TemporaryDirectory() as dossier:
+        chemin = os.path.join(dossier, "tgvmax.db")
+        print(f"Génération de {nb_trajets} trajets synthétiques...")
+        generer_tgvmax(chemin, nb_trajets)
+        conn = sqlite3.connect(chemin)
+        cur = conn.cursor()
+        debut = time.perf_counter()
+        horaires.construire_schema_normalise(conn)
+        print(f"Ingestion du schéma normalisé : {time.perf_counter() - debut:.1f} s\n")
+
+        print(f"{'requête':<45} {'avant (ms)':>12} {'après (ms)':>12} {'gain':>8}")
+        for depart, arrivee, heure, temps_max in REQUETES:
+            motif_dep, motif_arr = f"%{clean_city_name(depart)}%", f"%{clean_city_name(arrivee)}%"
+            mesures = [
+                (f"destinations depuis {depart}",
+                 lambda: cur.execute(ANCIEN_SQL_DESTINATIONS, (motif_dep, temps_max)).fetchall(),
+                 lambda: horaires.trouver_destinations_par_temps(cur, depart, temps_max)),
+                (f"train {depart} -> {arrivee}",
+                 lambda: cur.execute(ANCIEN_SQL_TRAIN, (motif_dep, motif_arr, heure)).fetchone(),
+                 lambda: horaires.trouver_train_ideal(cur, depart, arrivee, heure)),
+            ]
+            for libelle, avant, apres in mesures:
+                resultat_avant, resultat_apres = avant(), apres()
+                if isinstance(resultat_avant, list):
+                    resultat_avant, resultat_apres = sorted(resultat_avant), sorted(resultat_apres)
+                assert resultat_avant == resultat_apres, f"résultats différents pour {libelle}"
+                t_avant, t_apres = chronometrer(avant), chronometrer(apres)
+                print(f"{libelle:<45} {t_avant:>12.1f} {t_apres:>12.2f} {t_avant / t_apres:>7.0f}x")
+        conn.close()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
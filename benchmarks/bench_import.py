@@ -0,0 +1,82 @@
+"""
+Budget de démarrage : temps d'import de `train_project` mesuré par `python -X importtime` dans un
+interpréteur neuf, et absence d'effets de bord (rien d'affiché, aucun fichier créé, bibliothèques
+lourdes non importées). Sort en erreur (code 1) si le budget est dépassé ou si un module interdit
+est importé, pour servir de garde-fou avant un commit :
+
+    python benchmarks/bench_import.py --budget-ms 150
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULE = "train_project"
+# Importés à la première recherche ou au lancement de l'interface, jamais par l'import du module.
+MODULES_LOURDS = ("gradio", "gradio_folium", "folium", "geopy", "pandas", "numpy", "requests", "http.server")
+_VERIFICATION = f"""
+import sys
+import {MODULE}
+print(",".join(m for m in {MODULES_LOURDS!r} if m in sys.modules))
+"""
+
+
+def importtime(module, dossier):
+    """{module: (propre_us, cumule_us)} d'un import de `module` dans un interpréteur neuf."""
+    sortie = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=dossier,
+                            env={**os.environ, 'PYTHONPATH': RACINE}, capture_output=True, text=True, check=True)
+    temps = {}
+    for ligne in sortie.stderr.splitlines():
+        if not ligne.startswith("import time:") or "cumulative" in ligne:
+            continue
+        propre, cumule, nom = ligne[len("import time:"):].split("|")
+        temps[nom.strip()] = (int(propre), int(cumule))
+    return temps
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Temps d'import et effets de bord de train_project.")
+    parser.add_argument("--repetitions", type=int, default=7, help="interpréteurs lancés (médiane rapportée)")
+    parser.add_argument("--budget-ms", type=float, default=150.0, help="temps d'import cumulé maximum")
+    parser.add_argument("--top", type=int, default=10, help="modules les plus coûteux affichés")
+    args = parser.parse_args(argv)
+
+    # Dossier de travail vide : un import qui ouvrirait une base ou un cache y laisserait un fichier.
+    with tempfile.TemporaryDirectory() as dossier:
+        mesures = [importtime(MODULE, dossier) for _ in range(args.repetitions)]
+        verification = subprocess.run([sys.executable, "-c", _VERIFICATION], cwd=dossier,
+                                      env={**os.environ, 'PYTHONPATH': RACINE}, capture_output=True, text=True, check=True)
+        fichiers = os.listdir(dossier)
+
+    total_ms = statistics.median(mesure[MODULE][1] for mesure in mesures) / 1000
+    print(f"import {MODULE} : {total_ms:.1f} ms (médiane de {args.repetitions}, cumulé), budget {args.budget_ms:.0f} ms")
+    derniere = mesures[-1]
+    print("  modules les plus coûteux (temps propre, dernier import) :")
+    for nom, (propre, cumule) in sorted(derniere.items(), key=lambda item: -item[1][0])[:args.top]:
+        print(f"    {nom:40s} {propre / 1000:6.1f} ms  (cumulé {cumule / 1000:6.1f} ms)")
+
+    lignes = verification.stdout.splitlines()
+    lourds = [m for m in lignes[-1].split(",") if m] if lignes else []
+    erreurs = []
+    if total_ms > args.budget_ms:
+        erreurs.append(f"budget dépassé : {total_ms:.1f} ms > {args.budget_ms:.0f} ms")
+    if lourds:
+        erreurs.append(f"modules lourds importés : {', '.join(lourds)}")
+    if lignes[:-1]:
+        erreurs.append(f"sortie à l'import : {lignes[:-1]!r}")
+    if fichiers:
+        erreurs.append(f"fichiers créés à l'import : {fichiers!r}")
+    for erreur in erreurs:
+        print(f"❌ {erreur}")
+    if not erreurs:
+        print("✅ import sans effet de bord, dans le budget")
+    return 1 if erreurs else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
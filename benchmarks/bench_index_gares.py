@@ -0,0 +1,78 @@
+"""
+Résolution des gares saisies : filtre historique (`clean_city_name` + `instr` sur `stations`)
+contre `index_gares.IndexGares` (nom, ville, préfixe, trigrammes), puis requêtes horaires
+par `instr` contre égalité sur les identifiants résolus, et autocomplétion.
+
+Usage : python benchmarks/bench_index_gares.py [nb_trajets] [nb_stations]
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import horaires
+from benchmarks.donnees_synthetiques import generer_tgvmax
+from index_gares import IndexGares, nom_ville, replier
+
+SAISIES = ["NICE", "nice ville", "LYON", "Marseille", "marseile", "BORDEAUX ST JEAN", "bordaux", "AVIGNON",
+           "GARE SYNTHETIQUE 001", "toulouse", "Saint Laud", "ANGERS"]
+# Ville attendue de noms de gares réels : le suffixe n'est retiré que s'il ne fait pas partie du nom propre.
+VILLES = {"PARIS GARE DE LYON": "paris", "PARIS GARE DU NORD": "paris", "PARIS EST": "paris", "LYON": "lyon",
+          "LYON PART DIEU": "lyon", "MARSEILLE ST CHARLES": "marseille", "AIX EN PROVENCE TGV": "aix en provence"}
+
+
+def chronometrer_us(fonction, repetitions=200):
+    debut = time.perf_counter()
+    for _ in range(repetitions):
+        fonction()
+    return (time.perf_counter() - debut) * 1e6 / repetitions
+
+
+def main(nb_trajets=300_000, nb_stations=1000):
+    with tempfile.TemporaryDirectory() as dossier:
+        chemin = os.path.join(dossier, "tgvmax.db")
+        generer_tgvmax(chemin, nb_trajets, nb_stations)
+        conn = sqlite3.connect(chemin)
+        horaires.construire_schema_normalise(conn)
+
+        debut = time.perf_counter()
+        index = IndexGares.depuis_base(conn)
+        t_construction = time.perf_counter() - debut
+        noms = dict(conn.execute("SELECT id, nom FROM stations"))
+        print(f"{nb_stations} gares, {nb_trajets} trajets ; index construit en {t_construction * 1000:.0f} ms")
+
+        print(f"  {'saisie':22s} {'instr (µs)':>10s} {'index (µs)':>10s}  gares instr -> index")
+        for saisie in SAISIES:
+            ancien = lambda: [i for (i,) in conn.execute(horaires._STATIONS_CORRESPONDANTES,
+                                                        (horaires.clean_city_name(saisie),))]
+            t_ancien = chronometrer_us(ancien)
+            index._memo.clear()
+            t_froid = chronometrer_us(lambda: (index._memo.clear(), index.resoudre(saisie)))
+            gares_ancien, gares_index = ancien(), index.resoudre(saisie)
+            apercu = ", ".join(noms[i] for i in gares_index[:2]) + ("…" if len(gares_index) > 2 else "")
+            print(f"  {saisie!r:22s} {t_ancien:10.1f} {t_froid:10.1f}  {len(gares_ancien):4d} -> {len(gares_index):2d} {apercu}")
+        for nom, ville in VILLES.items():
+            assert nom_ville(replier(nom)) == ville, (nom, nom_ville(replier(nom)))
+        t_memo = chronometrer_us(lambda: index.resoudre("Marseille"), 10_000)
+        print(f"  résolution mémorisée : {t_memo:.2f} µs")
+
+        for depart, arrivee in (("MARSEILLE", "NICE"), ("BORDEAUX", "TOULOUSE")):
+            t_instr = chronometrer_us(lambda: horaires.trouver_destinations_par_temps(conn, depart, "02:00:00"), 50)
+            t_ids = chronometrer_us(lambda: horaires.trouver_destinations_par_temps(conn, depart, "02:00:00", index), 50)
+            t_train_instr = chronometrer_us(lambda: horaires.trouver_train_ideal(conn, depart, arrivee, "08:00:00"), 50)
+            t_train_ids = chronometrer_us(lambda: horaires.trouver_train_ideal(conn, depart, arrivee, "08:00:00", index), 50)
+            print(f"  {depart} : destinations {t_instr / 1000:6.2f} -> {t_ids / 1000:6.2f} ms, "
+                  f"train vers {arrivee} {t_train_instr / 1000:6.2f} -> {t_train_ids / 1000:6.2f} ms")
+
+        for prefixe in ("m", "mar", "bord", "gare synth", "charl", "toulous"):
+            t_completer = chronometrer_us(lambda: index.completer(prefixe), 2000)
+            print(f"  autocomplétion {prefixe!r:13s} : {t_completer:5.1f} µs -> {index.completer(prefixe)[:3]}")
+        conn.close()
+
+
+if __name__ == "__main__":
+    main(*(int(x) for x in sys.argv[1:3]))
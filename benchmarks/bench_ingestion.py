@@ -0,0 +1,105 @@
+"""
+Ingestion en flux de l'export TGVmax (`ingestion.py`) : durée et pic mémoire (tracemalloc) du
+chargement complet, comparés à l'export lu en entier en mémoire ; réexécution sans changement,
+puis avec une date modifiée ; requêtes filtrées par jour contre toutes dates confondues.
+
+Usage : python benchmarks/bench_ingestion.py [nb_trajets] [nb_jours]
+"""
+
+import csv
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import horaires
+import ingestion
+from benchmarks.donnees_synthetiques import generer_export_tgvmax
+
+PREMIER_JOUR = "2024-05-01"
+
+
+def pic_memoire(fonction):
+    """(résultat, durée en s, pic de mémoire Python en Mio) d'un appel de `fonction`."""
+    tracemalloc.start()
+    debut = time.perf_counter()
+    resultat = fonction()
+    duree = time.perf_counter() - debut
+    _, pic = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return resultat, duree, pic / 2 ** 20
+
+
+def modifier_une_date(source, destination, date_modifiee):
+    """Copie l'export en décalant d'une minute les arrivées des trains d'une date."""
+    with open(source, encoding='utf-8', newline='') as entree, open(destination, 'w', encoding='utf-8', newline='') as sortie:
+        lecteur, ecrivain = csv.reader(entree, delimiter=';'), csv.writer(sortie, delimiter=';')
+        ecrivain.writerow(next(lecteur))
+        for ligne in lecteur:
+            if ligne[0] == date_modifiee:
+                minutes = (horaires.heure_en_minutes(ligne[9]) + 1) % horaires.MINUTES_PAR_JOUR
+                ligne[9] = f"{minutes // 60:02d}:{minutes % 60:02d}"
+            ecrivain.writerow(ligne)
+
+
+def chronometrer_ms(fonction, repetitions=200):
+    debut = time.perf_counter()
+    for _ in range(repetitions):
+        fonction()
+    return (time.perf_counter() - debut) * 1000 / repetitions
+
+
+def main(nb_trajets=300_000, nb_jours=30):
+    with tempfile.TemporaryDirectory() as dossier:
+        export, export_modifie = os.path.join(dossier, "tgvmax.csv"), os.path.join(dossier, "tgvmax_modifie.csv")
+        generer_export_tgvmax(export, nb_trajets, nb_jours=nb_jours, premier_jour=PREMIER_JOUR)
+        print(f"Export synthétique : {nb_trajets} lignes sur {nb_jours} dates, {os.path.getsize(export) / 2 ** 20:.0f} Mio")
+
+        trajets, duree, pic = pic_memoire(lambda: list(ingestion.lire_export(export)))
+        print(f"  export lu en entier en mémoire : {len(trajets)} trains, {duree:.1f} s, pic {pic:.0f} Mio")
+        del trajets
+
+        conn = sqlite3.connect(os.path.join(dossier, "tgvmax.db"))
+        rapport, duree, pic = pic_memoire(lambda: ingestion.ingerer(conn, export))
+        print(f"  ingestion complète : {len(rapport['dates_chargees'])} dates, {rapport['trajets']} trajets, "
+              f"{duree:.1f} s (sous tracemalloc), pic {pic:.1f} Mio")
+        for taille_lot in (1_000, 200_000):
+            conn_lot = sqlite3.connect(os.path.join(dossier, f"tgvmax_{taille_lot}.db"))
+            _, duree, pic = pic_memoire(lambda: ingestion.ingerer(conn_lot, export, taille_lot))
+            print(f"  ingestion complète par lots de {taille_lot} : {duree:.1f} s, pic {pic:.1f} Mio")
+            conn_lot.close()
+
+        rapport = ingestion.ingerer(conn, export)
+        print(f"  réexécution sans changement : {len(rapport['dates_chargees'])} date rechargée, {rapport['duree_s']:.1f} s")
+        date_modifiee = horaires.date_du_jour(horaires.jour_du_voyage(PREMIER_JOUR) + nb_jours // 2)
+        modifier_une_date(export, export_modifie, date_modifiee)
+        rapport = ingestion.ingerer(conn, export_modifie)
+        print(f"  réexécution avec {date_modifiee} modifiée : "
+              f"{[horaires.date_du_jour(jour) for jour in rapport['dates_chargees']]} rechargée(s), "
+              f"{rapport['trajets']} trajets, {rapport['duree_s']:.1f} s")
+        assert [horaires.date_du_jour(jour) for jour in rapport['dates_chargees']] == [date_modifiee]
+
+        jour = horaires.jour_du_voyage(date_modifiee)
+        attendu = sum(1 for trajet in ingestion.lire_export(export_modifie) if trajet[0] == jour)
+        (en_base,) = conn.execute("SELECT COUNT(*) FROM trajets WHERE jour = ?", (jour,)).fetchone()
+        assert en_base == attendu, (en_base, attendu)
+
+        cur = conn.cursor()
+        for depart, arrivee in (("MARSEILLE", "NICE"), ("BORDEAUX", "TOULOUSE")):
+            toutes = chronometrer_ms(lambda: horaires.trouver_destinations_par_temps(cur, depart, "02:00:00"), 20)
+            datees = chronometrer_ms(lambda: horaires.trouver_destinations_par_temps(cur, depart, "02:00:00", jour=jour))
+            train_toutes = chronometrer_ms(lambda: horaires.trouver_train_ideal(cur, depart, arrivee, "08:00:00"))
+            train_datee = chronometrer_ms(lambda: horaires.trouver_train_ideal(cur, depart, arrivee, "08:00:00", jour=jour))
+            nb_toutes = len(horaires.trouver_destinations_par_temps(cur, depart, "02:00:00"))
+            nb_datees = len(horaires.trouver_destinations_par_temps(cur, depart, "02:00:00", jour=jour))
+            print(f"  {depart} : destinations toutes dates {toutes:.2f} ms ({nb_toutes}) -> le {date_modifiee} "
+                  f"{datees:.2f} ms ({nb_datees}) ; train vers {arrivee} {train_toutes:.3f} -> {train_datee:.3f} ms")
+        conn.close()
+
+
+if __name__ == "__main__":
+    main(*(int(x) for x in sys.argv[1:3]))
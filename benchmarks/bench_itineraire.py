@@ -0,0 +1,53 @@
+"""
+Qualité de l'itinéraire contre temps de calcul : parcours glouton historique
+(`creer_itineraire_visite_avec_trajet`) et optimiseur (`optimiser_itineraire`) à
+plusieurs délais de calcul, sur des villes synthétiques.
+
+Usage : python benchmarks/bench_itineraire.py [nb_villes]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_marche import generer_lieux
+from itineraire import creer_itineraire_visite_avec_trajet, optimiser_itineraire
+
+TAILLES = (30, 300, 2000)
+TEMPS_SUR_PLACE_MIN = (180, 360, 600)
+DELAIS_MS = (2, 5, 20, 100)
+
+
+def _mesurer(calculer, villes):
+    nb_lieux, pertinence, duree = 0, 0, 0.0
+    for lieux, temps_disponible in villes:
+        debut = time.perf_counter()
+        itineraire, temps_total = calculer(lieux, temps_disponible)
+        duree += time.perf_counter() - debut
+        assert temps_total <= temps_disponible
+        nb_lieux += len(itineraire)
+        pertinence += sum(lieu.score_pertinence for lieu in itineraire)
+    return nb_lieux / len(villes), pertinence / len(villes), duree / len(villes) * 1000
+
+
+def main(nb_villes=10):
+    glouton = lambda lieux, temps: creer_itineraire_visite_avec_trajet(
+        sorted([lieu.copie() for lieu in lieux], key=lambda x: x.score_pertinence, reverse=True), temps)
+    print(f"{'lieux':>5} {'sur place':>9}  {'méthode':<18} {'lieux visités':>13} {'pertinence':>10} {'calcul':>9}")
+    for taille in TAILLES:
+        for temps_disponible in TEMPS_SUR_PLACE_MIN:
+            villes = [(generer_lieux(taille, graine=1000 * taille + i), temps_disponible) for i in range(nb_villes)]
+            methodes = [("glouton", glouton)] + [
+                (f"optimiseur {delai} ms", lambda lieux, temps, delai=delai: optimiser_itineraire(lieux, temps, delai))
+                for delai in DELAIS_MS]
+            for nom, calculer in methodes:
+                nb_lieux, pertinence, duree = _mesurer(calculer, villes)
+                print(f"{taille:5d} {temps_disponible // 60:7d} h  {nom:<18} {nb_lieux:13.1f} {pertinence:10.1f} "
+                      f"{duree:7.1f} ms")
+            print()
+
+
+if __name__ == "__main__":
+    main(*(int(x) for x in sys.argv[1:2]))
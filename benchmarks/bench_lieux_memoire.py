@@ -0,0 +1,133 @@
+"""
+Mémoire des lieux d'une réponse Overpass : ancienne lecture (`response.json()` puis un dict par
+élément, tags OSM compris) contre lecture en flux (`lieux.elements_overpass`) en `lieux.Lieu`
+compacts. Pic (tracemalloc) pendant la lecture, mémoire gardée par la liste de lieux et durée,
+sur une réponse synthétique de 10 000 éléments aux tags réalistes, puis de bout en bout par HTTP
+(serveur stub dans un autre processus, pour que ses allocations ne soient pas comptées).
+
+Usage : python benchmarks/bench_lieux_memoire.py [nb_elements]
+"""
+
+import codecs
+import json
+import multiprocessing
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import lieux
+from benchmarks.serveurs_stub import ServeurStub
+from client_http import client
+
+BBOX = (43.65, 43.75, 7.2, 7.3)
+_TAGS = [{'tourism': 'museum'}, {'tourism': 'attraction'}, {'historic': 'castle'}, {'historic': 'church'},
+         {'historic': 'monument'}, {'tourism': 'viewpoint'}]
+
+
+def reponse_overpass(nb_elements, graine=42):
+    """Texte d'une réponse Overpass `out center;` dont les éléments portent autant de tags qu'en vrai (10 à 20)."""
+    rng = random.Random(graine)
+    s, n, w, e = BBOX
+    elements = []
+    for i in range(nb_elements):
+        tags = {**rng.choice(_TAGS), 'name': f"Lieu {i}", 'name:en': f"Place {i}", 'addr:city': "Nice",
+                'addr:street': f"Rue {rng.randrange(500)}", 'addr:housenumber': str(rng.randrange(100)),
+                'addr:postcode': "06000", 'opening_hours': "Tu-Su 10:00-18:00", 'website': f"https://lieu{i}.fr",
+                'wheelchair': rng.choice(["yes", "limited", "no"]), 'wikidata': f"Q{rng.randrange(10 ** 7)}"}
+        if rng.random() < 0.3:
+            tags['wikipedia'] = f"fr:Lieu {i}"
+            tags['description'] = "Monument du XVIIe siècle, inscrit aux monuments historiques. " * 2
+        lat, lon = rng.uniform(s, n), rng.uniform(w, e)
+        if rng.random() < 0.6:
+            elements.append({'type': 'node', 'id': i, 'lat': lat, 'lon': lon, 'tags': tags})
+        else:
+            elements.append({'type': 'way', 'id': i, 'center': {'lat': lat, 'lon': lon},
+                             'nodes': list(range(10 * i, 10 * i + rng.randrange(4, 30))), 'tags': tags})
+    return json.dumps({'version': 0.6, 'generator': "Overpass API", 'osm3s': {'timestamp_osm_base': "2024-05-01T00:00:00Z"},
+                       'elements': elements}, ensure_ascii=False)
+
+
+def lieu_dict_ancien(element):
+    """Ancienne forme d'un lieu : un dict gardant tous les tags OSM."""
+    tags = element.get('tags', {})
+    if 'name' not in tags:
+        return None
+    lat, lon = (element.get('lat'), element.get('lon')) if element['type'] == 'node' else (element.get('center', {}).get('lat'), element.get('center', {}).get('lon'))
+    if not lat or not lon:
+        return None
+    return {'nom': tags['name'], 'latitude': lat, 'longitude': lon, 'tags': tags,
+            'temps_visite_min': lieux.estimer_temps_visite(tags), 'score_pertinence': 1 if 'wikipedia' in tags else 0}
+
+
+def lecture_ancienne(morceaux):
+    """`response.json()` : corps complet, texte décodé, puis arbre JSON entier avant la conversion."""
+    data = json.loads(b"".join(morceaux).decode('utf-8'))
+    return [lieu for lieu in map(lieu_dict_ancien, data.get('elements', [])) if lieu is not None]
+
+
+def lecture_en_flux(morceaux):
+    return lieux.extraire_lieux(lieux.elements_overpass(codecs.iterdecode(morceaux, 'utf-8')))
+
+
+def mesurer(fonction):
+    """(résultat, durée en ms hors tracemalloc, pic en Mio, mémoire encore allouée en Mio : celle du résultat)."""
+    debut = time.perf_counter()
+    fonction()
+    duree = (time.perf_counter() - debut) * 1000
+    tracemalloc.start()
+    resultat = fonction()
+    garde, pic = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return resultat, duree, pic / 2 ** 20, garde / 2 ** 20
+
+
+def afficher(nom, duree, pic, garde):
+    print(f"  {nom:<34} pic {pic:7.2f} Mio, gardé {garde:6.2f} Mio, {duree:7.1f} ms")
+
+
+def get_ancien(url, bbox):
+    response = client.get(url, params={'data': lieux.requete_overpass(bbox)}, timeout=60)
+    response.raise_for_status()
+    return [lieu for lieu in map(lieu_dict_ancien, response.json().get('elements', [])) if lieu is not None]
+
+
+def _servir(nb_elements, adresse, arret):
+    with ServeurStub(nb_elements=nb_elements) as stub:
+        adresse.put(stub.url_overpass)
+        arret.wait()
+
+
+def main(nb_elements=10_000):
+    corps = reponse_overpass(nb_elements).encode('utf-8')
+    # Corps reçu par morceaux, comme avec `iter_content`.
+    taille = lieux.TAILLE_MORCEAU
+    print(f"Réponse Overpass synthétique : {nb_elements} éléments, {len(corps) / 2 ** 20:.1f} Mio")
+    anciens, duree, pic, garde = mesurer(lambda: lecture_ancienne(corps[i:i + taille] for i in range(0, len(corps), taille)))
+    afficher("response.json() + dicts avec tags", duree, pic, garde)
+    nouveaux, duree_flux, pic_flux, garde_flux = mesurer(
+        lambda: lecture_en_flux(corps[i:i + taille] for i in range(0, len(corps), taille)))
+    afficher("flux + Lieu (__slots__)", duree_flux, pic_flux, garde_flux)
+    print(f"  -> pic x{pic / pic_flux:.0f} plus bas, {garde / garde_flux:.1f}x moins de mémoire gardée "
+          f"({garde * 2 ** 20 / len(anciens):.0f} -> {garde_flux * 2 ** 20 / len(nouveaux):.0f} octets par lieu)")
+    assert [(l['nom'], l['latitude'], l['longitude'], l['temps_visite_min'], l['score_pertinence']) for l in anciens] == \
+           [(l.nom, l.latitude, l.longitude, l.temps_visite_min, l.score_pertinence) for l in nouveaux]
+
+    adresse, arret = multiprocessing.Queue(), multiprocessing.Event()
+    serveur = multiprocessing.Process(target=_servir, args=(nb_elements, adresse, arret), daemon=True)
+    serveur.start()
+    url = adresse.get()
+    print(f"De bout en bout par HTTP (serveur stub, {nb_elements} éléments, tags du stub) :")
+    _, duree, pic, garde = mesurer(lambda: get_ancien(url, BBOX))
+    afficher("response.json() + dicts avec tags", duree, pic, garde)
+    _, duree, pic, garde = mesurer(lambda: lieux.lieux_dans_bbox(BBOX, url=url))
+    afficher("lieux_dans_bbox (flux + Lieu)", duree, pic, garde)
+    arret.set()
+    serveur.join()
+
+
+if __name__ == "__main__":
+    main(*(int(x) for x in sys.argv[1:2]))
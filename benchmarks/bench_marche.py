@@ -0,0 +1,90 @@
+"""
+Temps de marche : `geopy.geodesic` appelé couple par couple contre la matrice NumPy
+(haversine) de `marche.py`, à 100, 1 000 et 5 000 lieux.
+
+Usage : python benchmarks/bench_marche.py [nb_lieux ...]
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from geopy.distance import geodesic
+
+from itineraire import creer_itineraire_visite_avec_trajet
+from lieux import Lieu
+from marche import matrice_temps_marche
+
+BBOX = (43.65, 43.75, 7.2, 7.3)  # environ 11 km x 8 km
+TEMPS_VISITE = [20, 30, 45, 60, 120]
+
+
+def generer_lieux(nb, graine=42):
+    rng = random.Random(graine)
+    s, n, w, e = BBOX
+    return [Lieu(f"Lieu {i}", rng.uniform(s, n), rng.uniform(w, e), rng.choice(TEMPS_VISITE), int(rng.random() < 0.3))
+            for i in range(nb)]
+
+
+def temps_geodesique(lieu1, lieu2, vitesse_kmh=4.5):
+    """Ancien calcul (calculer_temps_trajet_a_pied)."""
+    distance_km = geodesic((lieu1.latitude, lieu1.longitude), (lieu2.latitude, lieu2.longitude)).kilometers
+    return round((distance_km / vitesse_kmh) * 60)
+
+
+def itineraire_geodesique(lieux_tries, temps_disponible_min):
+    """Ancienne boucle gloutonne : un appel geodesic par candidat."""
+    itineraire, temps_total = [], 0
+    if not lieux_tries or lieux_tries[0].temps_visite_min > temps_disponible_min:
+        return [], 0
+    itineraire.append(lieux_tries[0])
+    temps_total += lieux_tries[0].temps_visite_min
+    for lieu_candidat in lieux_tries[1:]:
+        temps_trajet = temps_geodesique(itineraire[-1], lieu_candidat)
+        if temps_total + temps_trajet + lieu_candidat.temps_visite_min <= temps_disponible_min:
+            itineraire.append(lieu_candidat)
+            temps_total += temps_trajet + lieu_candidat.temps_visite_min
+    return itineraire, temps_total
+
+
+def _meilleur_temps(fonction, repetitions=3):
+    meilleur = float('inf')
+    for _ in range(repetitions):
+        debut = time.perf_counter()
+        resultat = fonction()
+        meilleur = min(meilleur, time.perf_counter() - debut)
+    return meilleur, resultat
+
+
+def main(tailles=(100, 1000, 5000)):
+    # Coût d'un appel geodesic, mesuré sur un échantillon : la matrice complète en demanderait n(n-1)/2.
+    echantillon = generer_lieux(2001, graine=1)
+    t_appel, _ = _meilleur_temps(lambda: [temps_geodesique(a, b) for a, b in zip(echantillon, echantillon[1:])], 1)
+    t_appel /= len(echantillon) - 1
+    print(f"geodesic : {t_appel * 1e6:.0f} µs par couple")
+    for nb in tailles:
+        lieux = generer_lieux(nb)
+        t_geodesic = t_appel * nb * (nb - 1) / 2
+        t64, m64 = _meilleur_temps(lambda: matrice_temps_marche(lieux))
+        t32, m32 = _meilleur_temps(lambda: matrice_temps_marche(lieux, float32=True))
+        ecart = max(abs(temps_geodesique(lieux[i], lieux[j]) - m64[i, j])
+                    for i, j in ((random.randrange(nb), random.randrange(nb)) for _ in range(500)))
+        print(f"{nb:5d} lieux, matrice complète :")
+        print(f"  geodesic (extrapolé) : {t_geodesic:9.2f} s")
+        print(f"  NumPy float64        : {t64 * 1000:9.1f} ms  (x{t_geodesic / t64:,.0f}, {m64.nbytes / 1e6:.1f} Mo)")
+        print(f"  NumPy float32        : {t32 * 1000:9.1f} ms  (x{t_geodesic / t32:,.0f}, {m32.nbytes / 1e6:.1f} Mo, "
+              f"écart max float64 {float(abs(m64 - m32).max()) * 60:.2f} s de marche)")
+        print(f"  écart max avec geodesic arrondi : {ecart:.2f} min")
+
+        lieux_tries = sorted(lieux, key=lambda x: x.score_pertinence, reverse=True)
+        t_ancien, (ancien, _) = _meilleur_temps(lambda: itineraire_geodesique(lieux_tries, 5 * 60), 1)
+        t_nouveau, (nouveau, _) = _meilleur_temps(lambda: creer_itineraire_visite_avec_trajet(lieux_tries, 5 * 60), 1)
+        print(f"  itinéraire 5 h (glouton) : {t_ancien * 1000:.1f} ms -> {t_nouveau * 1000:.1f} ms "
+              f"(x{t_ancien / t_nouveau:.1f}), {'mêmes lieux' if [l.nom for l in ancien] == [l.nom for l in nouveau] else 'lieux différents'}")
+
+
+if __name__ == "__main__":
+    main(tuple(int(x) for x in sys.argv[1:]) or (100, 1000, 5000))
@@ -0,0 +1,64 @@
+"""
+Vérifie que le moteur NumPy renvoie exactement les mêmes résultats que le moteur
+SQLite sur une base synthétique, puis compare leurs temps de réponse.
+
+Usage : python benchmarks/bench_moteur_numpy.py [nb_trajets]
+"""
+
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import horaires
+from benchmarks.donnees_synthetiques import generer_tgvmax
+from moteur_numpy import MoteurHoraires
+
+
+def main(nb_trajets=1_000_000, nb_requetes=200):
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as dossier:
+        chemin = os.path.join(dossier, "tgvmax.db")
+        stations = generer_tgvmax(chemin, nb_trajets)
+        conn = sqlite3.connect(chemin)
+        cur = conn.cursor()
+        horaires.construire_schema_normalise(conn)
+        debut = time.perf_counter()
+        moteur = MoteurHoraires(conn)
+        print(f"Chargement du moteur NumPy ({len(moteur)} trajets) : {time.perf_counter() - debut:.2f} s")
+
+        requetes = [(rng.choice(stations), rng.choice(stations), f"{rng.randrange(5, 23):02d}:{rng.randrange(60):02d}:00",
+                     f"{rng.randrange(0, 4):02d}:{rng.randrange(60):02d}:00") for _ in range(nb_requetes)]
+        # Villes partielles : plusieurs gares d'origine possibles
+        requetes += [("GARE SYNTHETIQUE 001", "PARIS", "08:00:00", "01:30:00"), ("NICE", "ANTIBES", "09:00:00", "02:00:00")]
+
+        temps = {'sqlite': [0.0, 0.0], 'numpy': [0.0, 0.0]}
+        for depart, arrivee, heure, temps_max in requetes:
+            resultats = {}
+            for nom, destinations, train in (
+                    ('sqlite', lambda: horaires.trouver_destinations_par_temps(cur, depart, temps_max),
+                     lambda: horaires.trouver_train_ideal(cur, depart, arrivee, heure)),
+                    ('numpy', lambda: moteur.trouver_destinations_par_temps(depart, temps_max),
+                     lambda: moteur.trouver_train_ideal(depart, arrivee, heure))):
+                t0 = time.perf_counter()
+                liste = destinations()
+                t1 = time.perf_counter()
+                premier = train()
+                t2 = time.perf_counter()
+                temps[nom][0] += t1 - t0
+                temps[nom][1] += t2 - t1
+                resultats[nom] = (liste, premier)
+            assert resultats['sqlite'] == resultats['numpy'], f"résultats différents pour {depart} -> {arrivee}"
+        print(f"{len(requetes)} requêtes : résultats identiques.\n")
+        print(f"{'moteur':<8} {'destinations (ms/req)':>22} {'train idéal (ms/req)':>22}")
+        for nom, (t_dest, t_train) in temps.items():
+            print(f"{nom:<8} {t_dest * 1000 / len(requetes):>22.3f} {t_train * 1000 / len(requetes):>22.3f}")
+        conn.close()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,77 @@
+"""
+Test de charge concurrent de `horaires.trouver_train_ideal` : connexion unique partagée
+par tous les threads (montage historique) contre `PoolLecture` (une connexion en lecture
+seule par thread). Vérifie que les réponses sont celles d'un parcours séquentiel et
+mesure le débit de 1 à 16 threads.
+
+Usage : python benchmarks/bench_pool_sqlite.py [nb_trajets] [nb_requetes_par_thread]
+"""
+
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import horaires
+from benchmarks.donnees_synthetiques import generer_tgvmax
+from pool_sqlite import PoolLecture
+
+NB_THREADS = (1, 2, 4, 8, 16)
+
+
+def generer_requetes(stations, nb, graine=5):
+    rng = random.Random(graine)
+    return [(rng.choice(stations), rng.choice(stations), f"{rng.randrange(5, 22):02d}:{rng.randrange(60):02d}:00")
+            for _ in range(nb)]
+
+
+def debit(connexion_du_thread, requetes, nb_threads):
+    """Requêtes par seconde avec `nb_threads` threads se partageant `requetes`, et les réponses dans l'ordre."""
+    def executer(tranche):
+        conn = connexion_du_thread()
+        return [horaires.trouver_train_ideal(conn, *requete) for requete in tranche]
+
+    tranches = [requetes[i::nb_threads] for i in range(nb_threads)]
+    with ThreadPoolExecutor(nb_threads) as pool:
+        debut = time.perf_counter()
+        resultats = list(pool.map(executer, tranches))
+        duree = time.perf_counter() - debut
+    reponses = [None] * len(requetes)
+    for i, resultats_tranche in enumerate(resultats):
+        reponses[i::nb_threads] = resultats_tranche
+    return len(requetes) / duree, reponses
+
+
+def main(nb_trajets=300_000, nb_requetes_par_thread=300):
+    with tempfile.TemporaryDirectory() as dossier:
+        chemin = os.path.join(dossier, "tgvmax.db")
+        stations = generer_tgvmax(chemin, nb_trajets)
+        with sqlite3.connect(chemin) as conn:
+            horaires.construire_schema_normalise(conn)
+        requetes = generer_requetes(stations, nb_requetes_par_thread * max(NB_THREADS))
+        with sqlite3.connect(chemin) as conn:
+            attendu = [horaires.trouver_train_ideal(conn, *requete) for requete in requetes]
+
+        partagee = sqlite3.connect(chemin, check_same_thread=False)
+        pool = PoolLecture(chemin)
+        print(f"{nb_trajets} trajets, {len(requetes)} requêtes trouver_train_ideal, {os.cpu_count()} CPU")
+        print(f"{'threads':>7}  {'connexion partagée':>20}  {'PoolLecture':>20}")
+        reference = None
+        for nb_threads in NB_THREADS:
+            debit_partage, reponses_partage = debit(lambda: partagee, requetes, nb_threads)
+            debit_pool, reponses_pool = debit(pool.connexion, requetes, nb_threads)
+            assert reponses_pool == attendu
+            reference = reference or debit_pool
+            print(f"{nb_threads:7d}  {debit_partage:14.0f} req/s{'' if reponses_partage == attendu else ' (!)':4}"
+                  f"  {debit_pool:14.0f} req/s  (x{debit_pool / reference:.1f})")
+        pool.fermer()
+        partagee.close()
+
+
+if __name__ == "__main__":
+    main(*(int(x) for x in sys.argv[1:3]))
@@ -0,0 +1,113 @@
+"""
+Temps de réponse du store local des lieux (R-tree SQLite) sur un export Overpass
+synthétique, et vérification que les résultats sont ceux de l'API pour la même emprise.
+Puis import d'un extrait OSM XML synthétique (surtout des nœuds et des routes sans intérêt
+touristique, comme un extrait régional) : durée et pic mémoire (tracemalloc).
+
+Usage : python benchmarks/bench_store_lieux.py [nb_villes] [nb_elements_par_ville] [nb_noeuds_osm]
+"""
+
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from xml.sax.saxutils import quoteattr
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import store_lieux
+from classement import resumer_lieux
+from benchmarks.serveurs_stub import ServeurStub, elements_overpass
+from lieux import lieux_dans_bbox
+
+
+def ecrire_extrait_osm(chemin, nb_noeuds, graine=3):
+    """
+    Extrait OSM XML : `nb_noeuds` nœuds (1 % touristiques), des routes de 50 nœuds et un way touristique
+    pour 1 000 nœuds. Renvoie le nombre de lieux attendus (éléments touristiques nommés).
+    """
+    rng = random.Random(graine)
+    attendus = 0
+    with open(chemin, 'w', encoding='utf-8') as fichier:
+        fichier.write('<?xml version="1.0" encoding="UTF-8"?>\n<osm version="0.6">\n')
+        for i in range(1, nb_noeuds + 1):
+            lat, lon = 43.0 + rng.random(), 5.0 + rng.random()
+            if i % 100 == 0:
+                attendus += 1
+                fichier.write(f'<node id="{i}" lat="{lat:.7f}" lon="{lon:.7f}"><tag k="tourism" v="museum"/>'
+                              f'<tag k="name" v="Musée {i}"/><tag k="wikipedia" v="fr:Musée {i}"/></node>\n')
+            else:
+                fichier.write(f'<node id="{i}" lat="{lat:.7f}" lon="{lon:.7f}"><tag k="highway" v="crossing"/>'
+                              f'<tag k="source" v="cadastre"/></node>\n')
+        for j in range(nb_noeuds // 50):
+            debut = rng.randrange(1, nb_noeuds - 50)
+            refs = "".join(f'<nd ref="{ref}"/>' for ref in range(debut, debut + 50))
+            if j % 20 == 0:
+                attendus += 1
+                tags = f'<tag k="historic" v="castle"/><tag k="name" v={quoteattr(f"Château {j}")}/>'
+            else:
+                tags = '<tag k="highway" v="residential"/><tag k="name" v="Rue"/>'
+            fichier.write(f'<way id="{j + 1}">{refs}{tags}</way>\n')
+        fichier.write('</osm>\n')
+    return attendus
+
+
+def main(nb_villes=300, nb_elements=200, nb_noeuds_osm=200_000):
+    bboxes = [(43.0 + (i // 20) * 0.5, 43.1 + (i // 20) * 0.5, -1.0 + (i % 20) * 0.4, -0.9 + (i % 20) * 0.4)
+              for i in range(nb_villes)]
+    elements = []
+    for s, n, w, e in bboxes:
+        elements += elements_overpass((s, w, n, e), nb_elements)
+    with tempfile.TemporaryDirectory() as dossier:
+        export, base = os.path.join(dossier, "export.json"), os.path.join(dossier, "lieux.db")
+        with open(export, 'w', encoding='utf-8') as fichier:
+            json.dump({'elements': elements}, fichier)
+        debut = time.perf_counter()
+        conn = store_lieux.ouvrir(base)
+        nb = store_lieux.rafraichir_region(conn, "FRANCE", store_lieux.elements_overpass_json(export))
+        conn.close()
+        print(f"Import de {len(elements)} éléments ({nb} lieux) : {time.perf_counter() - debut:.1f} s")
+
+        store = store_lieux.StoreLieux(base)
+        mesures = []
+        for bbox in bboxes:
+            debut = time.perf_counter()
+            store.lieux_dans_bbox(bbox)
+            mesures.append((time.perf_counter() - debut) * 1000)
+        print(f"Requête par emprise : médiane {statistics.median(mesures):.2f} ms, max {max(mesures):.2f} ms")
+
+        mesures = []
+        for bbox in bboxes:
+            debut = time.perf_counter()
+            resume = store.resume_bbox(bbox)
+            mesures.append((time.perf_counter() - debut) * 1000)
+            assert resume == resumer_lieux(store.lieux_dans_bbox(bbox))
+        print(f"Résumé par emprise (classement) : médiane {statistics.median(mesures):.2f} ms, max {max(mesures):.2f} ms")
+
+        with ServeurStub(nb_elements=nb_elements) as stub:
+            for bbox in bboxes[:20]:
+                assert store.lieux_dans_bbox(bbox) == lieux_dans_bbox(bbox, url=stub.url_overpass)
+        print("Résultats identiques à ceux de l'API (stub) sur 20 emprises.")
+
+        extrait = os.path.join(dossier, "region.osm")
+        attendus = ecrire_extrait_osm(extrait, nb_noeuds_osm)
+        conn = store_lieux.ouvrir(base)
+        debut = time.perf_counter()
+        store_lieux.rafraichir_region(conn, "REGION", store_lieux.elements_osm_xml(extrait))
+        duree = time.perf_counter() - debut
+        tracemalloc.start()  # second import, mesuré seul : tracemalloc ralentit beaucoup l'analyse XML
+        nb = store_lieux.rafraichir_region(conn, "REGION", store_lieux.elements_osm_xml(extrait))
+        _, pic = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        conn.close()
+        assert nb == attendus, (nb, attendus)
+        print(f"Import OSM XML ({os.path.getsize(extrait) / 2 ** 20:.0f} Mio, {nb_noeuds_osm} nœuds, {nb} lieux) : "
+              f"{duree:.1f} s, pic {pic / 2 ** 20:.1f} Mio")
+
+
+if __name__ == "__main__":
+    main(*(int(x) for x in sys.argv[1:4]))
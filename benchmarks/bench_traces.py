@@ -0,0 +1,77 @@
+"""
+Coût des traces (`traces.py`) : étape et compteur, désactivés puis activés, rapportés à une
+recherche type (~200 étapes et compteurs) ; puis profileur par échantillonnage sur une recherche
+simulée lente, dont le profil « folded » est écrit dans un dossier temporaire.
+
+Usage : python benchmarks/bench_traces.py [nb_iterations]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import traces
+from benchmarks.bench_marche import generer_lieux
+from itineraire import optimiser_itineraire
+
+NB_ETAPES_PAR_RECHERCHE = 200
+
+
+def cout_ns(fonction, nb_iterations):
+    debut = time.perf_counter()
+    for _ in range(nb_iterations):
+        fonction()
+    return (time.perf_counter() - debut) * 1e9 / nb_iterations
+
+
+def etape_et_compteur():
+    with traces.etape("bench"):
+        traces.compter("bench_compteur", 3)
+
+
+def main(nb_iterations=200_000):
+    traces.journal.disabled = True
+    vide = cout_ns(lambda: None, nb_iterations)
+    resultats = {}
+    for actif in (False, True):
+        traces.activer(actif)
+        resultats[actif] = cout_ns(etape_et_compteur, nb_iterations) - vide
+        with traces.requete("bench"):
+            resultats[actif, 'requete'] = cout_ns(etape_et_compteur, nb_iterations) - vide
+    print(f"étape + compteur ({nb_iterations} itérations, appel de fonction vide déduit)")
+    print(f"  désactivé           : {resultats[False]:6.0f} ns, soit {resultats[False] * NB_ETAPES_PAR_RECHERCHE / 1e3:6.1f} µs "
+          f"par recherche ({NB_ETAPES_PAR_RECHERCHE} étapes)")
+    print(f"  activé              : {resultats[True]:6.0f} ns, soit {resultats[True] * NB_ETAPES_PAR_RECHERCHE / 1e3:6.1f} µs")
+    print(f"  activé, en recherche: {resultats[True, 'requete']:6.0f} ns, soit "
+          f"{resultats[True, 'requete'] * NB_ETAPES_PAR_RECHERCHE / 1e3:6.1f} µs")
+
+    # Profileur : recherche simulée (itinéraires de 20 villes) plus lente que le seuil.
+    villes = [generer_lieux(150, graine=i) for i in range(20)]
+    traces.activer(True)
+    for seuil in (0, 1):
+        traces.SEUIL_PROFIL_MS = seuil
+        with tempfile.TemporaryDirectory() as dossier:
+            traces.DOSSIER_PROFILS = dossier
+            debut = time.perf_counter()
+            with traces.requete("bench_profil"):
+                for lieux in villes:
+                    with traces.etape("itineraire"):
+                        optimiser_itineraire(lieux, 300)
+            duree = time.perf_counter() - debut
+            profils = [os.path.join(dossier, nom) for nom in os.listdir(dossier)]
+            if not profils:
+                print(f"  sans profileur : recherche simulée en {duree * 1000:.0f} ms")
+                continue
+            with open(profils[0], encoding="utf-8") as fichier:
+                lignes = fichier.read().splitlines()
+            nb_echantillons = sum(int(ligne.rsplit(" ", 1)[1]) for ligne in lignes)
+            print(f"  avec profileur (seuil {seuil} ms) : {duree * 1000:.0f} ms, {nb_echantillons} échantillons, "
+                  f"{len(lignes)} piles distinctes dans {os.path.basename(profils[0])}")
+            print(f"    pile la plus fréquente : …{lignes[0].rsplit(' ', 1)[0][-110:]}")
+
+
+if __name__ == "__main__":
+    main(*(int(x) for x in sys.argv[1:2]))
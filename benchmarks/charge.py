@@ -0,0 +1,258 @@
+"""
+Test de charge de l'interface Gradio. L'application (`train_project.servir`) est lancée sur une
+base synthétique et des serveurs Overpass/Nominatim locaux, chacun dans son processus ; des
+utilisateurs simultanés cliquent sur « Trouver mon escapade ! » par l'API de Gradio
+(`gradio_client`, une session par utilisateur, sans temps de réflexion entre deux recherches).
+
+Les recherches sont tirées des exemples de l'interface (`gr.Examples`, lus dans la configuration
+servie par l'application), l'heure de départ décalée au hasard d'au plus `--decalage-max-min`
+minutes pour que des utilisateurs simultanés ne demandent pas tous exactement la même chose.
+
+Pour chaque niveau de concurrence : débit (recherches terminées par seconde), latence jusqu'au
+premier résultat affiché et jusqu'au résultat final (p50, p95, p99) et taux d'erreur.
+
+    python benchmarks/charge.py --utilisateurs 1 5 10 25 50 --duree-s 30
+    python benchmarks/charge.py --concurrence-app 1 4 8 --sortie charge.json
+
+`--concurrence-app` fixe `ESCAPADE_CONCURRENCE` (recherches traitées en même temps par Gradio),
+une application relancée par valeur. Le cache des résultats de l'application est désactivé (taille 0,
+`--avec-cache` pour le garder) ; les recherches identiques simultanées restent regroupées. Les
+journaux de l'application sont écrits dans `--journal` (ignorés par défaut).
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.serveurs_stub import ServeurStub
+from benchmarks.suite import preparer_base
+
+API_RECHERCHE = "/rechercher"
+POSITION_HEURE = 1  # l'heure de départ dans les entrées de la recherche
+
+
+def _port_libre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _servir_stub(latence_s, nb_elements, adresses, arret):
+    with ServeurStub(latence_s=latence_s, nb_elements=nb_elements) as stub:
+        adresses.put((stub.url_overpass, stub.domaine_nominatim))
+        arret.wait()
+
+
+def _servir_application(environnement, port, debit_stub, journal):
+    # Les journaux de l'application (une ligne JSON par recherche) vont dans `journal`, pas dans le tableau.
+    with open(journal, 'a') as sortie:
+        os.dup2(sortie.fileno(), 1)
+        os.dup2(sortie.fileno(), 2)
+    os.environ.update(environnement)
+    import collecte
+    # On mesure l'application, pas la politesse envers les API publiques (`--debit-stub` pour la rétablir).
+    collecte.DEBITS_PAR_HOTE['127.0.0.1'] = debit_stub
+    import train_project
+    train_project.servir(partage=False, hote="127.0.0.1", port=port, debug=False)
+
+
+def attendre(url, delai_s=120):
+    import requests
+
+    limite = time.monotonic() + delai_s
+    while time.monotonic() < limite:
+        try:
+            if requests.get(url, timeout=1).ok:
+                return
+        except requests.exceptions.RequestException:
+            pass
+        time.sleep(0.2)
+    raise TimeoutError(f"{url} ne répond pas après {delai_s} s")
+
+
+def exemples_interface(config):
+    """Entrées de la recherche de chaque exemple de l'interface ; les champs absents de l'exemple gardent leur valeur par défaut."""
+    composants = {composant['id']: composant for composant in config['components']}
+    recherche = next(dep for dep in config['dependencies'] if '/' + str(dep.get('api_name')) == API_RECHERCHE)
+    defauts = [composants[ident]['props'].get('value') for ident in recherche['inputs']]
+    exemples = []
+    for composant in composants.values():
+        if composant['type'] == 'dataset':
+            for echantillon in composant['props']['samples']:
+                valeurs = dict(zip(composant['props']['component_ids'], echantillon))
+                exemples.append([valeurs.get(ident, defaut) for ident, defaut in zip(recherche['inputs'], defauts)])
+    return exemples
+
+
+def tirer_recherche(rng, exemples, decalage_max_min):
+    entrees = list(rng.choice(exemples))
+    h, m, s = (int(x) for x in entrees[POSITION_HEURE].split(':'))
+    minutes = min(max(h * 60 + m + rng.randint(-decalage_max_min, decalage_max_min), 0), 23 * 60 + 59)
+    entrees[POSITION_HEURE] = f"{minutes // 60:02d}:{minutes % 60:02d}:{s:02d}"
+    return entrees
+
+
+def rechercher(client, entrees):
+    """(premier résultat en s, résultat final en s, erreur ou None) d'une recherche."""
+    debut = time.perf_counter()
+    premier = None
+    try:
+        job = client.submit(*entrees, api_name=API_RECHERCHE)
+        for _ in job:
+            if premier is None:
+                premier = time.perf_counter() - debut
+        resultat_md, _ = job.result()
+        total = time.perf_counter() - debut
+        if not resultat_md:
+            return premier, total, "résultat vide"
+        return premier if premier is not None else total, total, None
+    except Exception as e:
+        return premier, time.perf_counter() - debut, f"{type(e).__name__}: {e}"
+
+
+def percentiles(durees):
+    durees = sorted(durees)
+    if not durees:
+        return {}
+    return {f"p{q}_ms": round(durees[min(len(durees) - 1, int(q / 100 * len(durees)))] * 1000, 1) for q in (50, 95, 99)}
+
+
+def niveau(url, nb_utilisateurs, duree_s, exemples, decalage_max_min, graine):
+    """Résultats de `nb_utilisateurs` sessions qui enchaînent des recherches pendant `duree_s` secondes."""
+    from gradio_client import Client
+
+    clients = [Client(url, verbose=False, download_files=False) for _ in range(nb_utilisateurs)]
+    mesures, verrou = [], threading.Lock()
+    depart = threading.Barrier(nb_utilisateurs + 1)
+
+    def utilisateur(client, rng):
+        depart.wait()
+        while time.perf_counter() < fin:
+            mesure = rechercher(client, tirer_recherche(rng, exemples, decalage_max_min))
+            with verrou:
+                mesures.append(mesure)
+
+    fils = [threading.Thread(target=utilisateur, args=(client, random.Random(graine + i)), daemon=True)
+            for i, client in enumerate(clients)]
+    for fil in fils:
+        fil.start()
+    fin = time.perf_counter() + duree_s
+    debut = time.perf_counter()
+    depart.wait()
+    for fil in fils:
+        fil.join()
+    duree = time.perf_counter() - debut
+    for client in clients:
+        client.close()
+
+    reussies = [(premier, total) for premier, total, erreur in mesures if erreur is None]
+    erreurs = [erreur for _, _, erreur in mesures if erreur is not None]
+    return {'utilisateurs': nb_utilisateurs, 'recherches': len(mesures), 'duree_s': round(duree, 2),
+            'debit_par_s': round(len(reussies) / duree, 3),
+            'taux_erreur': round(len(erreurs) / len(mesures), 4) if mesures else 0.0,
+            'premier_resultat': percentiles([premier for premier, _ in reussies]),
+            'resultat_final': percentiles([total for _, total in reussies]),
+            'exemples_erreurs': sorted(set(erreurs))[:3]}
+
+
+def afficher(resultat):
+    premier, final = resultat['premier_resultat'], resultat['resultat_final']
+    print(f"  {resultat['utilisateurs']:>5} {resultat['recherches']:>10} {resultat['debit_par_s']:>8.2f} "
+          f"{premier.get('p50_ms', 0):>8.0f} {final.get('p50_ms', 0):>8.0f} {final.get('p95_ms', 0):>8.0f} "
+          f"{final.get('p99_ms', 0):>8.0f} {resultat['taux_erreur'] * 100:>7.1f} %")
+    for erreur in resultat['exemples_erreurs']:
+        print(f"        ! {erreur[:150]}")
+
+
+def executer(args):
+    resultats = []
+    with tempfile.TemporaryDirectory() as dossier:
+        preparer_base(os.path.join(dossier, "tgvmax.db"), args.stations, args.trajets)
+        adresses, arret = multiprocessing.Queue(), multiprocessing.Event()
+        stub = multiprocessing.Process(target=_servir_stub, daemon=True,
+                                       args=(args.latence_ms / 1000, args.elements, adresses, arret))
+        stub.start()
+        url_overpass, domaine_nominatim = adresses.get()
+        environnement = {
+            'ESCAPADE_DB': os.path.join(dossier, "tgvmax.db"),
+            'ESCAPADE_OVERPASS_URL': url_overpass,
+            'ESCAPADE_NOMINATIM_DOMAINE': domaine_nominatim,
+            'ESCAPADE_CACHE_GEOCODAGE': os.path.join(dossier, "cache_geocodage.db"),
+            'ESCAPADE_STORE_LIEUX': os.path.join(dossier, "lieux.db"),          # absent : API Overpass (stub)
+            'ESCAPADE_PRECALCUL': os.path.join(dossier, "recommandations.db"),  # absent : calcul à chaque recherche
+            'ESCAPADE_METRIQUES_PORT': "0",
+            'ESCAPADE_CACHE_RESULTATS_TAILLE': "256" if args.avec_cache else "0",
+        }
+        try:
+            for concurrence in args.concurrence_app:
+                port = _port_libre()
+                url = f"http://127.0.0.1:{port}/"
+                application = multiprocessing.Process(
+                    target=_servir_application, daemon=True,
+                    args=({**environnement, 'ESCAPADE_CONCURRENCE': str(concurrence)}, port, args.debit_stub,
+                          args.journal))
+                application.start()
+                try:
+                    attendre(url)
+                    from gradio_client import Client
+
+                    client = Client(url, verbose=False, download_files=False)
+                    exemples = exemples_interface(client.config)
+                    # Préchauffage hors mesure : base, index des gares, géocodage des villes.
+                    for entrees in exemples:
+                        rechercher(client, entrees)
+                    client.close()
+                    print(f"\nESCAPADE_CONCURRENCE={concurrence}, {len(exemples)} exemples, {args.duree_s:.0f} s par niveau")
+                    print(f"  {'util.':>5} {'recherches':>10} {'débit/s':>8} {'1er p50':>8} {'p50 ms':>8} {'p95 ms':>8} "
+                          f"{'p99 ms':>8} {'erreurs':>9}")
+                    for nb_utilisateurs in args.utilisateurs:
+                        resultat = niveau(url, nb_utilisateurs, args.duree_s, exemples, args.decalage_max_min, args.graine)
+                        resultat['concurrence_app'] = concurrence
+                        afficher(resultat)
+                        resultats.append(resultat)
+                finally:
+                    application.terminate()
+                    application.join()
+        finally:
+            arret.set()
+            stub.join()
+    return resultats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Test de charge de l'interface Gradio (utilisateurs simultanés).")
+    parser.add_argument("--utilisateurs", type=int, nargs='+', default=[1, 5, 10, 25, 50],
+                        help="niveaux de concurrence (sessions simultanées)")
+    parser.add_argument("--duree-s", type=float, default=30.0, help="durée de chaque niveau")
+    parser.add_argument("--concurrence-app", type=int, nargs='+', default=[1],
+                        help="valeurs de ESCAPADE_CONCURRENCE testées (une application par valeur)")
+    parser.add_argument("--avec-cache", action="store_true", help="garder le cache des résultats de l'application")
+    parser.add_argument("--decalage-max-min", type=int, default=60, help="décalage aléatoire de l'heure de départ")
+    parser.add_argument("--stations", type=int, default=300, help="nombre de gares de la base synthétique")
+    parser.add_argument("--trajets", type=int, default=200_000, help="trajets par jour")
+    parser.add_argument("--latence-ms", type=float, default=20.0, help="latence des serveurs Overpass/Nominatim")
+    parser.add_argument("--elements", type=int, default=200, help="éléments par réponse Overpass")
+    parser.add_argument("--debit-stub", type=float, default=10_000.0,
+                        help="requêtes/s autorisées vers les serveurs locaux (limiteur de l'application)")
+    parser.add_argument("--graine", type=int, default=0)
+    parser.add_argument("--sortie", help="fichier JSON des résultats")
+    parser.add_argument("--journal", default=os.devnull, help="fichier où écrire les journaux de l'application")
+    args = parser.parse_args()
+
+    resultats = executer(args)
+    if args.sortie:
+        with open(args.sortie, 'w', encoding='utf-8') as fichier:
+            json.dump({'parametres': vars(args), 'niveaux': resultats}, fichier, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
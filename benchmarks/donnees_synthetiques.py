@@ -0,0 +1,85 @@
+"""Génération de bases `tgvmax.db` synthétiques pour les benchmarks."""
+
+import csv
+import json
+import os
+import random
+import sqlite3
+import sys
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from villes import clean_city_name
+
+# Gare -> coordonnées approximatives du centre-ville
+COORDONNEES_REELLES = {
+    "PARIS (intramuros)": (48.8566, 2.3522), "MARSEILLE ST CHARLES": (43.2965, 5.3698),
+    "LYON (intramuros)": (45.7640, 4.8357), "BORDEAUX ST JEAN": (44.8378, -0.5792),
+    "TOULOUSE MATABIAU": (43.6047, 1.4442), "NICE VILLE": (43.7102, 7.2620), "ANTIBES": (43.5804, 7.1251),
+    "CANNES": (43.5528, 7.0174), "MARMANDE": (44.5000, 0.1650), "AGEN": (44.2033, 0.6163),
+    "MONTPELLIER SAINT ROCH": (43.6108, 3.8767), "NANTES": (47.2184, -1.5536), "RENNES": (48.1173, -1.6778),
+    "LILLE (intramuros)": (50.6292, 3.0573), "STRASBOURG": (48.5734, 7.7521), "AVIGNON TGV": (43.9216, 4.7860),
+    "AIX EN PROVENCE TGV": (43.4550, 5.3170), "ANGERS SAINT LAUD": (47.4784, -0.5632),
+}
+STATIONS_REELLES = list(COORDONNEES_REELLES)
+
+
+def generer_tgvmax(chemin, nb_trajets=1_000_000, nb_stations=300, graine=42):
+    """Crée (ou remplace) la table brute `tgvmax_trajets` avec des trajets aléatoires."""
+    rng = random.Random(graine)
+    stations = STATIONS_REELLES + [f"GARE SYNTHETIQUE {i:04d}" for i in range(max(0, nb_stations - len(STATIONS_REELLES)))]
+    conn = sqlite3.connect(chemin)
+    conn.execute("DROP TABLE IF EXISTS tgvmax_trajets")
+    conn.execute("CREATE TABLE tgvmax_trajets (Origine TEXT, Destination TEXT, Heure_depart TEXT, Heure_arrivee TEXT)")
+
+    def lignes():
+        for _ in range(nb_trajets):
+            origine, destination = rng.sample(stations, 2)
+            depart = rng.randrange(5 * 60, 23 * 60)
+            arrivee = (depart + rng.randrange(20, 6 * 60)) % (24 * 60)
+            yield origine, destination, f"{depart // 60:02d}:{depart % 60:02d}", f"{arrivee // 60:02d}:{arrivee % 60:02d}"
+
+    with conn:
+        conn.executemany("INSERT INTO tgvmax_trajets VALUES (?, ?, ?, ?)", lignes())
+    conn.close()
+    return stations
+
+
+def generer_export_tgvmax(chemin, nb_trajets=1_000_000, nb_stations=300, nb_jours=30, premier_jour="2024-05-01",
+                          graine=42):
+    """
+    Écrit un export CSV au format open data TGVmax (`;`, une ligne par train et par date), trains
+    répartis sur `nb_jours` dates à partir de `premier_jour`. Renvoie la liste des gares.
+    """
+    rng = random.Random(graine)
+    stations = STATIONS_REELLES + [f"GARE SYNTHETIQUE {i:04d}" for i in range(max(0, nb_stations - len(STATIONS_REELLES)))]
+    dates = [(date.fromisoformat(premier_jour) + timedelta(days=i)).isoformat() for i in range(nb_jours)]
+    with open(chemin, 'w', encoding='utf-8', newline='') as fichier:
+        ecrivain = csv.writer(fichier, delimiter=';')
+        ecrivain.writerow(["DATE", "TRAIN_NO", "ENTITY", "AXE", "ORIGINE_IATA", "DESTINATION_IATA", "Origine",
+                           "Destination", "Heure_depart", "Heure_arrivee", "od_happy_card"])
+        for i in range(nb_trajets):
+            origine, destination = rng.sample(stations, 2)
+            depart = rng.randrange(5 * 60, 23 * 60)
+            arrivee = (depart + rng.randrange(20, 6 * 60)) % (24 * 60)
+            ecrivain.writerow([dates[i * nb_jours // nb_trajets], 6000 + i % 3000, "TGV", "SUD EST", "FRXXX", "FRYYY",
+                               origine, destination, f"{depart // 60:02d}:{depart % 60:02d}",
+                               f"{arrivee // 60:02d}:{arrivee % 60:02d}", "OUI" if rng.random() < 0.8 else "NON"])
+    return stations
+
+
+def generer_fixture_gazetteer(stations, chemin, graine=42):
+    """
+    Écrit un fichier JSON utilisable par `gazetteer.GeocodeurFixture` : coordonnées réelles
+    approximatives pour les gares connues, positions aléatoires en France pour les autres.
+    """
+    rng = random.Random(graine)
+    entrees = {}
+    for station in stations:
+        lat, lon = COORDONNEES_REELLES.get(station) or (rng.uniform(43.0, 50.5), rng.uniform(-1.5, 7.5))
+        entrees[clean_city_name(station)] = {'lat': round(lat, 5), 'lon': round(lon, 5), 'boundingbox': [
+            round(lat - 0.05, 5), round(lat + 0.05, 5), round(lon - 0.07, 5), round(lon + 0.07, 5)]}
+    with open(chemin, 'w', encoding='utf-8') as fichier:
+        json.dump(entrees, fichier, ensure_ascii=False, indent=1)
+    return entrees
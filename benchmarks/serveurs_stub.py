@@ -0,0 +1,173 @@
+"""
+Serveurs HTTP locaux imitant Overpass et Nominatim, avec latence configurable
+et injection de pannes.
+
+    with ServeurStub(latence_s=0.3, nb_elements=80) as stub:
+        lieux_dans_bbox(bbox, url=stub.url_overpass)
+        Nominatim(domain=stub.domaine_nominatim, scheme="http").geocode("NICE")
+        stub.injecter(429, 504, "coupure", ("lent", 5.0))  # une panne par requête suivante
+        stub.panne_permanente = 503                         # toutes les requêtes, jusqu'à remise à None
+
+Les ways ont une emprise (`bounds` sous `out bb;`, son milieu sous `out center;`) ; avec
+`debordement=0.1`, un way sur dix est à cheval sur le bord sud, son centre hors de l'emprise demandée.
+"""
+
+import gzip
+import hashlib
+import json
+import random
+import re
+import socket
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+_BBOX = re.compile(r'\((-?[\d.]+),(-?[\d.]+),(-?[\d.]+),(-?[\d.]+)\)')
+
+_TAGS = [
+    {'tourism': 'museum'}, {'tourism': 'attraction'}, {'tourism': 'gallery'}, {'tourism': 'viewpoint'},
+    {'historic': 'castle'}, {'historic': 'monument'}, {'historic': 'ruins'}, {'historic': 'church'},
+    {'historic': 'cathedral'},
+]
+
+
+def _graine(texte):
+    return int(hashlib.sha1(texte.encode('utf-8')).hexdigest()[:8], 16)
+
+
+DEMI_COTE_WAY = 0.002  # demi-côté de l'emprise d'un way, en degrés
+
+
+def elements_overpass(bbox, nb_elements, debordement=0.0, sortie_bb=False):
+    """
+    Éléments Overpass déterministes répartis dans une emprise (sud, ouest, nord, est). Une part
+    `debordement` des ways chevauche le bord sud ; `sortie_bb` donne leurs `bounds` au lieu de `center`.
+    """
+    s, w, n, e = bbox
+    rng = random.Random(_graine(f"{s},{w},{n},{e}"))
+    debut_id = rng.randrange(10 ** 6) * 10 ** 4  # mêmes identifiants quelle que soit la requête
+    elements = []
+    for i in range(nb_elements):
+        tags = dict(rng.choice(_TAGS))
+        if rng.random() < 0.9:
+            tags['name'] = f"Lieu {debut_id + i}"
+        if rng.random() < 0.3:
+            tags['wikipedia'] = f"fr:Lieu {debut_id + i}"
+        lat, lon = rng.uniform(s, n), rng.uniform(w, e)
+        if rng.random() < 0.6:
+            elements.append({'type': 'node', 'id': debut_id + i, 'lat': lat, 'lon': lon, 'tags': tags})
+        else:
+            if debordement and rng.random() < debordement:
+                lat = s - DEMI_COTE_WAY / 2
+            bornes = {'minlat': lat - DEMI_COTE_WAY, 'minlon': lon - DEMI_COTE_WAY,
+                      'maxlat': lat + DEMI_COTE_WAY, 'maxlon': lon + DEMI_COTE_WAY}
+            way = {'type': 'way', 'id': debut_id + i, 'tags': tags}
+            if sortie_bb:
+                way['bounds'] = bornes
+            else:  # centre de l'emprise, comme Overpass
+                way['center'] = {'lat': (bornes['minlat'] + bornes['maxlat']) / 2,
+                                 'lon': (bornes['minlon'] + bornes['maxlon']) / 2}
+            elements.append(way)
+    return elements
+
+
+def localisation_nominatim(nom):
+    """Réponse Nominatim déterministe (quelque part en France) pour un nom de ville."""
+    rng = random.Random(_graine(nom))
+    lat, lon = rng.uniform(43.0, 50.5), rng.uniform(-1.5, 7.5)
+    return {'place_id': _graine(nom), 'lat': f"{lat:.6f}", 'lon': f"{lon:.6f}", 'display_name': f"{nom}, France",
+            'boundingbox': [f"{lat - 0.05:.6f}", f"{lat + 0.05:.6f}", f"{lon - 0.07:.6f}", f"{lon + 0.07:.6f}"]}
+
+
+class ServeurStub:
+    """Overpass (`/api/interpreter`) et Nominatim (`/search`) locaux, dans un thread."""
+
+    def __init__(self, latence_s=0.0, nb_elements=50, hote="127.0.0.1", port=0, debordement=0.0):
+        self.latence_s, self.nb_elements, self.debordement = latence_s, nb_elements, debordement
+        self.nb_requetes, self.nb_connexions, self.octets_envoyes = 0, 0, 0
+        self.pannes = deque()
+        self.panne_permanente = None
+        self._verrou = threading.Lock()
+        stub = self
+
+        class Gestionnaire(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def setup(self):
+                super().setup()
+                # En-têtes et corps partent en deux écritures : sans TCP_NODELAY, l'ACK retardé
+                # ajoute ~40 ms à chaque réponse sur une connexion keep-alive.
+                self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                with stub._verrou:
+                    stub.nb_connexions += 1
+
+            def _repondre(self, code, corps):
+                donnees = json.dumps(corps).encode('utf-8')
+                compresse = 'gzip' in self.headers.get('Accept-Encoding', '')
+                if compresse:
+                    donnees = gzip.compress(donnees, compresslevel=5)
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json")
+                if compresse:
+                    self.send_header("Content-Encoding", "gzip")
+                if code == 429:
+                    self.send_header("Retry-After", "0")
+                self.send_header("Content-Length", str(len(donnees)))
+                self.end_headers()
+                self.wfile.write(donnees)
+                with stub._verrou:
+                    stub.octets_envoyes += len(donnees)
+
+            def do_GET(self):
+                with stub._verrou:
+                    stub.nb_requetes += 1
+                    panne = stub.pannes.popleft() if stub.pannes else stub.panne_permanente
+                if stub.latence_s:
+                    time.sleep(stub.latence_s)
+                if panne == "coupure":  # connexion fermée sans réponse
+                    self.close_connection = True
+                    self.connection.shutdown(socket.SHUT_RDWR)
+                    return
+                if isinstance(panne, tuple) and panne[0] == "lent":
+                    time.sleep(panne[1])
+                elif isinstance(panne, int):
+                    self._repondre(panne, {'erreur': f"panne injectée ({panne})"})
+                    return
+                url = urlsplit(self.path)
+                parametres = parse_qs(url.query)
+                if url.path.endswith('/interpreter'):
+                    requete = parametres.get('data', [''])[0]
+                    elements, sortie_bb = [], "out bb" in requete
+                    for bbox in dict.fromkeys(_BBOX.findall(requete)):
+                        elements += elements_overpass(tuple(map(float, bbox)), stub.nb_elements,
+                                                      stub.debordement, sortie_bb)
+                    elements.sort(key=lambda el: (el['type'], el['id']))  # ordre de sortie d'Overpass
+                    self._repondre(200, {'version': 0.6, 'elements': elements})
+                elif url.path.endswith('/search'):
+                    self._repondre(200, [localisation_nominatim(parametres.get('q', [''])[0])])
+                else:
+                    self._repondre(404, {'erreur': url.path})
+
+        self._serveur = ThreadingHTTPServer((hote, port), Gestionnaire)
+        self._serveur.daemon_threads = True
+        self.domaine_nominatim = f"{hote}:{self._serveur.server_address[1]}"
+        self.url = f"http://{self.domaine_nominatim}"
+        self.url_overpass = f"{self.url}/api/interpreter"
+
+    def injecter(self, *pannes):
+        """Pannes des prochaines requêtes, une par requête : code HTTP, "coupure" ou ("lent", secondes)."""
+        with self._verrou:
+            self.pannes.extend(pannes)
+
+    def __enter__(self):
+        threading.Thread(target=self._serveur.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self._serveur.shutdown()
+        self._serveur.server_close()
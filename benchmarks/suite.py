@@ -0,0 +1,255 @@
+"""
+Suite de benchmarks reproductible : chaque étape de l'application, puis la recherche complète,
+sur une base `tgvmax.db` synthétique et des serveurs Overpass/Nominatim locaux.
+
+La base (nombre de gares, trajets par jour) et les serveurs (latence, nombre d'éléments par
+réponse Overpass) sont paramétrables ; les graines sont fixes, deux exécutions avec les mêmes
+paramètres mesurent donc exactement le même travail. Les résultats sont écrits en JSON
+(durées en ms par étape, paramètres, commit) pour comparer deux commits :
+
+    python benchmarks/suite.py --sortie avant.json
+    git checkout autre-branche
+    python benchmarks/suite.py --sortie apres.json --comparer avant.json
+
+`--comparer` affiche le rapport des médianes et sort en erreur (code 1) si une étape est plus
+lente que `--seuil` fois la référence, et d'au moins `--tolerance-ms` (bruit des étapes rapides).
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RACINE)
+
+import collecte
+import gazetteer
+import horaires
+import traces
+from benchmarks.donnees_synthetiques import generer_fixture_gazetteer, generer_tgvmax
+from benchmarks.serveurs_stub import ServeurStub
+from itineraire import creer_itineraire_visite_avec_trajet, optimiser_itineraire
+
+VERSION_FORMAT = 1
+# (ville de départ, destination, heure de départ, temps de trajet maximum, heures sur place)
+RECHERCHES = [("MARMANDE", "BORDEAUX ST JEAN", "08:00:00", "02:00:00", 5),
+              ("NICE", "MARSEILLE ST CHARLES", "09:00:00", "01:30:00", 4),
+              ("BORDEAUX ST JEAN", "TOULOUSE MATABIAU", "07:30:00", "02:00:00", 8),
+              ("MARSEILLE ST CHARLES", "AVIGNON TGV", "10:00:00", "01:45:00", 5)]
+
+
+def preparer_base(chemin, nb_stations, nb_trajets):
+    """Base synthétique au schéma de l'application (horaires normalisés, gazetteer rempli)."""
+    stations = generer_tgvmax(chemin, nb_trajets, nb_stations)
+    fixture = os.path.join(os.path.dirname(chemin), "gares.json")
+    generer_fixture_gazetteer(stations, fixture)
+    conn = sqlite3.connect(chemin)
+    horaires.construire_schema_normalise(conn)
+    gazetteer.construire_gazetteer(conn, gazetteer.GeocodeurFixture(fixture))
+    conn.close()
+
+
+def charger_application(dossier, stub):
+    """Importe `train_project` (sans effet de bord) configuré pour la base et les serveurs locaux."""
+    os.environ.update({
+        'ESCAPADE_DB': os.path.join(dossier, "tgvmax.db"),
+        'ESCAPADE_OVERPASS_URL': stub.url_overpass,
+        'ESCAPADE_NOMINATIM_DOMAINE': stub.domaine_nominatim,
+        'ESCAPADE_CACHE_GEOCODAGE': os.path.join(dossier, "cache_geocodage.db"),
+        'ESCAPADE_STORE_LIEUX': os.path.join(dossier, "lieux.db"),  # absent : API Overpass (stub)
+    })
+    # On mesure le code, pas la politesse envers les API publiques.
+    collecte.DEBITS_PAR_HOTE['127.0.0.1'] = 10_000.0
+    import train_project
+    return vars(train_project)
+
+
+def mesurer(appels, repetitions):
+    """Durées (ms) de `repetitions` passes sur `appels` ; la première passe est aussi rapportée à part."""
+    durees = []
+    for _ in range(repetitions):
+        for appel in appels:
+            debut = time.perf_counter()
+            appel()
+            durees.append((time.perf_counter() - debut) * 1000)
+    durees_triees = sorted(durees)
+    return {'nb': len(durees), 'premier_ms': round(durees[0], 3), 'min_ms': round(durees_triees[0], 3),
+            'mediane_ms': round(statistics.median(durees), 3),
+            'p95_ms': round(durees_triees[min(len(durees) - 1, int(0.95 * len(durees)))], 3),
+            'max_ms': round(durees_triees[-1], 3)}
+
+
+def verifier_client_deconnecte(app, r, progress, delai_s=30):
+    """
+    Deux recherches identiques simultanées dans l'interface en flux : le premier client se déconnecte
+    (Gradio ferme son générateur) pendant que le second attend le calcul regroupé, qui doit aboutir.
+    """
+    cache = app['cache_escapades']
+    cache.vider()
+    premier = app['trouver_escapade_en_flux'](r[0], r[2], r[3], r[4], progress=progress)
+    next(premier)
+    regroupees, resultat = cache.statistiques()['regroupees'], []
+    second = threading.Thread(target=lambda: resultat.append(app['trouver_escapade'](r[0], r[2], r[3], r[4], progress=progress)))
+    second.start()
+    limite = time.monotonic() + delai_s
+    while cache.statistiques()['regroupees'] == regroupees and time.monotonic() < limite:
+        time.sleep(0.001)
+    premier.close()
+    second.join(delai_s)
+    assert resultat and resultat[0][0], "la recherche regroupée sur un client déconnecté n'a pas abouti"
+
+
+def verifier_connexions_bornees(app, progress, nb_recherches=20):
+    """Chaque recherche évalue ses villes dans un nouveau pool de threads : leurs connexions SQLite sont fermées."""
+    pool = app['obtenir_pool']()
+    for i in range(nb_recherches):
+        r = RECHERCHES[i % len(RECHERCHES)]
+        app['cache_escapades'].vider()
+        app['trouver_escapade'](r[0], r[2], r[3], r[4], progress=progress)
+    vivants = threading.active_count()
+    assert len(pool._connexions) <= vivants, \
+        f"{len(pool._connexions)} connexions SQLite ouvertes pour {vivants} threads après {nb_recherches} recherches"
+
+
+def executer(args):
+    sans_progression = lambda *a, **k: None
+    with tempfile.TemporaryDirectory() as dossier:
+        debut = time.perf_counter()
+        preparer_base(os.path.join(dossier, "tgvmax.db"), args.stations, args.trajets)
+        preparation_s = time.perf_counter() - debut
+        with ServeurStub(latence_s=args.latence_ms / 1000, nb_elements=args.elements) as stub:
+            app = charger_application(dossier, stub)
+            etapes = {}
+
+            etapes['trouver_destinations_par_temps'] = mesurer(
+                [lambda r=r: app['trouver_destinations_par_temps'](r[0], r[3]) for r in RECHERCHES], args.repetitions)
+            etapes['trouver_train_ideal'] = mesurer(
+                [lambda r=r: app['trouver_train_ideal'](r[0], r[1], r[2]) for r in RECHERCHES], args.repetitions)
+            etapes['get_lieux_touristiques'] = mesurer(
+                [lambda r=r: app['get_lieux_touristiques'](r[1]) for r in RECHERCHES], args.repetitions)
+
+            lieux_par_ville = {r[1]: app['get_lieux_touristiques'](r[1]) for r in RECHERCHES}
+            lieux_tries = {ville: sorted(lieux, key=lambda lieu: (-lieu.score_pertinence, lieu.temps_visite_min))
+                           for ville, lieux in lieux_par_ville.items()}
+            etapes['creer_itineraire_visite_avec_trajet'] = mesurer(
+                [lambda r=r: creer_itineraire_visite_avec_trajet(lieux_tries[r[1]], r[4] * 60) for r in RECHERCHES],
+                args.repetitions)
+            etapes['optimiser_itineraire'] = mesurer(
+                [lambda r=r: optimiser_itineraire(lieux_par_ville[r[1]], r[4] * 60) for r in RECHERCHES],
+                args.repetitions)
+
+            cartes = []
+            for r in RECHERCHES:
+                destinations = app['trouver_destinations_par_temps'](r[0], r[3])
+                itineraire, _ = optimiser_itineraire(lieux_par_ville[r[1]], r[4] * 60)
+                cartes.append((r[0], destinations, itineraire, r[1]))
+            # Construction et rendu HTML, comme gradio_folium à chaque réponse.
+            etapes['generer_carte_recommandation'] = mesurer(
+                [lambda c=c: app['generer_carte_recommandation'](*c).get_root().render() for c in cartes],
+                args.repetitions)
+
+            def recherche(r, en_cache=False):
+                if not en_cache:
+                    app['cache_escapades'].vider()
+                return app['trouver_escapade'](r[0], r[2], r[3], r[4], progress=sans_progression)
+
+            def premier_resultat(r):
+                app['cache_escapades'].vider()
+                flux = app['trouver_escapade_en_flux'](r[0], r[2], r[3], r[4], progress=sans_progression)
+                # Premier classement provisoire (la première étape annonce seulement le nombre de candidats).
+                next(flux, None), next(flux, None)
+                flux.close()
+
+            etapes['trouver_escapade'] = mesurer([lambda r=r: recherche(r) for r in RECHERCHES], args.repetitions)
+            etapes['trouver_escapade_premier_resultat'] = mesurer(
+                [lambda r=r: premier_resultat(r) for r in RECHERCHES], args.repetitions)
+            etapes['trouver_escapade_en_cache'] = mesurer(
+                [lambda r=r: recherche(r, en_cache=True) for r in RECHERCHES], args.repetitions)
+            verifier_client_deconnecte(app, RECHERCHES[0], sans_progression)
+            verifier_connexions_bornees(app, sans_progression)
+
+    return {
+        'version': VERSION_FORMAT,
+        'commit': _commit(),
+        'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'machine': f"{platform.system()} {platform.machine()}, {os.cpu_count()} CPU",
+        'parametres': {'stations': args.stations, 'trajets': args.trajets, 'latence_ms': args.latence_ms,
+                       'elements': args.elements, 'repetitions': args.repetitions},
+        'preparation_s': round(preparation_s, 2),
+        'etapes': etapes,
+    }
+
+
+def _commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=RACINE, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def comparer(reference, resultats, seuil, tolerance_ms=1.0):
+    """Affiche le rapport des médianes étape par étape ; renvoie les étapes en régression."""
+    if reference.get('parametres') != resultats['parametres']:
+        print(f"⚠️  paramètres différents de la référence : {reference.get('parametres')}")
+    print(f"{'étape':38s} {reference.get('commit') or '?':>10s} {resultats['commit'] or '?':>10s}   rapport")
+    regressions = []
+    for nom, mesure in resultats['etapes'].items():
+        ancienne = reference.get('etapes', {}).get(nom)
+        if ancienne is None:
+            print(f"{nom:38s} {'-':>10s} {mesure['mediane_ms']:8.2f}ms   (nouvelle)")
+            continue
+        rapport = mesure['mediane_ms'] / max(ancienne['mediane_ms'], 1e-6)
+        lent = rapport > seuil and mesure['mediane_ms'] - ancienne['mediane_ms'] >= tolerance_ms
+        alerte = "  ❌ régression" if lent else ""
+        if alerte:
+            regressions.append(nom)
+        print(f"{nom:38s} {ancienne['mediane_ms']:8.2f}ms {mesure['mediane_ms']:8.2f}ms   x{rapport:5.2f}{alerte}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks par étape et de bout en bout, résultats en JSON.")
+    parser.add_argument("--stations", type=int, default=300, help="nombre de gares de la base synthétique")
+    parser.add_argument("--trajets", type=int, default=200_000, help="trajets par jour")
+    parser.add_argument("--latence-ms", type=float, default=20.0, help="latence des serveurs Overpass/Nominatim")
+    parser.add_argument("--elements", type=int, default=200, help="éléments par réponse Overpass")
+    parser.add_argument("--repetitions", type=int, default=5, help="passes sur les recherches de référence")
+    parser.add_argument("--sortie", help="fichier JSON des résultats (sortie standard sinon)")
+    parser.add_argument("--comparer", help="résultats JSON de référence (autre commit)")
+    parser.add_argument("--seuil", type=float, default=1.2, help="rapport des médianes signalé comme régression")
+    parser.add_argument("--tolerance-ms", type=float, default=1.0, help="écart de médiane en dessous duquel rien n'est signalé")
+    args = parser.parse_args(argv)
+
+    # Sortie standard réservée au JSON : messages de l'application sur la sortie d'erreur, sans le
+    # journal par recherche (les traces restent actives, comme en production).
+    traces.journal.disabled = True
+    with contextlib.redirect_stdout(sys.stderr):
+        resultats = executer(args)
+    texte = json.dumps(resultats, ensure_ascii=False, indent=2)
+    if args.sortie:
+        with open(args.sortie, 'w', encoding='utf-8') as fichier:
+            fichier.write(texte + "\n")
+    else:
+        print(texte)
+    if args.comparer:
+        with open(args.comparer, encoding='utf-8') as fichier:
+            reference = json.load(fichier)
+        if comparer(reference, resultats, args.seuil, args.tolerance_ms):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
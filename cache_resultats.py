@@ -0,0 +1,166 @@
+"""
+Cache des résultats de recherche, devant `trouver_escapade`.
+
+Les recherches populaires (celles des exemples de l'interface notamment) refont à chaque
+clic toutes les requêtes SQL, géocodages et appels Overpass. `CacheResultats` garde les
+derniers résultats :
+
+- éviction LRU au-delà de `taille_max` entrées et expiration après `ttl_s` secondes ;
+- regroupement des requêtes identiques simultanées : un seul calcul tourne, les autres
+  appels attendent son résultat (ou son exception) au lieu de le refaire ; si son demandeur
+  l'abandonne, un des appels en attente le reprend ;
+- `obtenir_en_flux` pour un calcul qui produit des résultats intermédiaires (générateur) :
+  ils sont relayés au demandeur, seul le résultat final est mis en cache ;
+- des compteurs (hits, misses, requêtes regroupées, évictions) et le taux de succès.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+import traces
+
+TAILLE_MAX = 256
+TTL_S = 3600
+
+
+class CalculAbandonne(RuntimeError):
+    """Le calcul attendu a été abandonné par son demandeur avant d'avoir abouti."""
+
+
+class _Calcul:
+    """Calcul en cours pour une clé, attendu par les requêtes identiques."""
+
+    def __init__(self):
+        self.termine = threading.Event()
+        self.valeur, self.erreur = None, None
+
+
+class CacheResultats:
+    """Cache LRU à durée de vie, avec un seul calcul à la fois par clé."""
+
+    def __init__(self, taille_max=TAILLE_MAX, ttl_s=TTL_S):
+        self.taille_max, self.ttl_s = taille_max, ttl_s
+        self._entrees = OrderedDict()  # clé -> (expiration, valeur)
+        self._en_cours = {}
+        self._verrou = threading.Lock()
+        self.compteurs = {'hits': 0, 'misses': 0, 'regroupees': 0, 'evictions_taille': 0, 'evictions_ttl': 0}
+
+    def _ranger(self, cle, valeur):
+        self._entrees[cle] = (time.monotonic() + self.ttl_s, valeur)
+        self._entrees.move_to_end(cle)
+        while len(self._entrees) > self.taille_max:
+            _, (expiration, _) = self._entrees.popitem(last=False)
+            self.compteurs['evictions_ttl' if expiration <= time.monotonic() else 'evictions_taille'] += 1
+
+    def _reserver(self, cle):
+        """(True, valeur) si `cle` est en cache, sinon (False, calcul en cours, l'appelant en est-il le propriétaire)."""
+        with self._verrou:
+            entree = self._entrees.get(cle)
+            if entree is not None:
+                if entree[0] > time.monotonic():
+                    self._entrees.move_to_end(cle)
+                    self.compteurs['hits'] += 1
+                    traces.compter("cache_resultats", resultat="hit")
+                    return True, entree[1], False
+                del self._entrees[cle]
+                self.compteurs['evictions_ttl'] += 1
+            calcul = self._en_cours.get(cle)
+            proprietaire = calcul is None
+            if proprietaire:
+                self.compteurs['misses'] += 1
+                traces.compter("cache_resultats", resultat="miss")
+                calcul = self._en_cours[cle] = _Calcul()
+            else:
+                self.compteurs['regroupees'] += 1
+                traces.compter("cache_resultats", resultat="regroupee")
+            return False, calcul, proprietaire
+
+    @staticmethod
+    def _attendre(calcul):
+        calcul.termine.wait()
+        if calcul.erreur is not None:
+            raise calcul.erreur
+        return calcul.valeur
+
+    def _reserver_ou_attendre(self, cle):
+        """
+        (True, valeur) en cache ou calculée par un appel identique, sinon (False, calcul) dont l'appelant
+        est le propriétaire. Un calcul attendu puis abandonné par son demandeur n'est pas une erreur :
+        la clé est réservée à nouveau, l'un des appels en attente reprend le calcul et les autres l'attendent.
+        """
+        while True:
+            trouve, calcul, proprietaire = self._reserver(cle)
+            if trouve:
+                return True, calcul
+            if proprietaire:
+                return False, calcul
+            try:
+                return True, self._attendre(calcul)
+            except CalculAbandonne:
+                continue
+
+    def _terminer(self, cle, calcul, garder):
+        with self._verrou:
+            if calcul.erreur is None and (garder is None or garder(calcul.valeur)):
+                self._ranger(cle, calcul.valeur)
+            del self._en_cours[cle]
+        calcul.termine.set()
+
+    def obtenir(self, cle, calculer, garder=None):
+        """
+        Valeur en cache pour `cle`, sinon résultat de `calculer()`, mis en cache si `garder(valeur)`
+        est vrai (toujours sans `garder`). Une exception de `calculer` n'est pas mise en cache ;
+        elle est relancée dans chacun des appels regroupés.
+        """
+        servi, calcul = self._reserver_ou_attendre(cle)
+        if servi:
+            return calcul
+
+        try:
+            calcul.valeur = calculer()
+        except BaseException as e:
+            calcul.erreur = e
+            raise
+        finally:
+            self._terminer(cle, calcul, garder)
+        return calcul.valeur
+
+    def obtenir_en_flux(self, cle, etapes, garder=None):
+        """
+        Comme `obtenir`, pour un calcul qui produit des résultats intermédiaires : `etapes()` est un
+        générateur dont la dernière valeur est le résultat. Générateur qui relaie chaque étape du calcul,
+        ou seulement le résultat final pour une valeur en cache ou un appel regroupé.
+
+        Un générateur abandonné avant la fin (client déconnecté) n'est pas mis en cache ; un des appels
+        regroupés sur lui reprend alors le calcul depuis le début, et relaie ses étapes.
+        """
+        servi, calcul = self._reserver_ou_attendre(cle)
+        if servi:
+            yield calcul
+            return
+
+        try:
+            for calcul.valeur in etapes():
+                yield calcul.valeur
+        except GeneratorExit:
+            calcul.erreur = CalculAbandonne(cle)
+            raise
+        except BaseException as e:
+            calcul.erreur = e
+            raise
+        finally:
+            self._terminer(cle, calcul, garder)
+
+    def vider(self):
+        with self._verrou:
+            self._entrees.clear()
+
+    def statistiques(self):
+        """Compteurs, taille courante et taux de succès (hits et requêtes regroupées sur le total)."""
+        with self._verrou:
+            stats = dict(self.compteurs, taille=len(self._entrees))
+        servies = stats['hits'] + stats['regroupees']
+        total = servies + stats['misses']
+        stats['taux_succes'] = servies / total if total else 0.0
+        return stats
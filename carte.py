@@ -0,0 +1,117 @@
+"""
+Rendu des cartes Folium de l'interface.
+
+Un `folium.Marker` par destination et par lieu écrit, pour chacun, sa déclaration JavaScript,
+son icône et sa popup dans un élément HTML à part : la page grossit d'environ 1,5 Kio par point
+et le rendu Jinja de chaque élément domine le temps de génération. Modes de rendu (`MODE_CARTE`) :
+
+- "geojson" (défaut) : une couche GeoJSON par nature de points (destinations, étapes), marqueurs
+  ronds, popups lues dans les propriétés des entités par un seul gabarit par couche ;
+- "cluster" : destinations en `FastMarkerCluster` (un tableau de coordonnées et une fonction de
+  création côté navigateur) ; les étapes, qui doivent rester visibles une à une, en GeoJSON ;
+- "marqueurs" : un `folium.Marker` par point (rendu historique).
+
+Les noms affichés dans les popups sont échappés et tronqués à `TAILLE_MAX_NOM` caractères.
+La carte de base (fond et marqueur de départ, dont le géocodage) est construite une fois par ville
+de départ puis copiée pour chaque recherche (`CartesDeBase`). Folium n'est importé qu'au premier
+rendu : importer ce module ne coûte rien.
+"""
+
+import copy
+import html
+import threading
+from collections import OrderedDict
+
+MODES = ("geojson", "cluster", "marqueurs")
+MODE_CARTE = "geojson"
+TAILLE_MAX_NOM = 60
+
+COULEURS = {'destination': 'blue', 'etape': 'green'}
+ICONES = {'destination': ('info-sign', 'glyphicon'), 'etape': ('camera', 'fa')}
+
+# Création des marqueurs de FastMarkerCluster côté navigateur : row = [latitude, longitude, popup].
+_CREER_MARQUEUR = """function (row) {
+    var marker = L.marker(new L.LatLng(row[0], row[1]));
+    marker.setIcon(L.AwesomeMarkers.icon({markerColor: '%s', icon: '%s', prefix: '%s'}));
+    marker.bindPopup(row[2]);
+    return marker;
+}"""
+
+
+def nom_court(nom, taille_max=TAILLE_MAX_NOM):
+    """`nom` échappé pour le HTML, tronqué à `taille_max` caractères."""
+    nom = str(nom)
+    if len(nom) > taille_max:
+        nom = nom[:taille_max - 1] + "…"
+    return html.escape(nom)
+
+
+def popup_destination(nom, duree):
+    return f"<i>{nom_court(nom)}</i><br>Durée : {html.escape(str(duree))}"
+
+
+def popup_etape(rang, lieu):
+    popup = f"<b>{rang}. {nom_court(lieu.nom)}</b><br>Visite: {lieu.temps_visite_min} min"
+    if lieu.trajet_depuis_precedent is not None:
+        popup = f"Trajet: {lieu.trajet_depuis_precedent} min<br>" + popup
+    return popup
+
+
+class CartesDeBase:
+    """Cartes de base par clé (LRU en mémoire) ; chaque appel reçoit sa propre copie."""
+
+    def __init__(self, taille_max=64):
+        self.taille_max = taille_max
+        self._cartes = OrderedDict()
+        self._verrou = threading.Lock()
+
+    def obtenir(self, cle, construire):
+        """
+        Copie de la carte gardée pour `cle`, construite par `construire()` au premier appel.
+        None (non gardé) si `construire()` renvoie None.
+        """
+        with self._verrou:
+            carte = self._cartes.get(cle)
+            if carte is not None:
+                self._cartes.move_to_end(cle)
+        if carte is None:
+            carte = construire()
+            if carte is None:
+                return None
+            with self._verrou:
+                self._cartes[cle] = carte
+                while len(self._cartes) > self.taille_max:
+                    self._cartes.popitem(last=False)
+        return copy.deepcopy(carte)
+
+
+def _couche_geojson(points, nature):
+    import folium
+
+    entites = [{'type': 'Feature', 'geometry': {'type': 'Point', 'coordinates': [longitude, latitude]},
+                'properties': {'popup': popup}} for latitude, longitude, popup in points]
+    return folium.GeoJson({'type': 'FeatureCollection', 'features': entites}, name=nature,
+                          marker=folium.CircleMarker(radius=7, color=COULEURS[nature], weight=2, fill=True,
+                                                     fill_color=COULEURS[nature], fill_opacity=0.7),
+                          popup=folium.GeoJsonPopup(fields=['popup'], labels=False))
+
+
+def ajouter_points(m, points, nature, mode=MODE_CARTE):
+    """Ajoute à la carte `m` les `points` [(latitude, longitude, popup html)] de `nature` ('destination' ou 'etape')."""
+    if not points:
+        return m
+    import folium
+    from folium.plugins import FastMarkerCluster
+
+    if mode == "marqueurs":
+        icone, prefixe = ICONES[nature]
+        for latitude, longitude, popup in points:
+            folium.Marker(location=[latitude, longitude], popup=popup,
+                          icon=folium.Icon(color=COULEURS[nature], icon=icone, prefix=prefixe)).add_to(m)
+    elif mode == "cluster" and nature == 'destination':
+        icone, prefixe = ICONES[nature]
+        FastMarkerCluster([list(point) for point in points], name=nature,
+                          callback=_CREER_MARQUEUR % (COULEURS[nature], icone, prefixe)).add_to(m)
+    else:
+        _couche_geojson(points, nature).add_to(m)
+    return m
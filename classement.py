@@ -0,0 +1,200 @@
+"""
+Classement des destinations candidates avec élagage (séparation et évaluation).
+
+Évaluer une ville coûte cher (lieux touristiques puis itinéraire optimisé). Son score,
+le nombre de lieux visités, est pourtant borné par un résumé de ses lieux : avec T minutes
+sur place, on ne visite jamais plus de lieux que les plus courts dont les durées de visite
+cumulées tiennent dans T (la marche ne fait que réduire ce nombre).
+
+`classer_en_parallele` évalue les villes par borne décroissante et garde les K meilleures ;
+dès qu'une ville ne peut plus entrer dans ce top K, elle et toutes les suivantes sont écartées
+sans être évaluées. `classer_au_fil_de_l_eau` fait le même travail en produisant le classement
+du moment après chaque ville évaluée (affichage progressif dans l'interface).
+
+`ChargeurParLots` regroupe les données des villes (requêtes Overpass groupées) sans les charger
+d'avance : un lot n'est demandé que lorsqu'une ville non élaguée en a besoin, et il la complète
+par les villes qui la suivent dans l'ordre d'évaluation.
+"""
+
+import threading
+from collections import OrderedDict, namedtuple
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+
+import traces
+from collecte import NB_WORKERS
+from villes import clean_city_name
+
+TOP_K = 3
+
+# nb_par_temps_visite : ((durée de visite en minutes, nombre de lieux), ...) par durée croissante.
+ResumeVille = namedtuple('ResumeVille', ['nb_par_temps_visite', 'nb_pertinents'])
+
+
+def resumer_lieux(lieux):
+    """Résumé (nombre de lieux par durée de visite, lieux pertinents) d'une liste de lieux."""
+    nb_par_temps = {}
+    for lieu in lieux:
+        nb_par_temps[lieu.temps_visite_min] = nb_par_temps.get(lieu.temps_visite_min, 0) + 1
+    return ResumeVille(tuple(sorted(nb_par_temps.items())), sum(1 for lieu in lieux if lieu.score_pertinence))
+
+
+def nb_lieux(resume):
+    return sum(nb for _, nb in resume.nb_par_temps_visite)
+
+
+def borne_score(resume, temps_sur_place_min):
+    """
+    Nombre maximal de lieux visitables en `temps_sur_place_min` (plus courtes visites d'abord,
+    marche ignorée). -1 pour une ville sans lieux : son évaluation ne donne aucun résultat.
+    """
+    if not resume.nb_par_temps_visite:
+        return -1
+    borne, reste = 0, temps_sur_place_min
+    for temps_visite, nb in resume.nb_par_temps_visite:
+        pris = min(nb, reste // temps_visite)
+        borne += pris
+        reste -= pris * temps_visite
+        if pris < nb:
+            break
+    return borne
+
+
+class ResumesVilles:
+    """Résumés des villes déjà évaluées (LRU en mémoire), clé `clean_city_name`."""
+
+    def __init__(self, taille_max=4096):
+        self.taille_max = taille_max
+        self._resumes = OrderedDict()
+        self._verrou = threading.Lock()
+
+    def lire(self, ville):
+        with self._verrou:
+            cle = clean_city_name(ville)
+            if cle in self._resumes:
+                self._resumes.move_to_end(cle)
+            return self._resumes.get(cle)
+
+    def enregistrer(self, ville, resume):
+        with self._verrou:
+            self._resumes[clean_city_name(ville)] = resume
+            self._resumes.move_to_end(clean_city_name(ville))
+            if len(self._resumes) > self.taille_max:
+                self._resumes.popitem(last=False)
+
+
+def ordre_evaluation(bornes):
+    """Indices des candidats dans l'ordre où ils sont évalués : borne décroissante, puis ordre d'origine."""
+    return sorted(range(len(bornes)), key=lambda i: (-bornes[i], i))
+
+
+class ChargeurParLots:
+    """
+    Données de candidats chargées à la demande par lots : `charger_lot([candidat, ...]) -> {candidat: données}`.
+
+    Le premier appel de `obtenir(c)` charge c et les candidats suivants de `ordre` pas encore demandés
+    (`taille_lot` au plus) ; les threads qui demandent un candidat du lot en cours attendent ce lot au
+    lieu d'en lancer un autre. Les élagages venant après un chargement, au plus `taille_lot - 1` candidats
+    d'un lot peuvent être écartés sans que leurs données servent.
+    """
+
+    def __init__(self, ordre, charger_lot, taille_lot):
+        self.charger_lot, self.taille_lot = charger_lot, taille_lot
+        self._ordre, self._suivant = list(ordre), 0
+        self._lots = {}  # candidat -> Future du lot qui le contient
+        self._verrou = threading.Lock()
+
+    def _reserver_lot(self, candidat):
+        lot = [candidat]
+        while len(lot) < self.taille_lot and self._suivant < len(self._ordre):
+            autre = self._ordre[self._suivant]
+            self._suivant += 1
+            if autre not in self._lots and autre not in lot:
+                lot.append(autre)
+        return lot
+
+    def obtenir(self, candidat, defaut=None):
+        with self._verrou:
+            future = self._lots.get(candidat)
+            lot = None
+            if future is None:
+                lot, future = self._reserver_lot(candidat), Future()
+                for membre in lot:
+                    self._lots[membre] = future
+        if lot is not None:
+            try:
+                future.set_result(self.charger_lot(lot))
+            except Exception as e:
+                future.set_exception(e)
+        return future.result().get(candidat, defaut)
+
+
+def classer_au_fil_de_l_eau(candidats, evaluer, bornes, k=TOP_K, nb_workers=NB_WORKERS):
+    """
+    Top K des candidats selon `evaluer(candidat) -> (score, resultat) | None`, sans évaluer ceux dont
+    la borne (`bornes[i]` >= score du candidat i) ne permet plus d'entrer dans le top K.
+
+    Générateur : après chaque évaluation terminée, produit (candidat, resultat ou None, top, nb_traites,
+    nb_elagues), où `top` est la liste [(score, candidat, resultat)] du moment, triée comme un parcours
+    séquentiel le ferait (score décroissant puis ordre de `candidats`). Le dernier `top` produit est le
+    classement final ; les candidats élagués sont comptés dans `nb_traites`.
+    """
+    ordre = iter(ordre_evaluation(bornes))
+    top = []  # (-score, i, resultat), trié
+    traites, elagues = 0, 0
+
+    def peut_entrer(i):
+        if bornes[i] < 0:
+            return False
+        if len(top) < k:
+            return True
+        return (-bornes[i], i) < top[-1][:2]
+
+    evaluer = traces.propager(evaluer)
+    with ThreadPoolExecutor(max_workers=nb_workers) as pool:
+        en_cours = {}
+        epuise = False
+
+        def alimenter():
+            # Les bornes sont décroissantes dans `ordre` : le premier candidat qui ne peut plus
+            # entrer dans le top K arrête tout le reste.
+            nonlocal epuise, elagues
+            while not epuise and len(en_cours) < nb_workers:
+                i = next(ordre, None)
+                if i is None:
+                    epuise = True
+                elif peut_entrer(i):
+                    en_cours[pool.submit(evaluer, candidats[i])] = i
+                else:
+                    elagues += 1 + sum(1 for _ in ordre)
+                    epuise = True
+
+        alimenter()
+        while en_cours:
+            termines, _ = wait(en_cours, return_when=FIRST_COMPLETED)
+            for future in termines:
+                i = en_cours.pop(future)
+                traites += 1
+                try:
+                    resultat = future.result()
+                except Exception as e:
+                    print(f"   -> Erreur pendant l'évaluation de {candidats[i]!r} : {e}")
+                    resultat = None
+                if resultat is not None:
+                    top.append((-resultat[0], i, resultat[1]))
+                    top.sort(key=lambda entree: entree[:2])
+                    del top[k:]
+                alimenter()
+                yield (candidats[i], resultat, [(-score, candidats[j], res) for score, j, res in top],
+                       traites + elagues, elagues)
+
+
+def classer_en_parallele(candidats, evaluer, bornes, k=TOP_K, nb_workers=NB_WORKERS, progression=None):
+    """
+    Comme `classer_au_fil_de_l_eau`, sans les étapes intermédiaires : renvoie (top, nb_elagues).
+    `progression(nb_traites, nb_total, candidat)` est appelée depuis le thread appelant.
+    """
+    top, elagues = [], 0
+    for candidat, _, top, traites, elagues in classer_au_fil_de_l_eau(candidats, evaluer, bornes, k, nb_workers):
+        if progression:
+            progression(traites, len(candidats), candidat)
+    return top, elagues
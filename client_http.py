@@ -0,0 +1,278 @@
+"""
+Client HTTP partagé pour Overpass et Nominatim.
+
+Un `requests.get` nu par ville ouvre une connexion TCP (et TLS) à chaque appel, sans
+délai global ni reprise. `ClientHTTP` centralise les appels sortants :
+
+- une `Session` unique : connexions keep-alive réutilisées (pool par hôte), réponses gzip ;
+- des délais bornés : connexion, lecture, et budget total par appel (reprises et attente
+  du limiteur de débit comprises) ;
+- des reprises avec attente exponentielle sur 429/502/503/504 et erreurs réseau
+  (l'en-tête Retry-After est respecté) ;
+- un disjoncteur par hôte : après `seuil_echecs` échecs consécutifs, les appels échouent
+  immédiatement (`CircuitOuvert`) pendant `delai_reouverture_s`, puis un appel d'essai
+  décide de la refermeture ;
+- un histogramme des latences et des compteurs par hôte (`statistiques()`).
+
+Les exceptions levées dérivent de `requests.exceptions.RequestException` : le code
+appelant qui rattrape déjà les erreurs réseau n'a pas à changer.
+"""
+
+import random
+import threading
+import time
+from bisect import bisect_left
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import traces
+from collecte import NB_WORKERS, limiteur_pour
+
+USER_AGENT = "mon_appli_itineraire_gradio"
+CODES_A_REESSAYER = {429, 502, 503, 504}
+ERREURS_A_REESSAYER = (requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+                       requests.exceptions.ChunkedEncodingError)
+
+# Bornes supérieures des seaux de l'histogramme, en millisecondes.
+BORNES_LATENCE_MS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+
+class CircuitOuvert(requests.exceptions.ConnectionError):
+    """L'hôte est considéré en panne : l'appel n'a pas été tenté."""
+
+
+class DelaiDepasse(requests.exceptions.Timeout):
+    """Le budget total de l'appel est épuisé (reprises ou attente du limiteur de débit)."""
+
+
+class HistogrammeLatence:
+    """Histogramme à seaux fixes ; les quantiles sont estimés par la borne du seau."""
+
+    def __init__(self, bornes=BORNES_LATENCE_MS):
+        self.bornes = tuple(bornes)
+        self.comptes = [0] * (len(self.bornes) + 1)
+        self.nb, self.somme_ms, self.max_ms = 0, 0.0, 0.0
+
+    def ajouter(self, latence_ms):
+        self.comptes[bisect_left(self.bornes, latence_ms)] += 1
+        self.nb += 1
+        self.somme_ms += latence_ms
+        self.max_ms = max(self.max_ms, latence_ms)
+
+    def quantile(self, q):
+        if not self.nb:
+            return 0.0
+        rang, cumul = q * self.nb, 0
+        for i, compte in enumerate(self.comptes):
+            cumul += compte
+            if cumul >= rang:
+                return min(self.bornes[i], self.max_ms) if i < len(self.bornes) else self.max_ms
+        return self.max_ms
+
+    def resume(self):
+        seaux = {f"<={borne}": compte for borne, compte in zip(self.bornes, self.comptes)}
+        seaux[f">{self.bornes[-1]}"] = self.comptes[-1]
+        return {'nb': self.nb, 'moyenne_ms': self.somme_ms / self.nb if self.nb else 0.0,
+                'p50_ms': self.quantile(0.5), 'p95_ms': self.quantile(0.95), 'p99_ms': self.quantile(0.99),
+                'max_ms': self.max_ms, 'seaux': seaux}
+
+
+class Disjoncteur:
+    """Fermé -> ouvert après `seuil_echecs` échecs consécutifs -> semi-ouvert (un seul essai) après le délai."""
+
+    FERME, OUVERT, SEMI_OUVERT = "fermé", "ouvert", "semi-ouvert"
+
+    def __init__(self, seuil_echecs=5, delai_reouverture_s=30.0):
+        self.seuil_echecs, self.delai_reouverture_s = seuil_echecs, delai_reouverture_s
+        self.etat, self.echecs_consecutifs, self._ouvert_depuis = self.FERME, 0, 0.0
+        self._verrou = threading.Lock()
+
+    def autoriser(self):
+        with self._verrou:
+            if self.etat == self.FERME:
+                return True
+            if self.etat == self.OUVERT and time.monotonic() - self._ouvert_depuis >= self.delai_reouverture_s:
+                self.etat = self.SEMI_OUVERT
+                return True
+            return False
+
+    def succes(self):
+        with self._verrou:
+            self.etat, self.echecs_consecutifs = self.FERME, 0
+
+    def echec(self):
+        with self._verrou:
+            self.echecs_consecutifs += 1
+            if self.etat == self.SEMI_OUVERT or self.echecs_consecutifs >= self.seuil_echecs:
+                self.etat, self._ouvert_depuis = self.OUVERT, time.monotonic()
+
+    def abandonner(self):
+        """L'essai autorisé n'a pas atteint l'hôte (délai local, erreur inattendue) : un autre appel pourra le refaire."""
+        with self._verrou:
+            if self.etat == self.SEMI_OUVERT:
+                self.etat = self.OUVERT
+
+
+def _hote(url):
+    return urlsplit(url).netloc
+
+
+class ClientHTTP:
+    """Appels GET sortants : session partagée, reprises, disjoncteur et mesures par hôte."""
+
+    def __init__(self, delai_connexion_s=3.05, delai_lecture_s=30.0, delai_total_s=60.0, nb_essais=4,
+                 attente_initiale_s=0.5, attente_max_s=8.0, seuil_echecs=5, delai_reouverture_s=30.0,
+                 taille_pool=2 * NB_WORKERS):
+        self.delai_connexion_s, self.delai_lecture_s, self.delai_total_s = delai_connexion_s, delai_lecture_s, delai_total_s
+        self.nb_essais, self.attente_initiale_s, self.attente_max_s = nb_essais, attente_initiale_s, attente_max_s
+        self.seuil_echecs, self.delai_reouverture_s = seuil_echecs, delai_reouverture_s
+        self.session = requests.Session()
+        # Pas de reprise au niveau d'urllib3 : elles sont gérées (et comptées) ici.
+        adaptateur = HTTPAdapter(pool_connections=4, pool_maxsize=taille_pool, max_retries=0)
+        self.session.mount("http://", adaptateur)
+        self.session.mount("https://", adaptateur)
+        self.session.headers.update({'User-Agent': USER_AGENT, 'Accept-Encoding': "gzip, deflate"})
+        self._hotes = {}
+        self._verrou = threading.Lock()
+
+    def _etat(self, hote):
+        with self._verrou:
+            if hote not in self._hotes:
+                self._hotes[hote] = {'disjoncteur': Disjoncteur(self.seuil_echecs, self.delai_reouverture_s),
+                                     'latences': HistogrammeLatence(),
+                                     'compteurs': {'appels': 0, 'essais': 0, 'reprises': 0, 'succes': 0,
+                                                   'echecs': 0, 'rejets': 0}}
+            return self._hotes[hote]
+
+    def _compter(self, etat, cle, latence_ms=None):
+        with self._verrou:
+            etat['compteurs'][cle] += 1
+            if latence_ms is not None:
+                etat['latences'].ajouter(latence_ms)
+
+    def _attente(self, essai, response):
+        """Attente avant la reprise n° `essai` + 1 : Retry-After s'il est donné, exponentielle avec gigue sinon."""
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), self.attente_max_s)
+        return min(self.attente_max_s, self.attente_initiale_s * 2 ** essai) * random.uniform(0.5, 1.0)
+
+    def get(self, url, params=None, headers=None, timeout=None, stream=False):
+        """
+        GET avec reprises. `timeout` (secondes) borne la durée totale de l'appel, hors lecture du
+        corps avec `stream=True` (la réponse est alors à fermer, par exemple avec `with`).
+
+        Renvoie la dernière réponse reçue, y compris une erreur HTTP après épuisement des reprises
+        (à vérifier avec `raise_for_status`). Lève `CircuitOuvert`, `DelaiDepasse` ou l'erreur
+        réseau du dernier essai.
+        """
+        hote = _hote(url)
+        etat = self._etat(hote)
+        disjoncteur = etat['disjoncteur']
+        limite = time.monotonic() + (timeout or self.delai_total_s)
+        self._compter(etat, 'appels')
+        response, erreur = None, None
+        for essai in range(self.nb_essais):
+            if essai:
+                self._compter(etat, 'reprises')
+            if not disjoncteur.autoriser():
+                self._compter(etat, 'rejets')
+                traces.compter("http_rejets", hote=hote)
+                raise CircuitOuvert(f"{hote} : circuit ouvert après {disjoncteur.echecs_consecutifs} échecs")
+            # L'essai autorisé (le seul en semi-ouvert) est conclu par `succes` ou `echec`, ou rendu
+            # s'il sort autrement : sinon le disjoncteur resterait semi-ouvert et rejetterait tout.
+            conclu = False
+            try:
+                reste = limite - time.monotonic()
+                with traces.etape("limiteur", hote=hote):
+                    autorise = reste > 0 and limiteur_pour(url).acquerir(reste)
+                if not autorise:
+                    raise DelaiDepasse(f"{hote} : délai de {timeout or self.delai_total_s} s dépassé")
+                reste = limite - time.monotonic()
+                debut = time.perf_counter()
+                try:
+                    with traces.etape("http", hote=hote):
+                        response = self.session.get(url, params=params, headers=headers, stream=stream,
+                                                    timeout=(min(self.delai_connexion_s, reste), min(self.delai_lecture_s, reste)))
+                except requests.exceptions.RequestException as e:
+                    response, erreur = None, e
+                self._compter(etat, 'essais', (time.perf_counter() - debut) * 1000)
+                traces.compter("http_requetes", hote=hote, statut=response.status_code if response is not None else "erreur")
+
+                if response is not None and response.status_code < 500 and response.status_code != 429:
+                    disjoncteur.succes()
+                    conclu = True
+                    self._compter(etat, 'succes')
+                    return response
+                disjoncteur.echec()
+                conclu = True
+            finally:
+                if not conclu:
+                    disjoncteur.abandonner()
+            if response is not None and response.status_code not in CODES_A_REESSAYER:
+                break
+            # URL invalide, trop de redirections... : une reprise échouerait de la même façon.
+            if response is None and not isinstance(erreur, ERREURS_A_REESSAYER):
+                break
+            attente = self._attente(essai, response)
+            if essai == self.nb_essais - 1 or time.monotonic() + attente >= limite:
+                break
+            if response is not None:
+                response.close()  # rend la connexion au pool (corps non lu avec `stream=True`)
+            time.sleep(attente)
+        self._compter(etat, 'echecs')
+        if response is not None:
+            return response
+        raise erreur
+
+    def statistiques(self):
+        """{hôte: compteurs, état du disjoncteur et résumé des latences (par essai)}."""
+        with self._verrou:
+            return {hote: {**etat['compteurs'], 'disjoncteur': etat['disjoncteur'].etat,
+                           'latences': etat['latences'].resume()}
+                    for hote, etat in self._hotes.items()}
+
+
+# Client partagé par l'application (lieux, géocodage).
+client = ClientHTTP()
+
+
+def adaptateur_geopy(client_http=None):
+    """
+    Fabrique d'adaptateur geopy (`Nominatim(adapter_factory=adaptateur_geopy())`) qui fait passer
+    le géocodeur par `client_http` : même pool, mêmes reprises, même limiteur et mêmes mesures.
+    """
+    from geopy.adapters import AdapterHTTPError, BaseSyncAdapter
+    from geopy.exc import GeocoderParseError, GeocoderServiceError, GeocoderTimedOut, GeocoderUnavailable
+
+    client_http = client_http or client
+
+    class AdaptateurClientHTTP(BaseSyncAdapter):
+        def _requete(self, url, timeout, headers):
+            try:
+                response = client_http.get(url, headers=headers, timeout=timeout)
+            except requests.exceptions.Timeout as e:
+                raise GeocoderTimedOut(str(e))
+            except requests.exceptions.ConnectionError as e:
+                raise GeocoderUnavailable(str(e))
+            except requests.exceptions.RequestException as e:
+                raise GeocoderServiceError(str(e))
+            if response.status_code >= 400:
+                # geopy traduit le code (429 -> GeocoderRateLimited, etc.).
+                raise AdapterHTTPError(f"Non-successful status code {response.status_code}",
+                                       status_code=response.status_code, headers=response.headers, text=response.text)
+            return response
+
+        def get_text(self, url, *, timeout, headers):
+            return self._requete(url, timeout, headers).text
+
+        def get_json(self, url, *, timeout, headers):
+            response = self._requete(url, timeout, headers)
+            try:
+                return response.json()
+            except ValueError:
+                raise GeocoderParseError(f"Réponse JSON invalide :\n{response.text}")
+
+    return lambda proxies=None, ssl_context=None: AdaptateurClientHTTP(proxies=proxies, ssl_context=ssl_context)
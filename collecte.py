@@ -0,0 +1,62 @@
+"""
+Collecte concurrente auprès des services publics.
+
+Chaque destination demande un appel Overpass (et parfois Nominatim) ; `classement` les lance
+dans un pool de `NB_WORKERS` threads. Deux garde-fous protègent les services publics :
+
+- un limiteur de débit (seau à jetons) par hôte, partagé par tous les threads ;
+- un délai maximal par appel (attente du jeton comprise).
+"""
+
+import threading
+import time
+from urllib.parse import urlsplit
+
+NB_WORKERS = 8
+
+# Requêtes par seconde autorisées par hôte (politiques d'usage des instances publiques).
+DEBITS_PAR_HOTE = {
+    'nominatim.openstreetmap.org': 1.0,
+    'overpass-api.de': 2.0,
+}
+DEBIT_PAR_DEFAUT = 10.0
+
+
+class LimiteurDebit:
+    """Seau à jetons : `debit_par_s` jetons par seconde, au plus `capacite` en réserve."""
+
+    def __init__(self, debit_par_s, capacite=1):
+        self.debit_par_s, self.capacite = debit_par_s, capacite
+        self._jetons = float(capacite)
+        self._dernier = time.monotonic()
+        self._verrou = threading.Lock()
+
+    def acquerir(self, timeout=None):
+        """Attend un jeton. Renvoie False si `timeout` (en secondes) expire avant."""
+        limite = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._verrou:
+                maintenant = time.monotonic()
+                self._jetons = min(self.capacite, self._jetons + (maintenant - self._dernier) * self.debit_par_s)
+                self._dernier = maintenant
+                if self._jetons >= 1:
+                    self._jetons -= 1
+                    return True
+                attente = (1 - self._jetons) / self.debit_par_s
+            if limite is not None and maintenant + attente > limite:
+                return False
+            time.sleep(attente)
+
+
+_limiteurs = {}
+_verrou_limiteurs = threading.Lock()
+
+
+def limiteur_pour(url):
+    """Limiteur partagé de l'hôte de `url`."""
+    hote = urlsplit(url).netloc if '//' in url else url
+    with _verrou_limiteurs:
+        if hote not in _limiteurs:
+            _limiteurs[hote] = LimiteurDebit(DEBITS_PAR_HOTE.get(hote.split(':')[0], DEBIT_PAR_DEFAUT))
+        return _limiteurs[hote]
+
@@ -0,0 +1,150 @@
+"""
+Trajets avec correspondances par l'algorithme Connection Scan (CSA).
+
+Chaque ligne de `trajets` est une connexion (gare A -> gare B, départ, arrivée).
+Les connexions sont triées une fois pour toutes par heure de départ ; une requête
+est un unique parcours de ce tableau à partir de l'heure de départ souhaitée.
+
+Pour borner le nombre de trains, on garde une ligne d'arrivées au plus tôt par nombre
+de trajets k : `arrivee[k][gare]` est l'arrivée la plus tôt en exactement k trains.
+Une connexion A -> B améliore `arrivee[k][B]` si `arrivee[k-1][A]` (plus le temps de
+correspondance minimal quand k > 1) laisse le temps de la prendre.
+"""
+
+from bisect import bisect_left
+
+from horaires import heure_en_minutes, minutes_en_heure
+from villes import clean_city_name, minuscules_ascii
+
+INFINI = float('inf')
+
+
+def _heure(minutes):
+    """'HH:MM:SS' d'une heure pouvant dépasser minuit (arrivée le lendemain)."""
+    return minutes_en_heure(minutes % (24 * 60))
+
+
+class ReseauConnexions:
+    """Tableau des connexions trié par départ, prêt pour le Connection Scan."""
+
+    def __init__(self, conn, index=None, jour=None):
+        """Connexions de toutes les dates, ou du seul `jour` de circulation (voir `horaires.jour_du_voyage`)."""
+        stations = conn.execute("SELECT id, nom FROM stations ORDER BY id").fetchall()
+        self.index = index
+        self.noms = [nom for _, nom in stations]
+        self._noms_minuscules = [minuscules_ascii(nom) for nom in self.noms]
+        indice_par_id = self._indice_par_id = {id_station: i for i, (id_station, _) in enumerate(stations)}
+        filtre, parametres = (" AND jour = ?", (jour,)) if jour is not None else ("", ())
+        connexions = conn.execute(
+            "SELECT origine_id, destination_id, depart_min, depart_min + duree_min FROM trajets "
+            f"WHERE duree_min > 0{filtre} ORDER BY depart_min, id", parametres).fetchall()
+        # Listes Python plutôt que NumPy : la boucle de scan lit un élément à la fois.
+        self.origine = [indice_par_id[o] for o, _, _, _ in connexions]
+        self.destination = [indice_par_id[d] for _, d, _, _ in connexions]
+        self.depart = [dep for _, _, dep, _ in connexions]
+        self.arrivee = [arr for _, _, _, arr in connexions]
+
+    def __len__(self):
+        return len(self.depart)
+
+    def stations_correspondantes(self, ville):
+        """Indices des gares désignées par `ville` (index des gares s'il y en a un, sinon nom contenant la ville nettoyée)."""
+        if self.index is not None:
+            return [self._indice_par_id[id_station] for id_station in self.index.resoudre(ville)]
+        motif = minuscules_ascii(clean_city_name(ville))
+        return [i for i, nom in enumerate(self._noms_minuscules) if motif in nom]
+
+    def scanner(self, gares_depart, heure_depart_min, correspondance_min=10, nb_trains_max=3, heure_limite_min=INFINI):
+        """
+        Arrivées au plus tôt depuis `gares_depart` (indices), en un seul passage.
+        Renvoie (arrivee, parent) : arrivee[k][gare] et l'indice de la dernière connexion utilisée.
+        """
+        nb_gares = len(self.noms)
+        arrivee = [[INFINI] * nb_gares for _ in range(nb_trains_max + 1)]
+        parent = [[-1] * nb_gares for _ in range(nb_trains_max + 1)]
+        for gare in gares_depart:
+            arrivee[0][gare] = heure_depart_min
+        niveaux = range(1, nb_trains_max + 1)
+        origine, destination, depart, arrivees_connexion = self.origine, self.destination, self.depart, self.arrivee
+
+        for i in range(bisect_left(depart, heure_depart_min), len(depart)):
+            dep = depart[i]
+            if dep > heure_limite_min:
+                break
+            a, b, arr = origine[i], destination[i], arrivees_connexion[i]
+            for k in niveaux:
+                precedent = arrivee[k - 1][a]
+                if precedent == INFINI:
+                    continue
+                if k > 1:
+                    precedent += correspondance_min
+                if precedent <= dep and arr < arrivee[k][b]:
+                    arrivee[k][b] = arr
+                    parent[k][b] = i
+        return arrivee, parent
+
+    def _reconstruire(self, parent, k, gare):
+        """Indices des connexions (du premier au dernier train) menant à `gare` en k trains."""
+        chemin = []
+        while k > 0:
+            i = parent[k][gare]
+            chemin.append(i)
+            gare, k = self.origine[i], k - 1
+        return chemin[::-1]
+
+    @staticmethod
+    def _meilleur_niveau(arrivee, gare):
+        """Nombre de trains du trajet arrivant le plus tôt à `gare` (le plus petit en cas d'égalité), ou None."""
+        k = min(range(1, len(arrivee)), key=lambda niveau: (arrivee[niveau][gare], niveau))
+        return None if arrivee[k][gare] == INFINI else k
+
+    def _etape(self, i):
+        return (self.noms[self.origine[i]], self.noms[self.destination[i]],
+                _heure(self.arrivee[i] - self.depart[i]), _heure(self.depart[i]), _heure(self.arrivee[i]))
+
+    def _trajet(self, chemin):
+        """(resume, etapes) d'une suite de connexions, le résumé ayant la forme d'une ligne directe."""
+        premier, dernier = chemin[0], chemin[-1]
+        resume = (self.noms[self.origine[premier]], self.noms[self.destination[dernier]],
+                  _heure(self.arrivee[dernier] - self.depart[premier]), _heure(self.depart[premier]),
+                  _heure(self.arrivee[dernier]))
+        return resume, [self._etape(i) for i in chemin]
+
+    def destinations_avec_correspondances(self, ville_depart, heure_depart_str, temps_trajet_max_str,
+                                          nb_correspondances_max=1, correspondance_min=10):
+        """
+        Gares atteignables depuis `ville_depart` en partant après `heure_depart_str` et en arrivant
+        au plus tard `temps_trajet_max_str` après cette heure, avec au plus `nb_correspondances_max` changements.
+
+        Renvoie une liste de (resume, etapes) triée par heure d'arrivée, où `resume` a la même forme que
+        les lignes de `trouver_destinations_par_temps` (origine, destination, duree, heure_depart, heure_arrivee)
+        et `etapes` la liste des trains successifs au même format.
+        """
+        gares_depart = self.stations_correspondantes(ville_depart)
+        heure_depart = heure_en_minutes(heure_depart_str, arrondi_sup=True)
+        heure_limite = heure_depart + heure_en_minutes(temps_trajet_max_str)
+        arrivee, parent = self.scanner(gares_depart, heure_depart, correspondance_min,
+                                       nb_correspondances_max + 1, heure_limite)
+        atteintes = []
+        for gare in set(range(len(self.noms))) - set(gares_depart):
+            k = self._meilleur_niveau(arrivee, gare)
+            if k is not None and arrivee[k][gare] <= heure_limite:
+                atteintes.append((arrivee[k][gare], k, gare))
+        atteintes.sort()
+        return [self._trajet(self._reconstruire(parent, k, gare)) for _, k, gare in atteintes]
+
+    def trajet_au_plus_tot(self, ville_depart, ville_arrivee, heure_min_depart_str, nb_correspondances_max=1,
+                           correspondance_min=10):
+        """(resume, etapes) du trajet arrivant le plus tôt à `ville_arrivee` après l'heure donnée, ou None."""
+        gares_depart = self.stations_correspondantes(ville_depart)
+        arrivee, parent = self.scanner(gares_depart, heure_en_minutes(heure_min_depart_str, arrondi_sup=True),
+                                       correspondance_min, nb_correspondances_max + 1)
+        candidats = []
+        for gare in set(self.stations_correspondantes(ville_arrivee)) - set(gares_depart):
+            k = self._meilleur_niveau(arrivee, gare)
+            if k is not None:
+                candidats.append((arrivee[k][gare], k, gare))
+        if not candidats:
+            return None
+        _, k, gare = min(candidats)
+        return self._trajet(self._reconstruire(parent, k, gare))
@@ -0,0 +1,142 @@
+"""
+Gazetteer hors ligne des gares.
+
+Les noms de gares de `tgvmax_trajets` sont peu nombreux et changent rarement : on les
+géocode une fois pour toutes et on range coordonnées et emprise de la ville dans la
+table `stations` de `tgvmax.db`. La carte et la recherche de lieux touristiques lisent
+ensuite ces colonnes au lieu d'appeler Nominatim.
+
+Usage :
+    python gazetteer.py tgvmax.db                       # géocode via Nominatim (avec cache)
+    python gazetteer.py tgvmax.db --fixture gares.json  # fichier local à la place du géocodeur
+"""
+
+import argparse
+import json
+import sqlite3
+
+from geocodage import Localisation
+from villes import clean_city_name
+
+COLONNES_GEO = ['latitude', 'longitude', 'sud', 'nord', 'ouest', 'est']
+
+_SQL_COORDONNEES = """
+SELECT s.nom, s.latitude, s.longitude, s.sud, s.nord, s.ouest, s.est
+FROM json_each(?) AS demande
+JOIN stations s ON s.nom = demande.value
+WHERE s.latitude IS NOT NULL
+"""
+
+
+class GeocodeurFixture:
+    """
+    Remplace le géocodeur par un fichier JSON local :
+    {"NICE": {"lat": 43.7, "lon": 7.26, "boundingbox": [sud, nord, ouest, est]}, ...}
+    Les clés sont des noms nettoyés par `clean_city_name`.
+    """
+
+    def __init__(self, chemin):
+        with open(chemin, encoding='utf-8') as fichier:
+            self.entrees = json.load(fichier)
+
+    def localiser(self, nom_ville):
+        entree = self.entrees.get(clean_city_name(nom_ville))
+        if entree is None:
+            return None
+        bbox = entree.get('boundingbox')
+        return Localisation(entree['lat'], entree['lon'], tuple(float(x) for x in bbox) if bbox else None)
+
+
+def ajouter_colonnes_geo(conn):
+    """Ajoute les colonnes géographiques à `stations` si elles n'existent pas encore."""
+    existantes = {ligne[1] for ligne in conn.execute("PRAGMA table_info(stations)")}
+    with conn:
+        for colonne in COLONNES_GEO:
+            if colonne not in existantes:
+                conn.execute(f"ALTER TABLE stations ADD COLUMN {colonne} REAL")
+
+
+def gazetteer_present(conn):
+    """Indique si `stations` porte déjà des coordonnées."""
+    colonnes = {ligne[1] for ligne in conn.execute("PRAGMA table_info(stations)")}
+    return 'latitude' in colonnes and conn.execute(
+        "SELECT 1 FROM stations WHERE latitude IS NOT NULL LIMIT 1").fetchone() is not None
+
+
+def construire_gazetteer(conn, geocodeur, tout_recalculer=False):
+    """
+    Géocode chaque nom de ville distinct de `stations` (un seul appel par nom nettoyé)
+    et enregistre coordonnées et emprise. Sans `tout_recalculer`, seules les gares
+    sans coordonnées sont traitées. Renvoie (nb_villes_trouvees, nb_villes_introuvables).
+    """
+    ajouter_colonnes_geo(conn)
+    filtre = "" if tout_recalculer else "WHERE latitude IS NULL"
+    noms_nettoyes = [ligne[0] for ligne in conn.execute(f"SELECT DISTINCT nom_nettoye FROM stations {filtre}")]
+    trouvees, introuvables = 0, 0
+    for nom_nettoye in noms_nettoyes:
+        localisation = geocodeur.localiser(nom_nettoye)
+        if localisation is None:
+            introuvables += 1
+            continue
+        sud, nord, ouest, est = localisation.boundingbox or (None, None, None, None)
+        with conn:
+            conn.execute("UPDATE stations SET latitude = ?, longitude = ?, sud = ?, nord = ?, ouest = ?, est = ? "
+                         "WHERE nom_nettoye = ?",
+                         (localisation.latitude, localisation.longitude, sud, nord, ouest, est, nom_nettoye))
+        trouvees += 1
+    return trouvees, introuvables
+
+
+def _localisation(ligne):
+    _, latitude, longitude, sud, nord, ouest, est = ligne
+    return Localisation(latitude, longitude, None if sud is None else (sud, nord, ouest, est))
+
+
+def coordonnees_stations(cur, noms):
+    """{nom de gare: Localisation} pour les gares connues du gazetteer, en une seule requête."""
+    lignes = cur.execute(_SQL_COORDONNEES, (json.dumps(list(noms)),)).fetchall()
+    return {ligne[0]: _localisation(ligne) for ligne in lignes}
+
+
+def localiser_station(cur, nom_station):
+    """Localisation d'une gare (nom exact), ou None si elle n'est pas dans le gazetteer."""
+    return coordonnees_stations(cur, [nom_station]).get(nom_station)
+
+
+def localiser_ville(cur, index, ville):
+    """
+    Localisation de la ville saisie : celle de sa gare la plus desservie présente dans le gazetteer,
+    les gares étant résolues par `index` (`index_gares.IndexGares`) ; None si aucune ne l'est.
+    """
+    ids = sorted(index.resoudre(ville), key=lambda id_gare: -index.poids[id_gare])
+    if not ids:
+        return None
+    lignes = cur.execute(
+        "SELECT s.id, s.nom, s.latitude, s.longitude, s.sud, s.nord, s.ouest, s.est "
+        "FROM json_each(?) AS demande JOIN stations s ON s.id = demande.value WHERE s.latitude IS NOT NULL",
+        (json.dumps(ids),)).fetchall()
+    par_id = {ligne[0]: ligne[1:] for ligne in lignes}
+    return next((_localisation(par_id[id_gare]) for id_gare in ids if id_gare in par_id), None)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Géocode toutes les gares de tgvmax.db une fois pour toutes.")
+    parser.add_argument("db", help="chemin vers tgvmax.db")
+    parser.add_argument("--fixture", help="fichier JSON local utilisé à la place de Nominatim")
+    parser.add_argument("--tout", action="store_true", help="recalculer aussi les gares déjà géocodées")
+    args = parser.parse_args()
+
+    if args.fixture:
+        geocodeur = GeocodeurFixture(args.fixture)
+    else:
+        from geopy.geocoders import Nominatim
+        from client_http import adaptateur_geopy
+        from geocodage import CacheGeocodage
+        # Le client HTTP applique le limiteur de Nominatim (1 requête/s) ; les hits du cache ne sont pas ralentis.
+        nominatim = Nominatim(user_agent="mon_appli_itineraire_gazetteer", timeout=10, adapter_factory=adaptateur_geopy())
+        geocodeur = CacheGeocodage(nominatim)
+
+    connexion = sqlite3.connect(args.db)
+    ok, ko = construire_gazetteer(connexion, geocodeur, args.tout)
+    connexion.close()
+    print(f"✅ {ok} villes géocodées, {ko} introuvables.")
@@ -0,0 +1,196 @@
+"""
+Cache persistant des géocodages Nominatim.
+
+Nominatim est limité à une requête par seconde : sans cache, chaque recherche
+géocode la ville de départ, la ville choisie et chaque destination candidate.
+`CacheGeocodage` se place devant le géocodeur geopy :
+
+- un LRU en mémoire (par processus) pour les noms les plus demandés ;
+- une table SQLite sur disque, partagée entre redémarrages et processus ;
+- une durée de validité (TTL) par entrée, plus courte pour les échecs
+  (« cache négatif » : une ville introuvable n'est pas redemandée à chaque requête) ;
+- un seul appel au géocodeur à la fois par clé : les demandes simultanées d'une même ville
+  attendent son résultat (ou son exception) au lieu de rappeler Nominatim ;
+- des compteurs de hits/misses.
+
+Le LRU a son propre verrou : la lecture et l'écriture du disque (WAL, attente bornée par
+`DELAI_DISQUE_S` quand un autre processus écrit) se font hors de ce verrou.
+
+La clé est le nom renvoyé par `clean_city_name`.
+"""
+
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+import traces
+from villes import clean_city_name
+
+# boundingbox : (sud, nord, ouest, est) en degrés, même ordre que Nominatim.
+Localisation = namedtuple('Localisation', ['latitude', 'longitude', 'boundingbox'])
+
+_ABSENT = object()
+
+DELAI_DISQUE_S = 30.0  # attente maximale du verrou d'écriture de la base, tenu par un autre processus
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS geocodage (
+    cle TEXT PRIMARY KEY,
+    latitude REAL,
+    longitude REAL,
+    sud REAL, nord REAL, ouest REAL, est REAL,
+    horodatage REAL NOT NULL
+)
+"""
+
+
+class _Geocodage:
+    """Géocodage en cours pour une clé, attendu par les demandes simultanées de la même ville."""
+
+    __slots__ = ('termine', 'localisation', 'erreur')
+
+    def __init__(self):
+        self.termine = threading.Event()
+        self.localisation, self.erreur = None, None
+
+
+class CacheGeocodage:
+    """Géocodeur avec cache LRU en mémoire et cache SQLite sur disque."""
+
+    def __init__(self, geocodeur, chemin="cache_geocodage.db", ttl_s=30 * 24 * 3600, ttl_negatif_s=24 * 3600,
+                 taille_lru=1024):
+        self.geocodeur = geocodeur
+        self.ttl_s, self.ttl_negatif_s, self.taille_lru = ttl_s, ttl_negatif_s, taille_lru
+        self._lru = OrderedDict()
+        self._en_cours = {}
+        self._verrou = threading.Lock()  # LRU, géocodages en cours et compteurs
+        self._verrou_disque = threading.Lock()
+        self._disque = sqlite3.connect(chemin, timeout=DELAI_DISQUE_S, check_same_thread=False)
+        self._disque.execute("PRAGMA journal_mode=WAL")
+        self._disque.execute(SCHEMA)
+        self.compteurs = {'hits_memoire': 0, 'hits_disque': 0, 'misses': 0, 'regroupes': 0, 'negatifs': 0}
+
+    def _expire(self, localisation, horodatage):
+        ttl = self.ttl_s if localisation is not None else self.ttl_negatif_s
+        return time.time() - horodatage > ttl
+
+    def _memoriser(self, cle, localisation, horodatage):
+        self._lru[cle] = (localisation, horodatage)
+        self._lru.move_to_end(cle)
+        if len(self._lru) > self.taille_lru:
+            self._lru.popitem(last=False)
+
+    def _lire_memoire(self, cle):
+        """Entrée valide du LRU, ou _ABSENT (sous `_verrou`)."""
+        entree = self._lru.get(cle)
+        if entree is None or self._expire(*entree):
+            return _ABSENT
+        self._lru.move_to_end(cle)
+        self.compteurs['hits_memoire'] += 1
+        traces.compter("geocodage", resultat="hit_memoire")
+        return entree[0]
+
+    def _lire(self, cle):
+        """Entrée valide du cache (mémoire puis disque), ou _ABSENT. Le disque est lu hors du verrou du LRU."""
+        with self._verrou:
+            localisation = self._lire_memoire(cle)
+        if localisation is not _ABSENT:
+            return localisation
+        with self._verrou_disque:
+            ligne = self._disque.execute(
+                "SELECT latitude, longitude, sud, nord, ouest, est, horodatage FROM geocodage WHERE cle = ?",
+                (cle,)).fetchone()
+        if ligne is None:
+            return _ABSENT
+        latitude, longitude, sud, nord, ouest, est, horodatage = ligne
+        localisation = None if latitude is None else Localisation(
+            latitude, longitude, None if sud is None else (sud, nord, ouest, est))
+        if self._expire(localisation, horodatage):
+            return _ABSENT
+        with self._verrou:
+            self._memoriser(cle, localisation, horodatage)
+            self.compteurs['hits_disque'] += 1
+        traces.compter("geocodage", resultat="hit_disque")
+        return localisation
+
+    def _reserver(self, cle):
+        """
+        (localisation, None, False) si un géocodage concurrent vient de la mettre en mémoire, sinon
+        (_ABSENT, géocodage en cours pour `cle`, l'appelant en est-il le propriétaire).
+        """
+        with self._verrou:
+            localisation = self._lire_memoire(cle)
+            if localisation is not _ABSENT:
+                return localisation, None, False
+            geocodage = self._en_cours.get(cle)
+            proprietaire = geocodage is None
+            if proprietaire:
+                geocodage = self._en_cours[cle] = _Geocodage()
+                self.compteurs['misses'] += 1
+            else:
+                self.compteurs['regroupes'] += 1
+        traces.compter("geocodage", resultat="miss" if proprietaire else "regroupe")
+        return _ABSENT, geocodage, proprietaire
+
+    def _ecrire(self, cle, localisation):
+        horodatage = time.time()
+        sud, nord, ouest, est = (localisation.boundingbox if localisation and localisation.boundingbox
+                                 else (None, None, None, None))
+        with self._verrou:
+            self._memoriser(cle, localisation, horodatage)
+            if localisation is None:
+                self.compteurs['negatifs'] += 1
+        with self._verrou_disque, self._disque:
+            self._disque.execute("INSERT OR REPLACE INTO geocodage VALUES (?, ?, ?, ?, ?, ?, ?, ?)", (
+                cle, localisation.latitude if localisation else None, localisation.longitude if localisation else None,
+                sud, nord, ouest, est, horodatage))
+
+    def _geocoder(self, cle):
+        with traces.etape("geocodage"):
+            resultat = self.geocodeur.geocode(cle, exactly_one=True)
+        if resultat is None:
+            localisation = None
+        else:
+            bbox = resultat.raw.get('boundingbox')
+            localisation = Localisation(resultat.latitude, resultat.longitude,
+                                        tuple(float(x) for x in bbox) if bbox else None)
+        self._ecrire(cle, localisation)
+        return localisation
+
+    def localiser(self, nom_ville):
+        """
+        Coordonnées et emprise d'une ville (nom brut ou nom de gare), ou None si introuvable.
+        Les erreurs du géocodeur (réseau, quota) sont propagées, à chacune des demandes regroupées,
+        et ne sont pas mises en cache.
+        """
+        cle = clean_city_name(nom_ville)
+        localisation = self._lire(cle)
+        if localisation is not _ABSENT:
+            return localisation
+        localisation, geocodage, proprietaire = self._reserver(cle)
+        if localisation is not _ABSENT:
+            return localisation
+        if not proprietaire:
+            geocodage.termine.wait()
+            if geocodage.erreur is not None:
+                raise geocodage.erreur
+            return geocodage.localisation
+        try:
+            geocodage.localisation = self._geocoder(cle)
+        except BaseException as e:
+            geocodage.erreur = e
+            raise
+        finally:
+            with self._verrou:
+                del self._en_cours[cle]
+            geocodage.termine.set()
+        return geocodage.localisation
+
+    def statistiques(self):
+        """Compteurs et taux de succès du cache."""
+        with self._verrou:
+            stats = dict(self.compteurs)
+        hits = stats['hits_memoire'] + stats['hits_disque'] + stats['regroupes']
+        stats['taux_succes'] = hits / (hits + stats['misses']) if hits + stats['misses'] else 0.0
+        return stats
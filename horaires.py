@@ -0,0 +1,275 @@
+"""
+Schéma normalisé et indexé des horaires TGVmax.
+
+La table brute `tgvmax_trajets` ne permet que des parcours complets : le filtre
+`LOWER(Origine) LIKE '%x%'` et les durées calculées avec `julianday` ne peuvent
+utiliser aucun index. L'étape d'ingestion ci-dessous construit :
+
+- `stations` : une ligne par gare, avec un identifiant entier et le nom nettoyé ;
+- `trajets` : les départs/arrivées en minutes depuis minuit, la durée précalculée et le
+  jour de circulation (`jour`, jours depuis le 1970-01-01, NULL si la source n'est pas datée),
+  indexés sur (origine_id, jour, depart_min) et (origine_id, destination_id, jour, depart_min).
+
+Les fonctions de requête renvoient les mêmes tuples que les anciennes requêtes :
+(origine, destination, duree 'HH:MM:SS', heure_depart 'HH:MM:SS', heure_arrivee 'HH:MM:SS').
+Avec un `index_gares.IndexGares`, les gares saisies sont résolues en identifiants et les
+requêtes filtrent par égalité sur `origine_id`/`destination_id` au lieu de parcourir `stations`.
+Avec un `jour` (voir `jour_du_voyage`), seuls les trains de cette date sont considérés ; sans,
+les horaires de toutes les dates sont confondus comme auparavant.
+
+L'export open data complet se charge par `ingestion.py` (en flux, date par date) ; ce module
+ne normalise que la table brute `tgvmax_trajets`.
+
+Usage : python horaires.py chemin/vers/tgvmax.db
+"""
+
+import json
+import sqlite3
+import sys
+import time
+from datetime import date
+
+from villes import clean_city_name
+
+MINUTES_PAR_JOUR = 24 * 60
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS stations (
+    id INTEGER PRIMARY KEY,
+    nom TEXT NOT NULL UNIQUE,
+    nom_nettoye TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS trajets (
+    id INTEGER PRIMARY KEY,
+    origine_id INTEGER NOT NULL REFERENCES stations(id),
+    destination_id INTEGER NOT NULL REFERENCES stations(id),
+    jour INTEGER,
+    depart_min INTEGER NOT NULL,
+    arrivee_min INTEGER NOT NULL,
+    duree_min INTEGER NOT NULL
+);
+"""
+
+INDEX = {
+    'idx_trajets_origine_jour_depart': "trajets(origine_id, jour, depart_min)",
+    'idx_trajets_origine_destination_jour_depart': "trajets(origine_id, destination_id, jour, depart_min)",
+}
+
+_EPOQUE = date(1970, 1, 1).toordinal()
+
+# Minutes depuis minuit d'une colonne 'HH:MM', 'HH:MM:SS' ou 'AAAA-MM-JJ HH:MM:SS'.
+_MINUTES_SQL = "(CAST(strftime('%H', {col}) AS INTEGER) * 60 + CAST(strftime('%M', {col}) AS INTEGER))"
+
+# Jour (depuis le 1970-01-01) d'une colonne commençant par 'AAAA-MM-JJ', NULL pour une heure seule.
+_JOUR_SQL = ("(CASE WHEN {col} GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]*' "
+             "THEN CAST(julianday(substr({col}, 1, 10)) - 2440587.5 AS INTEGER) END)")
+
+# Les stations dont le nom contient le texte saisi (même sémantique que l'ancien LIKE '%x%',
+# sans interpréter '%' et '_' comme des jokers).
+_STATIONS_CORRESPONDANTES = "SELECT id FROM stations WHERE instr(LOWER(nom), LOWER(?)) > 0"
+
+# Les stations d'une liste d'identifiants (JSON), résolus par l'index des gares.
+_STATIONS_DESIGNEES = "SELECT value FROM json_each(?)"
+
+_COLONNES = """{o}.nom, {d}.nom,
+       printf('%02d:%02d:00', {t}.duree_min / 60, {t}.duree_min % 60) AS {prefixe}duree,
+       printf('%02d:%02d:00', {t}.depart_min / 60, {t}.depart_min % 60) AS {prefixe}heure_depart,
+       printf('%02d:%02d:00', {t}.arrivee_min / 60, {t}.arrivee_min % 60) AS {prefixe}heure_arrivee"""
+_COLONNES_RESULTAT = _COLONNES.format(t='t', o='o', d='d', prefixe='')
+
+_SQL_DESTINATIONS = """
+SELECT {colonnes}
+FROM trajets t
+JOIN stations o ON o.id = t.origine_id
+JOIN stations d ON d.id = t.destination_id
+WHERE t.origine_id IN ({origines}){jour} AND t.duree_min > 0 AND t.duree_min <= ?
+ORDER BY t.duree_min, t.id
+"""
+
+_SQL_TRAIN_IDEAL = """
+SELECT {colonnes}
+FROM trajets t
+JOIN stations o ON o.id = t.origine_id
+JOIN stations d ON d.id = t.destination_id
+WHERE t.origine_id IN ({origines})
+  AND t.destination_id IN ({destinations}){jour}
+  AND t.depart_min >= ?
+ORDER BY t.depart_min, t.id
+LIMIT 1
+"""
+
+# Pour chaque destination directe : premier train aller après l'heure demandée (même choix que
+# `_SQL_TRAIN_IDEAL`), puis dernier train retour vers les gares de départ partant après son arrivée.
+_SQL_FENETRES = """
+WITH gares(id) AS ({origines}),
+aller AS (
+    SELECT t.*, ROW_NUMBER() OVER (PARTITION BY t.destination_id ORDER BY t.depart_min, t.id) AS rang
+    FROM trajets t
+    WHERE t.origine_id IN (SELECT id FROM gares){jour} AND t.depart_min >= ? AND t.duree_min > 0
+),
+premiers AS (
+    SELECT a.*, (SELECT t.id FROM trajets t
+                 WHERE t.origine_id = a.destination_id AND t.destination_id IN (SELECT id FROM gares){jour}
+                   AND t.depart_min >= a.depart_min + a.duree_min AND t.duree_min > 0
+                 ORDER BY t.depart_min DESC, t.id LIMIT 1) AS retour_id
+    FROM aller a
+    WHERE a.rang = 1
+)
+SELECT {colonnes_aller}, {colonnes_retour}, r.depart_min - (t.depart_min + t.duree_min)
+FROM premiers t
+JOIN trajets r ON r.id = t.retour_id
+JOIN stations o ON o.id = t.origine_id
+JOIN stations d ON d.id = t.destination_id
+JOIN stations ro ON ro.id = r.origine_id
+JOIN stations rd ON rd.id = r.destination_id
+ORDER BY t.id
+"""
+
+# (requête, gares désignées par identifiants, filtre sur le jour) -> SQL
+REQUETES = {
+    (nom, designees, par_jour): modele.format(colonnes=_COLONNES_RESULTAT, origines=gares, destinations=gares,
+                                              jour=" AND t.jour = ?" if par_jour else "")
+    for nom, modele in (('destinations', _SQL_DESTINATIONS), ('train', _SQL_TRAIN_IDEAL))
+    for designees, gares in ((False, _STATIONS_CORRESPONDANTES), (True, _STATIONS_DESIGNEES))
+    for par_jour in (False, True)
+}
+REQUETES.update({
+    ('fenetres', designees, par_jour): _SQL_FENETRES.format(
+        colonnes_aller=_COLONNES.format(t='t', o='o', d='d', prefixe='aller_'),
+        colonnes_retour=_COLONNES.format(t='r', o='ro', d='rd', prefixe='retour_'),
+        origines=gares, jour=" AND t.jour = ?" if par_jour else "")
+    for designees, gares in ((False, _STATIONS_CORRESPONDANTES), (True, _STATIONS_DESIGNEES))
+    for par_jour in (False, True)
+})
+
+
+def heure_en_minutes(heure_str, arrondi_sup=False):
+    """Convertit 'HH:MM' ou 'HH:MM:SS' en minutes depuis minuit.
+
+    Les secondes sont tronquées, ou arrondies à la minute supérieure si `arrondi_sup`
+    (utile pour une heure minimale de départ : '08:00:30' exclut un train à 08:00).
+    """
+    morceaux = [int(x) for x in str(heure_str).strip().split(':')]
+    heures, minutes = morceaux[0], morceaux[1] if len(morceaux) > 1 else 0
+    secondes = morceaux[2] if len(morceaux) > 2 else 0
+    return heures * 60 + minutes + (1 if arrondi_sup and secondes > 0 else 0)
+
+
+def minutes_en_heure(minutes):
+    """Convertit des minutes depuis minuit en 'HH:MM:SS'."""
+    return f"{minutes // 60:02d}:{minutes % 60:02d}:00"
+
+
+def jour_du_voyage(date_voyage):
+    """Jour de circulation (jours depuis le 1970-01-01) d'une date 'AAAA-MM-JJ' ou `date`, None si vide."""
+    if date_voyage is None or date_voyage == "":
+        return None
+    if not isinstance(date_voyage, date):
+        date_voyage = date.fromisoformat(str(date_voyage).strip()[:10])
+    return date_voyage.toordinal() - _EPOQUE
+
+
+def date_du_jour(jour):
+    """'AAAA-MM-JJ' d'un jour de circulation (inverse de `jour_du_voyage`)."""
+    return date.fromordinal(jour + _EPOQUE).isoformat()
+
+
+def schema_normalise_present(conn):
+    """Indique si les tables `stations` et `trajets` (avec son jour de circulation) ont déjà été construites."""
+    noms = {ligne[0] for ligne in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    return {'stations', 'trajets'} <= noms and 'jour' in _colonnes(conn, 'trajets')
+
+
+def _colonnes(conn, table):
+    """{nom en minuscules: nom} des colonnes d'une table."""
+    return {ligne[1].lower(): ligne[1] for ligne in conn.execute(f"PRAGMA table_info({table})")}
+
+
+def construire_schema_normalise(conn):
+    """(Re)construit `stations` et `trajets` à partir de `tgvmax_trajets`.
+
+    Les stations existantes sont conservées (avec leurs identifiants), seuls les
+    trajets sont rechargés. Le jour vient d'une colonne `Date` s'il y en a une, sinon
+    d'`Heure_depart` si elle est datée ; il reste NULL pour des heures seules.
+    Renvoie le nombre de trajets insérés.
+    """
+    conn.create_function("nettoyer_ville", 1, clean_city_name, deterministic=True)
+    depart, arrivee = _MINUTES_SQL.format(col='Heure_depart'), _MINUTES_SQL.format(col='Heure_arrivee')
+    jour = _JOUR_SQL.format(col=_colonnes(conn, 'tgvmax_trajets').get('date', 'Heure_depart'))
+    if _colonnes(conn, 'trajets') and 'jour' not in _colonnes(conn, 'trajets'):
+        conn.execute("DROP TABLE trajets")  # schéma antérieur au jour de circulation, rechargé en entier
+    conn.executescript(SCHEMA)
+    with conn:
+        conn.execute("""
+            INSERT OR IGNORE INTO stations (nom, nom_nettoye)
+            SELECT nom, nettoyer_ville(nom) FROM (
+                SELECT Origine AS nom FROM tgvmax_trajets UNION SELECT Destination FROM tgvmax_trajets
+            ) WHERE nom IS NOT NULL
+        """)
+        # Les index sont reconstruits après le chargement, bien plus rapide qu'une mise à jour ligne à ligne.
+        for nom_index in INDEX:
+            conn.execute(f"DROP INDEX IF EXISTS {nom_index}")
+        conn.execute("DELETE FROM trajets")
+        curseur = conn.execute(f"""
+            INSERT INTO trajets (origine_id, destination_id, jour, depart_min, arrivee_min, duree_min)
+            SELECT o.id, d.id, b.jour, b.dep, b.arr, ((b.arr - b.dep) % {MINUTES_PAR_JOUR} + {MINUTES_PAR_JOUR}) % {MINUTES_PAR_JOUR}
+            FROM (SELECT rowid AS rid, Origine, Destination, {jour} AS jour, {depart} AS dep, {arrivee} AS arr FROM tgvmax_trajets) b
+            JOIN stations o ON o.nom = b.Origine
+            JOIN stations d ON d.nom = b.Destination
+            WHERE b.dep IS NOT NULL AND b.arr IS NOT NULL
+            ORDER BY b.rid
+        """)
+        for nom_index, colonnes in INDEX.items():
+            conn.execute(f"CREATE INDEX {nom_index} ON {colonnes}")
+    conn.execute("ANALYZE")
+    return curseur.rowcount
+
+
+def _gares(ville, index):
+    """Paramètre désignant les gares de `ville` : identifiants résolus (JSON) ou nom nettoyé."""
+    return json.dumps(index.resoudre(ville)) if index is not None else clean_city_name(ville)
+
+
+def trouver_destinations_par_temps(cur, ville_depart, temps_trajet_max_str, index=None, jour=None):
+    """
+    Trouve les villes accessibles depuis une ville de départ dans un temps de trajet donné
+    (le `jour` de circulation seulement, s'il est donné).
+    """
+    parametres = (_gares(ville_depart, index),) + ((jour,) if jour is not None else ()) + \
+                 (heure_en_minutes(temps_trajet_max_str),)
+    return cur.execute(REQUETES['destinations', index is not None, jour is not None], parametres).fetchall()
+
+
+def trouver_train_ideal(cur, ville_depart, ville_arrivee, heure_min_depart_str, index=None, jour=None):
+    """
+    Trouve le premier train disponible après une heure donnée pour un trajet direct
+    (le `jour` de circulation seulement, s'il est donné).
+    Retourne un tuple (origine, destination, duree, heure_depart, heure_arrivee) ou None.
+    """
+    parametres = (_gares(ville_depart, index), _gares(ville_arrivee, index)) + ((jour,) if jour is not None else ()) + \
+                 (heure_en_minutes(heure_min_depart_str, arrondi_sup=True),)
+    return cur.execute(REQUETES['train', index is not None, jour is not None], parametres).fetchone()
+
+
+def fenetres_sur_place(cur, ville_depart, heure_min_depart_str, index=None, jour=None):
+    """
+    Temps utilisable sur place dans chaque destination directe, en une requête :
+    {destination: (aller, retour, minutes entre l'arrivée de l'aller et le départ du retour)}, où `aller`
+    est le premier train après l'heure donnée (celui de `trouver_train_ideal`) et `retour` le dernier train
+    du même jour vers la ville de départ. Les destinations sans retour possible sont absentes.
+    """
+    filtre_jour = (jour,) if jour is not None else ()
+    parametres = (_gares(ville_depart, index),) + filtre_jour + \
+                 (heure_en_minutes(heure_min_depart_str, arrondi_sup=True),) + filtre_jour
+    return {ligne[1]: (ligne[:5], ligne[5:10], ligne[10])
+            for ligne in cur.execute(REQUETES['fenetres', index is not None, jour is not None], parametres)}
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        sys.exit("Usage : python horaires.py chemin/vers/tgvmax.db")
+    debut = time.perf_counter()
+    connexion = sqlite3.connect(sys.argv[1])
+    nb_trajets = construire_schema_normalise(connexion)
+    connexion.close()
+    print(f"✅ {nb_trajets} trajets normalisés en {time.perf_counter() - debut:.1f} s.")
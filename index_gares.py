@@ -0,0 +1,196 @@
+"""
+Index de résolution des noms de gares.
+
+La saisie passait par `clean_city_name` puis par un filtre `instr(LOWER(nom), x)` : un parcours
+de toutes les gares à chaque requête, et des résultats ambigus (« LYON » est retiré comme suffixe
+de gare et le motif vide correspond à toutes les gares, « GARE SYNTHETIQUE 001 » englobe 0010 à
+0019). `IndexGares`, construit une fois à partir des gares distinctes, associe un texte libre aux
+identifiants exacts des gares (`stations.id`), par ordre de priorité :
+
+1. nom complet de la gare, sans accents ni casse (« nice ville ») ;
+2. nom de la ville (« nice », « lyon », « marseille ») : nom sans mention entre parenthèses, sans
+   nom propre de gare (« paris gare de lyon » -> « paris ») ni suffixe de gare détaché (« lyon part
+   dieu » -> « lyon », mais pas « ... de lyon »), sans jamais le vider ;
+3. préfixe du nom ou d'un de ses mots, dans un arbre préfixe (« mars », « charles ») ;
+4. correspondance approchée par trigrammes (« marseile », « bordaux »).
+
+Chaque nœud de l'arbre garde les `NB_SUGGESTIONS` gares les plus desservies qui le prolongent :
+`completer` répond à l'autocomplétion sans parcourir le sous-arbre.
+"""
+
+import re
+import threading
+import unicodedata
+from collections import Counter, OrderedDict
+
+NB_SUGGESTIONS = 8
+SEUIL_SIMILARITE = 0.45  # coefficient de Dice sur les trigrammes
+SUFFIXES_GARE = ("st jean", "matabiau", "ville bourbon", "st charles", "part dieu", "st laud", "montparnasse",
+                 "austerlitz", "est", "nord", "lyon", "ville", "centre", "tgv")
+_ABREVIATIONS = {"saint": "st", "sainte": "ste"}
+_PARENTHESES = re.compile(r"\s*\([^)]*\)")
+_SEPARATEURS = re.compile(r"[^0-9a-z]+")
+_SUFFIXE = re.compile(r"\s(?:" + "|".join(re.escape(s) for s in SUFFIXES_GARE) + r")$")
+_NOM_DE_GARE = re.compile(r"\sgare(?:\s(?:de la|de|du|des|d))?\s.+$")
+_LIAISONS = frozenset(("de", "du", "des", "d", "la", "le", "les", "l"))
+
+
+def replier(texte):
+    """Forme de comparaison : sans accents, minuscules, ponctuation en espaces, « saint » abrégé."""
+    texte = unicodedata.normalize("NFKD", str(texte)).encode("ascii", "ignore").decode().casefold()
+    return " ".join(_ABREVIATIONS.get(mot, mot) for mot in _SEPARATEURS.split(texte) if mot)
+
+
+def nom_ville(nom_replie):
+    """
+    Ville d'un nom de gare replié (jamais vide) : sans nom propre « gare de ... », ni suffixe de gare
+    en mot entier, sauf s'il suit un mot de liaison et fait donc partie du nom (« gare de lyon »).
+    """
+    ville = _NOM_DE_GARE.sub("", nom_replie)
+    if ville == nom_replie:
+        suffixe = _SUFFIXE.search(nom_replie)
+        if suffixe and nom_replie[:suffixe.start()].rsplit(" ", 1)[-1] not in _LIAISONS:
+            ville = nom_replie[:suffixe.start()]
+    return ville or nom_replie
+
+
+def trigrammes(nom_replie):
+    bordure = f"  {nom_replie} "
+    return {bordure[i:i + 3] for i in range(len(bordure) - 2)}
+
+
+class _Noeud:
+    __slots__ = ('enfants', 'ids', 'meilleurs')
+
+    def __init__(self):
+        self.enfants, self.ids, self.meilleurs = {}, [], ()
+
+
+class IndexGares:
+    """Gares [(id, nom, poids)] indexées par nom, ville, préfixes et trigrammes."""
+
+    def __init__(self, gares, taille_memo=4096):
+        self.noms = {id_gare: nom for id_gare, nom, _ in gares}
+        self.poids = {id_gare: poids for id_gare, _, poids in gares}
+        self._par_nom, self._par_ville = {}, {}
+        self._racine = _Noeud()
+        for id_gare, nom, _ in gares:
+            replie = replier(_PARENTHESES.sub("", nom)) or replier(nom)
+            self._par_nom.setdefault(replier(nom), []).append(id_gare)
+            self._par_nom.setdefault(replie, []).append(id_gare)
+            self._par_ville.setdefault(nom_ville(replie), []).append(id_gare)
+            mots = replie.split(" ")
+            for debut in range(len(mots)):  # préfixes du nom et de chacun de ses mots
+                self._inserer(" ".join(mots[debut:]), id_gare)
+        self._classer(self._racine)
+
+        # Trigrammes des noms repliés distincts -> indices dans self._noms_replies
+        self._noms_replies = sorted(self._par_nom)
+        self._trigrammes = [trigrammes(nom) for nom in self._noms_replies]
+        self._postings = {}
+        for i, tri in enumerate(self._trigrammes):
+            for t in tri:
+                self._postings.setdefault(t, []).append(i)
+
+        self.taille_memo = taille_memo
+        self._memo = OrderedDict()
+        self._verrou = threading.Lock()
+
+    @classmethod
+    def depuis_base(cls, cur):
+        """Index des gares de `stations`, pondérées par leur nombre de départs."""
+        return cls(cur.execute(
+            "SELECT s.id, s.nom, (SELECT COUNT(*) FROM trajets t WHERE t.origine_id = s.id) FROM stations s"
+        ).fetchall())
+
+    def __len__(self):
+        return len(self.noms)
+
+    def _inserer(self, cle, id_gare):
+        noeud = self._racine
+        for caractere in cle:
+            noeud = noeud.enfants.setdefault(caractere, _Noeud())
+        if id_gare not in noeud.ids:
+            noeud.ids.append(id_gare)
+
+    def _cle_tri(self, id_gare):
+        return -self.poids[id_gare], self.noms[id_gare]
+
+    def _classer(self, racine):
+        """Gares les plus desservies de chaque sous-arbre (parcours postfixe, sans récursion)."""
+        pile, ordre = [racine], []
+        while pile:
+            noeud = pile.pop()
+            ordre.append(noeud)
+            pile.extend(noeud.enfants.values())
+        for noeud in reversed(ordre):
+            candidats = set(noeud.ids)
+            for enfant in noeud.enfants.values():
+                candidats.update(enfant.meilleurs)
+            noeud.meilleurs = tuple(sorted(candidats, key=self._cle_tri)[:NB_SUGGESTIONS])
+
+    def _noeud(self, prefixe):
+        noeud = self._racine
+        for caractere in prefixe:
+            noeud = noeud.enfants.get(caractere)
+            if noeud is None:
+                return None
+        return noeud
+
+    def _sous_arbre(self, noeud):
+        ids, pile = set(), [noeud]
+        while pile:
+            noeud = pile.pop()
+            ids.update(noeud.ids)
+            pile.extend(noeud.enfants.values())
+        return ids
+
+    def _approchees(self, texte_replie, nb=1):
+        """Indices des `nb` noms repliés les plus proches (Dice sur les trigrammes >= SEUIL_SIMILARITE)."""
+        requete = trigrammes(texte_replie)
+        communs = Counter(i for t in requete for i in self._postings.get(t, ()))
+        scores = sorted(((2 * n / (len(requete) + len(self._trigrammes[i])), i) for i, n in communs.items()),
+                        reverse=True)
+        return [(score, i) for score, i in scores[:nb] if score >= SEUIL_SIMILARITE]
+
+    def _resoudre(self, texte_replie):
+        for table in (self._par_nom, self._par_ville):
+            if texte_replie in table:
+                return table[texte_replie]
+        noeud = self._noeud(texte_replie)
+        if noeud is not None:
+            return self._sous_arbre(noeud)
+        approchees = self._approchees(texte_replie, nb=NB_SUGGESTIONS)
+        if approchees:
+            meilleur = approchees[0][0]
+            return [id_gare for score, i in approchees if score == meilleur for id_gare in self._par_nom[self._noms_replies[i]]]
+        return ()
+
+    def resoudre(self, texte):
+        """Identifiants (triés) des gares désignées par `texte` ; vide si rien n'approche."""
+        replie = replier(texte)
+        if not replie:
+            return ()
+        with self._verrou:
+            ids = self._memo.get(replie)
+            if ids is not None:
+                self._memo.move_to_end(replie)
+                return ids
+        ids = tuple(sorted(set(self._resoudre(replie))))
+        with self._verrou:
+            self._memo[replie] = ids
+            if len(self._memo) > self.taille_memo:
+                self._memo.popitem(last=False)
+        return ids
+
+    def completer(self, texte, nb=NB_SUGGESTIONS):
+        """Noms de gares suggérés pour une saisie partielle : préfixes d'abord, puis noms approchés."""
+        replie = replier(texte)
+        if not replie:
+            return []
+        noeud = self._noeud(replie)
+        ids = list(noeud.meilleurs[:nb]) if noeud is not None else []
+        if len(ids) < nb:
+            for _, i in self._approchees(replie, nb):
+                ids += [id_gare for id_gare in self._par_nom[self._noms_replies[i]] if id_gare not in ids]
+        return [self.noms[id_gare] for id_gare in ids[:nb]]
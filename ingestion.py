@@ -0,0 +1,239 @@
+"""
+Ingestion incrémentale de l'export open data TGVmax (data.sncf.com) dans le schéma normalisé.
+
+L'export liste chaque train de chaque date d'une fenêtre glissante d'environ 30 jours, soit
+plusieurs centaines de milliers de lignes (CSV `;` ou JSON). Il est lu en flux, jamais chargé
+en entier, en deux passages :
+
+1. empreinte de chaque date de circulation (nombre de trains et somme de hachages des lignes,
+   indépendante de leur ordre), comparée à celle de la dernière ingestion (`dates_ingerees`) ;
+2. seules les dates nouvelles ou modifiées sont supprimées puis rechargées dans `trajets`, par
+   lots `executemany` de `taille_lot` lignes, une transaction par lot. Les autres dates ne sont
+   ni réécrites ni relues en base.
+
+La mémoire reste bornée par un lot, plus une entrée par date et par gare, quelle que soit la
+taille de l'export. Les lignes sans places TGVmax (`od_happy_card` à NON) sont écartées, sauf
+avec `toutes_places`. Les trajets non datés d'une base construite par `horaires.py` à partir de
+`tgvmax_trajets` sont remplacés par ceux de l'export au premier chargement.
+
+Usage :
+    python ingestion.py tgvmax.db export_tgvmax.csv
+    python ingestion.py tgvmax.db export_tgvmax.json --purger-absentes
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import re
+import sqlite3
+import time
+from collections import Counter
+
+import horaires
+from villes import clean_city_name
+
+TAILLE_LOT = 50_000
+TAILLE_BLOC_JSON = 1 << 20
+# Colonne de disponibilité des places TGVmax, selon la version de l'export.
+COLONNES_DISPONIBILITE = ("od_happy_card", "disponibilit")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS dates_ingerees (
+    jour INTEGER PRIMARY KEY,
+    empreinte TEXT NOT NULL,
+    nb_trajets INTEGER NOT NULL,
+    maj REAL NOT NULL
+);
+"""
+
+# Séparateurs entre deux objets d'un tableau JSON ou d'un fichier JSON Lines.
+_SEPARATEURS = re.compile(r"[\s\[\],]*")
+
+
+def _objets_json(fichier, taille_bloc=TAILLE_BLOC_JSON):
+    """Objets d'un tableau JSON ou d'un fichier JSON Lines, décodés un à un par blocs de `taille_bloc` caractères."""
+    decodeur, tampon, position, fin = json.JSONDecoder(), "", 0, False
+    while True:
+        position = _SEPARATEURS.match(tampon, position).end()
+        try:
+            objet, position = decodeur.raw_decode(tampon, position)
+        except json.JSONDecodeError:
+            if fin:
+                if position < len(tampon):
+                    raise
+                return
+            bloc = fichier.read(taille_bloc)
+            tampon, position, fin = tampon[position:] + bloc, 0, not bloc
+            continue
+        yield objet
+
+
+# Champs lus, dans l'ordre des tuples de `_lignes_brutes` (en-têtes comparés en minuscules).
+CHAMPS = ("date", "origine", "destination", "heure_depart", "heure_arrivee")
+
+
+def _disponibilite(colonnes):
+    """Nom de la colonne de disponibilité des places TGVmax parmi `colonnes` (en minuscules), ou None."""
+    return next((colonne for colonne in colonnes if colonne.startswith(COLONNES_DISPONIBILITE)), None)
+
+
+def _lignes_brutes(chemin):
+    """
+    (date, origine, destination, heure_depart, heure_arrivee, disponibilité) de chaque ligne de l'export,
+    CSV `;` ou `,` ou JSON selon l'extension ; None pour un champ absent.
+    """
+    with open(chemin, encoding='utf-8-sig', newline='') as fichier:
+        if chemin.lower().endswith(('.json', '.jsonl')):
+            for objet in _objets_json(fichier):
+                objet = objet.get('fields', objet)  # enregistrements de l'ancienne API Opendatasoft
+                objet = {str(cle).strip().lower(): valeur for cle, valeur in objet.items()}
+                yield tuple(objet.get(champ) for champ in CHAMPS + (_disponibilite(objet),))
+            return
+        entete = fichier.readline()
+        lecteur = csv.reader(fichier, delimiter=';' if ';' in entete else ',')
+        colonnes = [colonne.strip().lower() for colonne in next(csv.reader([entete], delimiter=lecteur.dialect.delimiter))]
+        # Positions calculées une fois pour tout le fichier ; une colonne absente pointe vers un None ajouté en fin de ligne.
+        positions = [colonnes.index(champ) if champ in colonnes else -1 for champ in CHAMPS + (_disponibilite(colonnes),)]
+        for ligne in lecteur:
+            ligne.append(None)
+            yield tuple(ligne[i] if i < len(ligne) else None for i in positions)
+
+
+def lire_export(chemin, toutes_places=False, compteurs=None):
+    """
+    (jour, origine, destination, depart_min, arrivee_min) de chaque train de l'export, en flux.
+    `compteurs` (Counter) reçoit le nombre de lignes écartées, incomplètes ou sans place.
+    """
+    compteurs = Counter() if compteurs is None else compteurs
+    # Quelques dizaines de dates et au plus 1 440 heures distinctes : conversions mémorisées.
+    jours, minutes = {}, {}
+    for date_voyage, origine, destination, heure_depart, heure_arrivee, disponibilite in _lignes_brutes(chemin):
+        if not toutes_places and str(disponibilite).strip().upper() == "NON":
+            compteurs['sans_place'] += 1
+            continue
+        try:
+            if date_voyage not in jours:
+                jours[date_voyage] = horaires.jour_du_voyage(date_voyage)
+            for heure in (heure_depart, heure_arrivee):
+                if heure not in minutes:
+                    minutes[heure] = horaires.heure_en_minutes(heure)
+            trajet = (jours[date_voyage], origine.strip(), destination.strip(), minutes[heure_depart], minutes[heure_arrivee])
+        except (TypeError, ValueError, AttributeError):
+            trajet = None
+        if trajet is None or trajet[0] is None or not trajet[1] or not trajet[2]:
+            compteurs['incompletes'] += 1
+            continue
+        yield trajet
+
+
+def _hachage(origine, destination, depart, arrivee):
+    return int.from_bytes(hashlib.blake2b(f"{origine}\x1f{destination}\x1f{depart}\x1f{arrivee}".encode(),
+                                          digest_size=8).digest(), 'little')
+
+
+def empreintes_par_jour(trajets):
+    """({jour: empreinte}, {gares}) d'un flux de trajets ; l'empreinte ne dépend pas de l'ordre des lignes."""
+    nombres, sommes, gares = Counter(), Counter(), set()
+    for jour, origine, destination, depart, arrivee in trajets:
+        nombres[jour] += 1
+        sommes[jour] = (sommes[jour] + _hachage(origine, destination, depart, arrivee)) & 0xFFFFFFFFFFFFFFFF
+        gares.add(origine)
+        gares.add(destination)
+    return {jour: f"{nombres[jour]}:{sommes[jour]:016x}" for jour in nombres}, gares
+
+
+def dates_a_charger(conn, empreintes):
+    """
+    Jours de l'export à (re)charger : nouveaux, d'empreinte différente, ou dont le nombre de trajets
+    en base ne correspond plus (base reconstruite ou chargement interrompu entre-temps).
+    """
+    connues = {jour: (empreinte, nb) for jour, empreinte, nb in
+               conn.execute("SELECT jour, empreinte, nb_trajets FROM dates_ingerees")}
+    en_base = dict(conn.execute("SELECT jour, COUNT(*) FROM trajets WHERE jour IS NOT NULL GROUP BY jour"))
+    return {jour for jour, empreinte in empreintes.items()
+            if connues.get(jour, (None,))[0] != empreinte or en_base.get(jour) != connues[jour][1]}
+
+
+def ingerer(conn, chemin, taille_lot=TAILLE_LOT, toutes_places=False, purger_absentes=False):
+    """
+    Charge les dates nouvelles ou modifiées de l'export `chemin` ; avec `purger_absentes`, supprime
+    aussi les dates qui n'y figurent plus. Renvoie un rapport (dates et trajets chargés, durée).
+    """
+    debut = time.perf_counter()
+    conn.executescript(horaires.SCHEMA + SCHEMA)
+    if not horaires.schema_normalise_present(conn):
+        raise RuntimeError("table trajets sans jour de circulation : reconstruire la base avec horaires.py")
+    compteurs = Counter()
+    empreintes, gares = empreintes_par_jour(lire_export(chemin, toutes_places, compteurs))
+    a_charger = dates_a_charger(conn, empreintes)
+    a_purger = {jour for (jour,) in conn.execute("SELECT jour FROM dates_ingerees")} - set(empreintes) \
+        if purger_absentes else set()
+
+    # Les dates à remplacer sont retirées de `dates_ingerees` dans la même transaction que leurs trajets :
+    # un chargement interrompu est repris à la prochaine exécution.
+    with conn:
+        conn.executemany("INSERT OR IGNORE INTO stations (nom, nom_nettoye) VALUES (?, ?)",
+                         ((gare, clean_city_name(gare)) for gare in sorted(gares)))
+        conn.execute("DELETE FROM trajets WHERE jour IS NULL")
+        # Un seul parcours de la table pour toutes les dates (aucun index ne commence par le jour).
+        remplacees = json.dumps(sorted(a_charger | a_purger))
+        conn.execute("DELETE FROM trajets WHERE jour IN (SELECT value FROM json_each(?))", (remplacees,))
+        conn.execute("DELETE FROM dates_ingerees WHERE jour IN (SELECT value FROM json_each(?))", (remplacees,))
+        # Base vide : index reconstruits après le chargement, bien plus rapide qu'une mise à jour ligne à ligne.
+        reconstruire_index = a_charger and conn.execute("SELECT 1 FROM trajets LIMIT 1").fetchone() is None
+        if reconstruire_index:
+            for nom_index in horaires.INDEX:
+                conn.execute(f"DROP INDEX IF EXISTS {nom_index}")
+
+    nb_trajets = 0
+    if a_charger:
+        ids = dict(conn.execute("SELECT nom, id FROM stations"))
+        lot = []
+        for jour, origine, destination, depart, arrivee in lire_export(chemin, toutes_places):
+            if jour not in a_charger:
+                continue
+            lot.append((ids[origine], ids[destination], jour, depart, arrivee,
+                        (arrivee - depart) % horaires.MINUTES_PAR_JOUR))
+            if len(lot) >= taille_lot:
+                with conn:
+                    conn.executemany("INSERT INTO trajets (origine_id, destination_id, jour, depart_min, arrivee_min, "
+                                     "duree_min) VALUES (?, ?, ?, ?, ?, ?)", lot)
+                nb_trajets += len(lot)
+                lot.clear()
+        with conn:
+            conn.executemany("INSERT INTO trajets (origine_id, destination_id, jour, depart_min, arrivee_min, "
+                             "duree_min) VALUES (?, ?, ?, ?, ?, ?)", lot)
+            nb_trajets += len(lot)
+            maj = time.time()
+            conn.executemany("INSERT INTO dates_ingerees VALUES (?, ?, ?, ?)",
+                             ((jour, empreintes[jour], int(empreintes[jour].split(":")[0]), maj) for jour in sorted(a_charger)))
+    with conn:
+        for nom_index, colonnes in horaires.INDEX.items():
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {nom_index} ON {colonnes}")
+    if a_charger or a_purger:
+        conn.execute("ANALYZE")
+    return {'dates': len(empreintes), 'dates_chargees': sorted(a_charger), 'dates_purgees': sorted(a_purger),
+            'trajets': nb_trajets, 'gares': len(gares), 'lignes_sans_place': compteurs['sans_place'],
+            'lignes_incompletes': compteurs['incompletes'], 'duree_s': time.perf_counter() - debut}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingestion incrémentale de l'export open data TGVmax.")
+    parser.add_argument("db", help="base SQLite des horaires (tgvmax.db)")
+    parser.add_argument("export", help="export TGVmax (.csv séparé par ';' ou ',', .json ou .jsonl)")
+    parser.add_argument("--taille-lot", type=int, default=TAILLE_LOT, help="lignes par transaction")
+    parser.add_argument("--toutes-places", action="store_true", help="garder aussi les trains sans place TGVmax")
+    parser.add_argument("--purger-absentes", action="store_true", help="supprimer les dates absentes de l'export")
+    args = parser.parse_args()
+
+    connexion = sqlite3.connect(args.db)
+    rapport = ingerer(connexion, args.export, args.taille_lot, args.toutes_places, args.purger_absentes)
+    connexion.close()
+    print(f"✅ {len(rapport['dates_chargees'])} date(s) chargée(s) sur {rapport['dates']}, {rapport['trajets']} trajets, "
+          f"{len(rapport['dates_purgees'])} purgée(s), en {rapport['duree_s']:.1f} s.")
+    for jour in rapport['dates_chargees']:
+        print(f"   -> {horaires.date_du_jour(jour)}")
+    if rapport['lignes_sans_place'] or rapport['lignes_incompletes']:
+        print(f"   ({rapport['lignes_sans_place']} lignes sans place TGVmax, "
+              f"{rapport['lignes_incompletes']} incomplètes ignorées)")
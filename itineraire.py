@@ -0,0 +1,206 @@
+"""Itinéraire de visite d'une ville à partir de ses lieux touristiques."""
+
+import random
+import time
+
+import numpy as np
+
+from marche import TempsMarcheParLigne, matrice_temps_marche
+
+
+def creer_itineraire_visite_avec_trajet(lieux_tries, temps_disponible_min):
+    """
+    Itinéraire glouton : les lieux sont pris dans l'ordre de `lieux_tries` tant que visite et
+    marche depuis le lieu précédent tiennent dans le temps disponible. Renvoie (itineraire, temps_total).
+    """
+    itineraire, temps_total = [], 0
+    if not lieux_tries:
+        return [], 0
+    premier_lieu = lieux_tries[0]
+    if premier_lieu.temps_visite_min <= temps_disponible_min:
+        itineraire.append(premier_lieu)
+        temps_total += premier_lieu.temps_visite_min
+    else:
+        return [], 0
+    # Seuls les temps depuis le dernier lieu retenu vers les suivants sont lus : une ligne
+    # vectorisée (voir marche.py) par lieu retenu, au lieu de la matrice de tous les couples.
+    temps_marche = TempsMarcheParLigne(lieux_tries)
+    depuis_dernier = temps_marche.ligne(0, 1).tolist()
+    dernier = 0
+    for i, lieu_candidat in enumerate(lieux_tries[1:], start=1):
+        temps_trajet = round(depuis_dernier[i - dernier - 1])
+        if temps_total + temps_trajet + lieu_candidat.temps_visite_min <= temps_disponible_min:
+            lieu_candidat.trajet_depuis_precedent = temps_trajet
+            itineraire.append(lieu_candidat)
+            temps_total += temps_trajet + lieu_candidat.temps_visite_min
+            dernier = i
+            depuis_dernier = temps_marche.ligne(i, i + 1).tolist()
+    return itineraire, temps_total
+
+
+# --- Optimisation (problème d'orientation) ---
+
+DELAI_CALCUL_MS = 20      # temps de calcul maximal par ville
+NB_CANDIDATS_MAX = 300    # lieux considérés au plus (matrice de marche et voisinages bornés)
+NB_TOURS_SANS_GAIN = 50   # arrêt anticipé de la recherche locale itérée
+
+
+def _cle_candidat(lieu):
+    return -lieu.score_pertinence, lieu.temps_visite_min
+
+
+class _Tournee:
+    """Tournée ouverte (sans retour) sur des indices de candidats, avec sa durée totale tenue à jour."""
+
+    def __init__(self, marche, visite):
+        self.marche = marche                # matrice NumPy (calculs vectorisés)
+        self.marche_liste = marche.tolist()  # même matrice, accès élément par élément rapide
+        self.visite = visite
+        self.ordre, self.temps = [], 0
+
+    def arete(self, a, b):
+        """Temps de marche de a à b, 0 si l'un est une extrémité (None)."""
+        return 0 if a is None or b is None else self.marche_liste[a][b]
+
+    def recalculer(self):
+        ordre = self.ordre
+        self.temps = int(self.visite[ordre].sum()) + sum(self.marche_liste[a][b] for a, b in zip(ordre, ordre[1:]))
+        return self.temps
+
+
+def _deux_opt(tournee):
+    """Inverse des segments tant que cela raccourcit la marche (matrice symétrique). Renvoie True si amélioré."""
+    ordre, ameliore, n = tournee.ordre, False, len(tournee.ordre)
+    voisin = lambda k: ordre[k] if 0 <= k < n else None
+    for i in range(n - 1):
+        for j in range(i + 1, n):
+            gain = (tournee.arete(voisin(i - 1), ordre[i]) + tournee.arete(ordre[j], voisin(j + 1))
+                    - tournee.arete(voisin(i - 1), ordre[j]) - tournee.arete(ordre[i], voisin(j + 1)))
+            if gain > 0:
+                ordre[i:j + 1] = ordre[i:j + 1][::-1]
+                tournee.temps -= gain
+                ameliore = True
+    return ameliore
+
+
+def _or_opt(tournee):
+    """Déplace des segments de 1 à 3 lieux vers la position qui raccourcit le plus la marche. Renvoie True si amélioré."""
+    ordre, arete, ameliore = tournee.ordre, tournee.arete, False
+    for longueur in (1, 2, 3):
+        i = 0
+        while i + longueur <= len(ordre):
+            segment, reste = ordre[i:i + longueur], ordre[:i] + ordre[i + longueur:]
+            avant = ordre[i - 1] if i > 0 else None
+            apres = ordre[i + longueur] if i + longueur < len(ordre) else None
+            gain_retrait = arete(avant, segment[0]) + arete(segment[-1], apres) - arete(avant, apres)
+            meilleur_delta, meilleure_position = 0, None
+            for position in range(len(reste) + 1):
+                if position == i:
+                    continue
+                a = reste[position - 1] if position > 0 else None
+                b = reste[position] if position < len(reste) else None
+                delta = arete(a, segment[0]) + arete(segment[-1], b) - arete(a, b) - gain_retrait
+                if delta < meilleur_delta:
+                    meilleur_delta, meilleure_position = delta, position
+            if meilleure_position is None:
+                i += 1
+                continue
+            reste[meilleure_position:meilleure_position] = segment
+            ordre[:] = reste
+            tournee.temps += meilleur_delta
+            ameliore = True
+    return ameliore
+
+
+def _remplir(tournee, hors_tournee, temps_disponible, pertinence):
+    """
+    Insertion au moindre coût (à coût égal, le plus pertinent) tant qu'un lieu tient dans le temps restant.
+    Le coût de chaque lieu hors tournée à chaque position est calculé d'un bloc avec NumPy.
+    """
+    marche, visite = tournee.marche, tournee.visite
+    while hors_tournee:
+        lieux = np.fromiter(sorted(hors_tournee), dtype=np.intp)
+        if tournee.ordre:
+            ordre = np.array(tournee.ordre, dtype=np.intp)
+            # Ligne p : insertion avant ordre[p] (p = 0 : en tête, dernière ligne : en fin de tournée).
+            couts = np.vstack([marche[lieux, ordre[0]][None, :],
+                               marche[ordre[:-1]][:, lieux] + marche[ordre[1:]][:, lieux]
+                               - marche[ordre[:-1], ordre[1:]][:, None],
+                               marche[ordre[-1], lieux][None, :]]) + visite[lieux]
+        else:
+            couts = visite[lieux][None, :]
+        positions = couts.argmin(axis=0)
+        cout = couts[positions, np.arange(len(lieux))]
+        faisables = np.flatnonzero(tournee.temps + cout <= temps_disponible)
+        if not len(faisables):
+            return
+        choix = faisables[np.lexsort((-pertinence[lieux[faisables]], cout[faisables]))[0]]
+        tournee.ordre.insert(int(positions[choix]), int(lieux[choix]))
+        tournee.temps += int(cout[choix])
+        hors_tournee.discard(int(lieux[choix]))
+
+
+def _valeur(tournee, pertinence):
+    """Objectif lexicographique : nombre de lieux, puis pertinence cumulée, puis durée la plus courte."""
+    return len(tournee.ordre), int(pertinence[tournee.ordre].sum()), -tournee.temps
+
+
+def optimiser_itineraire(lieux, temps_disponible_min, delai_calcul_ms=DELAI_CALCUL_MS,
+                         nb_candidats_max=NB_CANDIDATS_MAX, graine=0):
+    """
+    Itinéraire maximisant le nombre de lieux visités, puis leur pertinence, dans `temps_disponible_min`
+    (visites et marche comprises) : insertion au moindre coût, puis 2-opt / or-opt et recherche locale
+    itérée (retrait de quelques lieux et réinsertion) jusqu'à `delai_calcul_ms`, ou plus tôt si
+    `NB_TOURS_SANS_GAIN` tours n'apportent rien. La construction initiale (quelques ms pour 300 candidats)
+    est toujours menée à terme : le délai ne peut pas laisser la ville sans itinéraire.
+
+    Même forme de résultat que `creer_itineraire_visite_avec_trajet` : (itineraire, temps_total), chaque
+    lieu après le premier portant `trajet_depuis_precedent`. Les lieux renvoyés sont des copies.
+    """
+    fin = time.perf_counter() + delai_calcul_ms / 1000
+    candidats = sorted((lieu for lieu in lieux if lieu.temps_visite_min <= temps_disponible_min),
+                       key=_cle_candidat)[:nb_candidats_max]
+    if not candidats:
+        return [], 0
+    marche = np.rint(matrice_temps_marche(candidats)).astype(np.int64)
+    visite = np.array([lieu.temps_visite_min for lieu in candidats], dtype=np.int64)
+    pertinence = np.array([lieu.score_pertinence for lieu in candidats], dtype=np.int64)
+
+    tournee = _Tournee(marche, visite)
+    hors_tournee = set(range(len(candidats)))
+    _remplir(tournee, hors_tournee, temps_disponible_min, pertinence)
+    meilleure, meilleure_valeur = list(tournee.ordre), _valeur(tournee, pertinence)
+
+    rng = random.Random(graine)
+    tours_sans_gain = 0
+    while time.perf_counter() < fin and tournee.ordre and hors_tournee and tours_sans_gain < NB_TOURS_SANS_GAIN:
+        # Raccourcir la marche libère du temps pour de nouvelles insertions.
+        while (_deux_opt(tournee) | _or_opt(tournee)) and time.perf_counter() < fin:
+            pass
+        _remplir(tournee, hors_tournee, temps_disponible_min, pertinence)
+        valeur = _valeur(tournee, pertinence)
+        tours_sans_gain += 1
+        if valeur > meilleure_valeur:
+            meilleure, meilleure_valeur, tours_sans_gain = list(tournee.ordre), valeur, 0
+        elif valeur < meilleure_valeur:
+            tournee.ordre = list(meilleure)
+            tournee.recalculer()
+            hors_tournee = set(range(len(candidats))) - set(meilleure)
+        # Perturbation : retirer quelques lieux consécutifs, la réinsertion gloutonne peut en placer d'autres.
+        if time.perf_counter() >= fin:
+            break
+        # Les lieux retirés ne peuvent revenir qu'au tour suivant.
+        nb_retraits = rng.randint(1, min(3, len(tournee.ordre)))
+        debut = rng.randrange(len(tournee.ordre) - nb_retraits + 1)
+        retires = set(tournee.ordre[debut:debut + nb_retraits])
+        del tournee.ordre[debut:debut + nb_retraits]
+        tournee.recalculer()
+        _remplir(tournee, hors_tournee, temps_disponible_min, pertinence)
+        hors_tournee |= retires
+
+    itineraire, precedent = [], None
+    for i in meilleure:
+        itineraire.append(candidats[i].copie(
+            trajet_depuis_precedent=int(marche[precedent, i]) if precedent is not None else None))
+        precedent = i
+    return itineraire, -meilleure_valeur[2]
@@ -0,0 +1,285 @@
+"""Lieux touristiques d'une ville via l'API Overpass."""
+
+import codecs
+import json
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+import traces
+from client_http import CircuitOuvert, client
+
+OVERPASS_URL = os.environ.get("ESCAPADE_OVERPASS_URL", "http://overpass-api.de/api/interpreter")
+DELAI_HTTP_S = 30
+TAILLE_MORCEAU = 1 << 16  # octets lus à la fois dans une réponse Overpass
+
+# Filtres de tags de la requête Overpass (opérateur `~` : expression régulière non ancrée).
+FILTRES_TAGS = {'tourism': "museum|attraction|gallery|viewpoint", 'historic': "castle|monument|ruins|cathedral|church"}
+_FILTRES_COMPILES = {cle: re.compile(motif) for cle, motif in FILTRES_TAGS.items()}
+
+# Plus petit temps renvoyé par `estimer_temps_visite` : borne le nombre de visites possibles.
+TEMPS_VISITE_MIN = 20
+
+
+def estimer_temps_visite(tags):
+    if tags.get('tourism') == 'museum' or tags.get('historic') == 'castle':
+        return 120
+    if tags.get('historic') in ['cathedral', 'church']:
+        return 45
+    if tags.get('tourism') == 'attraction' or tags.get('historic') == 'monument':
+        return 30
+    if tags.get('leisure') == 'park':
+        return 60
+    return TEMPS_VISITE_MIN
+
+
+def _clauses_overpass(bbox):
+    s, n, w, e = bbox
+    return "".join(f'{type_osm}["{cle}"~"{motif}"]({s},{w},{n},{e});'
+                   for cle, motif in FILTRES_TAGS.items() for type_osm in ('node', 'way'))
+
+
+def est_touristique(tags):
+    """Même sélection que la requête Overpass, pour filtrer un extrait OSM local."""
+    return any(cle in tags and motif.search(tags[cle]) for cle, motif in _FILTRES_COMPILES.items())
+
+
+def requete_overpass(bbox):
+    """Requête Overpass QL des musées, attractions et monuments d'une emprise (sud, nord, ouest, est)."""
+    return f"[out:json][timeout:25];({_clauses_overpass(bbox)});out center;"
+
+
+class Lieu:
+    """
+    Lieu touristique, réduit aux champs lus par l'itinéraire, la carte et le précalcul : les tags OSM
+    ne servent qu'à calculer `temps_visite_min` et `score_pertinence` et ne sont pas gardés.
+    `trajet_depuis_precedent` (minutes de marche) n'est renseigné que dans un itinéraire, à partir du 2e lieu.
+    """
+
+    __slots__ = ('nom', 'latitude', 'longitude', 'temps_visite_min', 'score_pertinence', 'trajet_depuis_precedent')
+
+    def __init__(self, nom, latitude, longitude, temps_visite_min, score_pertinence, trajet_depuis_precedent=None):
+        self.nom, self.latitude, self.longitude = nom, latitude, longitude
+        self.temps_visite_min, self.score_pertinence = temps_visite_min, score_pertinence
+        self.trajet_depuis_precedent = trajet_depuis_precedent
+
+    def copie(self, **champs):
+        return Lieu(**{**self.en_dict(), **champs})
+
+    def en_dict(self):
+        """Champs renseignés, pour la sérialisation JSON (`Lieu(**d)` fait l'inverse)."""
+        return {champ: getattr(self, champ) for champ in self.__slots__ if getattr(self, champ) is not None}
+
+    def __eq__(self, autre):
+        return isinstance(autre, Lieu) and all(getattr(self, champ) == getattr(autre, champ) for champ in self.__slots__)
+
+    def __repr__(self):
+        return f"Lieu({', '.join(f'{champ}={valeur!r}' for champ, valeur in self.en_dict().items())})"
+
+
+def _coordonnees(element):
+    """
+    Point d'un élément : le sien pour un nœud, le centre pour un way. Sous `out bb;`, ce centre
+    est le milieu de l'emprise (`bounds`), comme celui que calcule Overpass sous `out center;`.
+    """
+    if element['type'] == 'node':
+        return element.get('lat'), element.get('lon')
+    if 'center' in element:
+        return element['center'].get('lat'), element['center'].get('lon')
+    bornes = element.get('bounds')
+    if not bornes:
+        return None, None
+    return (bornes['minlat'] + bornes['maxlat']) / 2, (bornes['minlon'] + bornes['maxlon']) / 2
+
+
+def lieu_depuis_element(element):
+    """`Lieu` d'un élément Overpass/OSM, ou None s'il n'a pas de nom ou de coordonnées."""
+    tags = element.get('tags', {})
+    if 'name' not in tags:
+        return None
+    lat, lon = _coordonnees(element)
+    if not lat or not lon:
+        return None
+    return Lieu(tags['name'], lat, lon, estimer_temps_visite(tags), 1 if 'wikipedia' in tags else 0)
+
+
+def extraire_lieux(elements):
+    """Lieux d'une suite d'éléments Overpass (liste, ou `elements_overpass` lus en flux)."""
+    lieux = []
+    for element in elements:
+        lieu = lieu_depuis_element(element)
+        if lieu is not None:
+            lieux.append(lieu)
+    return lieux
+
+
+_APRES_VALEUR = frozenset(",:]} \t\r\n")
+
+
+class _FluxJSON:
+    """Texte JSON reçu par morceaux, dont les valeurs sont décodées une à une (`raw_decode`) à mesure qu'elles arrivent."""
+
+    __slots__ = ('morceaux', 'tampon', 'position', 'fin')
+    _decodeur = json.JSONDecoder()
+
+    def __init__(self, morceaux):
+        self.morceaux, self.tampon, self.position, self.fin = iter(morceaux), "", 0, False
+
+    def _completer(self):
+        morceau = next(self.morceaux, "")
+        self.tampon, self.position, self.fin = self.tampon[self.position:] + morceau, 0, not morceau
+
+    def caractere(self, ignores=""):
+        """Prochain caractère après les blancs et les `ignores`, sans le consommer ("" en fin de texte)."""
+        while True:
+            tampon, position = self.tampon, self.position
+            while position < len(tampon) and (tampon[position] in ignores or tampon[position].isspace()):
+                position += 1
+            self.position = position
+            if position < len(tampon):
+                return tampon[position]
+            if self.fin:
+                return ""
+            self._completer()
+
+    def valeur(self):
+        """Valeur JSON commençant à la position courante (après `caractere`)."""
+        while True:
+            try:
+                valeur, fin_valeur = self._decodeur.raw_decode(self.tampon, self.position)
+                # Un nombre coupé entre deux morceaux ("0." puis "6") se décode aussi : on attend le séparateur.
+                if self.fin or fin_valeur < len(self.tampon) and self.tampon[fin_valeur] in _APRES_VALEUR:
+                    self.position = fin_valeur
+                    return valeur
+            except json.JSONDecodeError:
+                if self.fin:
+                    raise
+            self._completer()
+
+
+def elements_overpass(morceaux):
+    """
+    Éléments d'une réponse Overpass JSON reçue par morceaux de texte, décodés un à un : ni le texte
+    complet ni la liste des éléments ne sont gardés en mémoire. Les autres clés (version, osm3s,
+    remark) sont ignorées. Lève ValueError si la réponse est mal formée ou tronquée.
+    """
+    flux = _FluxJSON(morceaux)
+    if flux.caractere() != '{':
+        raise ValueError("Réponse Overpass : objet JSON attendu")
+    flux.position += 1
+    while flux.caractere(",") == '"':
+        cle = flux.valeur()
+        if flux.caractere(":") == '[' and cle == 'elements':
+            flux.position += 1
+            while (suivant := flux.caractere(",")) != ']':
+                if not suivant:
+                    raise ValueError("Réponse Overpass tronquée")
+                yield flux.valeur()
+            flux.position += 1
+        else:
+            flux.valeur()
+    if flux.caractere() != '}':
+        raise ValueError("Réponse Overpass tronquée")
+
+
+def elements_reponse(response):
+    """Éléments d'une réponse Overpass demandée avec `stream=True`, lue par morceaux de `TAILLE_MORCEAU` octets."""
+    return elements_overpass(codecs.iterdecode(response.iter_content(TAILLE_MORCEAU), response.encoding or 'utf-8'))
+
+
+def lieux_dans_bbox(bbox, url=None, timeout=DELAI_HTTP_S):
+    """
+    Lieux touristiques d'une emprise ([] : aucun), ou None si la collecte a échoué (erreur réseau,
+    délai dépassé, disjoncteur ouvert, réponse invalide) : un échec n'est pas une ville sans lieux.
+    """
+    try:
+        with client.get(url or OVERPASS_URL, params={'data': requete_overpass(bbox)}, timeout=timeout,
+                        stream=True) as response:
+            response.raise_for_status()
+            return extraire_lieux(elements_reponse(response))
+    except (requests.exceptions.RequestException, ValueError):
+        return None
+
+
+# --- Mode groupé : plusieurs villes par requête Overpass ---
+
+TAILLE_LOT = 8          # villes par requête
+AIRE_LOT_MAX_DEG2 = 0.5  # emprise cumulée maximale d'un lot (en degrés carrés)
+
+
+def requete_overpass_lot(bboxes):
+    """
+    Une seule requête Overpass QL couvrant plusieurs emprises (sud, nord, ouest, est). Les ways
+    sont demandés avec leur emprise (`out bb;`) : c'est elle qui dit à quelles villes ils reviennent.
+    """
+    clauses = "".join(_clauses_overpass(bbox) for bbox in bboxes)
+    return f"[out:json][timeout:{min(180, 25 * len(bboxes))}];({clauses});out bb;"
+
+
+def _emprise_element(element):
+    """Emprise (sud, nord, ouest, est) d'un élément : réduite à son point pour un nœud ou un way sans `bounds`."""
+    bornes = element.get('bounds')
+    if element['type'] != 'node' and bornes:
+        return bornes['minlat'], bornes['maxlat'], bornes['minlon'], bornes['maxlon']
+    lat, lon = _coordonnees(element)
+    return lat, lat, lon, lon
+
+
+def _chevauche(emprise, bbox):
+    s, n, w, e = bbox
+    sud, nord, ouest, est = emprise
+    return sud <= n and s <= nord and ouest <= e and w <= est
+
+
+def decouper_en_lots(emprises, taille_lot=TAILLE_LOT, aire_max=AIRE_LOT_MAX_DEG2):
+    """Regroupe les villes {nom: bbox} en lots bornés en nombre de villes et en surface cumulée."""
+    lots, lot, aire = [], [], 0.0
+    for nom, (s, n, w, e) in emprises.items():
+        aire_ville = (n - s) * (e - w)
+        if lot and (len(lot) >= taille_lot or aire + aire_ville > aire_max):
+            lots.append(lot)
+            lot, aire = [], 0.0
+        lot.append(nom)
+        aire += aire_ville
+    if lot:
+        lots.append(lot)
+    return lots
+
+
+def _lieux_du_lot(noms, emprises, url, timeout):
+    """Interroge Overpass pour un lot ; en cas d'échec, le lot est coupé en deux et réessayé."""
+    try:
+        with client.get(url, params={'data': requete_overpass_lot([emprises[nom] for nom in noms])},
+                        timeout=timeout, stream=True) as response:
+            response.raise_for_status()
+            tous = [(lieu, _emprise_element(element)) for element in elements_reponse(response)
+                    if (lieu := lieu_depuis_element(element)) is not None]
+    except CircuitOuvert:  # inutile de couper le lot : l'hôte est en panne
+        return {nom: None for nom in noms}
+    except (requests.exceptions.RequestException, ValueError):
+        if len(noms) == 1:
+            return {noms[0]: None}
+        milieu = len(noms) // 2
+        return {**_lieux_du_lot(noms[:milieu], emprises, url, timeout),
+                **_lieux_du_lot(noms[milieu:], emprises, url, timeout)}
+    # Comme une requête par ville, qui renvoie tout way ayant un nœud dans l'emprise : un way est rendu
+    # à chaque ville que son emprise chevauche, même si son centre tombe au-delà du bord.
+    return {nom: [lieu.copie() for lieu, emprise in tous if _chevauche(emprise, emprises[nom])] for nom in noms}
+
+
+def lieux_par_lot(emprises, url=None, timeout=DELAI_HTTP_S, taille_lot=TAILLE_LOT, aire_max=AIRE_LOT_MAX_DEG2,
+                  nb_workers=4):
+    """
+    Lieux touristiques de plusieurs villes {nom: bbox} en un minimum d'allers-retours Overpass.
+    Renvoie {nom: lieux}, chaque valeur ayant la même forme que celle de `lieux_dans_bbox` (None : échec).
+    """
+    url = url or OVERPASS_URL
+    lots = decouper_en_lots(emprises, taille_lot, aire_max)
+    resultats = {}
+    interroger = traces.propager(lambda noms: _lieux_du_lot(noms, emprises, url, timeout))
+    with ThreadPoolExecutor(max_workers=nb_workers) as pool:
+        for lieux_du_lot in pool.map(interroger, lots):
+            resultats.update(lieux_du_lot)
+    return resultats
@@ -0,0 +1,98 @@
+"""
+Temps de marche entre lieux touristiques.
+
+`geopy.distance.geodesic` résout itérativement la distance sur l'ellipsoïde : appelé
+une fois par couple de lieux dans une boucle Python, il domine le calcul d'itinéraire
+des grandes villes. À l'échelle d'une ville, la formule de haversine (sphère de rayon
+moyen) s'en écarte de moins de 0,5 % ; on calcule donc d'un seul coup, avec NumPy,
+la matrice complète des temps de marche entre les lieux d'une ville. Un parcours qui n'en
+lit que quelques lignes les calcule à la demande (`TempsMarcheParLigne`).
+"""
+
+import numpy as np
+
+RAYON_TERRE_KM = 6371.0088  # rayon moyen (IUGG)
+VITESSE_MARCHE_KMH = 4.5
+
+
+def matrice_distances_km(latitudes, longitudes, dtype=np.float64, taille_bloc=256):
+    """
+    Distances de haversine (km) entre tous les couples de points, en une passe vectorisée.
+
+    sin((a - b) / 2) est développé en sin(a/2)·cos(b/2) - cos(a/2)·sin(b/2) : les sinus et
+    cosinus ne sont calculés qu'une fois par point, il ne reste que des produits sur la matrice.
+    La matrice étant symétrique, seul le triangle supérieur est calculé, par blocs de lignes
+    (tableaux temporaires de taille bornée).
+    """
+    lat = np.radians(np.asarray(latitudes, dtype=np.float64))
+    lon = np.radians(np.asarray(longitudes, dtype=np.float64))
+    sin_lat, cos_lat, sin_lon, cos_lon, cos_latitude = (
+        x.astype(dtype) for x in (np.sin(lat / 2), np.cos(lat / 2), np.sin(lon / 2), np.cos(lon / 2), np.cos(lat)))
+    n = len(lat)
+    distances = np.empty((n, n), dtype=dtype)
+    for debut in range(0, n, taille_bloc):
+        lignes, colonnes = slice(debut, min(n, debut + taille_bloc)), slice(debut, n)
+        # a = sin²(Δlat/2) + cos(lat1)·cos(lat2)·sin²(Δlon/2)
+        a = sin_lat[lignes, None] * cos_lat[None, colonnes]
+        a -= cos_lat[lignes, None] * sin_lat[None, colonnes]
+        np.square(a, out=a)
+        b = sin_lon[lignes, None] * cos_lon[None, colonnes]
+        b -= cos_lon[lignes, None] * sin_lon[None, colonnes]
+        np.square(b, out=b)
+        b *= cos_latitude[lignes, None]
+        b *= cos_latitude[None, colonnes]
+        a += b
+        np.clip(a, 0, 1, out=a)
+        np.sqrt(a, out=a)
+        np.arcsin(a, out=a)
+        a *= 2 * RAYON_TERRE_KM
+        distances[lignes, colonnes] = a
+        distances[colonnes, lignes] = a.T
+    return distances
+
+
+def matrice_temps_marche(lieux, vitesse_kmh=VITESSE_MARCHE_KMH, float32=False):
+    """
+    Matrice n×n des temps de marche en minutes (non arrondis) entre les `lieux`
+    (`lieux.Lieu`, ou tout objet avec `latitude` et `longitude`), dans l'ordre de la liste.
+    `float32=True` divise la mémoire par deux (100 Mo au lieu de 200 Mo pour 5 000 lieux).
+    """
+    dtype = np.float32 if float32 else np.float64
+    distances = matrice_distances_km([lieu.latitude for lieu in lieux], [lieu.longitude for lieu in lieux],
+                                     dtype)
+    distances *= dtype(60 / vitesse_kmh)
+    return distances
+
+
+class TempsMarcheParLigne:
+    """
+    Temps de marche en minutes (non arrondis) d'un lieu vers les suivants, ligne par ligne à la demande :
+    même formule que `matrice_temps_marche` (mêmes valeurs, aux erreurs d'arrondi flottant près), sans la matrice n×n.
+    Les sinus et cosinus sont calculés une fois par lieu ; une ligne est un calcul vectorisé en O(n).
+    """
+
+    def __init__(self, lieux, vitesse_kmh=VITESSE_MARCHE_KMH):
+        lat = np.radians(np.array([lieu.latitude for lieu in lieux], dtype=np.float64))
+        lon = np.radians(np.array([lieu.longitude for lieu in lieux], dtype=np.float64))
+        self.sin_lat, self.cos_lat, self.sin_lon, self.cos_lon, self.cos_latitude = (
+            np.sin(lat / 2), np.cos(lat / 2), np.sin(lon / 2), np.cos(lon / 2), np.cos(lat))
+        self.minutes_par_km = 60 / vitesse_kmh
+
+    def ligne(self, i, debut=0):
+        """Temps de marche du lieu `i` vers les lieux `debut`, `debut + 1`... (tableau NumPy)."""
+        colonnes = slice(debut, None)
+        a = self.sin_lat[i] * self.cos_lat[colonnes]
+        a -= self.cos_lat[i] * self.sin_lat[colonnes]
+        np.square(a, out=a)
+        b = self.sin_lon[i] * self.cos_lon[colonnes]
+        b -= self.cos_lon[i] * self.sin_lon[colonnes]
+        np.square(b, out=b)
+        b *= self.cos_latitude[i]
+        b *= self.cos_latitude[colonnes]
+        a += b
+        np.clip(a, 0, 1, out=a)
+        np.sqrt(a, out=a)
+        np.arcsin(a, out=a)
+        a *= 2 * RAYON_TERRE_KM
+        a *= self.minutes_par_km
+        return a
@@ -0,0 +1,146 @@
+"""
+Moteur de requêtes horaires en mémoire (NumPy).
+
+Les trajets du schéma normalisé (voir `horaires.py`) sont chargés une seule fois
+dans des tableaux colonnes, groupés par gare d'origine et triés par heure de départ.
+Un tableau d'offsets façon CSR donne directement la tranche de chaque origine :
+les requêtes deviennent des masques vectorisés et des `searchsorted`, sans curseur
+SQLite partagé entre les threads de Gradio.
+
+Les résultats sont strictement identiques à ceux de `horaires` (même ordre, même
+sémantique de correspondance des noms), qui reste le moteur par défaut.
+"""
+
+import numpy as np
+
+from horaires import heure_en_minutes, minutes_en_heure, MINUTES_PAR_JOUR
+from villes import clean_city_name, minuscules_ascii
+
+_HEURES = [minutes_en_heure(m) for m in range(MINUTES_PAR_JOUR)]
+
+_TYPE_TRAJET = np.dtype([('id', np.int64), ('origine', np.int32), ('destination', np.int32),
+                         ('depart', np.int16), ('arrivee', np.int16), ('duree', np.int16)])
+
+
+class MoteurHoraires:
+    """Horaires en colonnes NumPy, indexés par origine (offsets CSR)."""
+
+    def __init__(self, conn, index=None):
+        stations = conn.execute("SELECT id, nom FROM stations ORDER BY id").fetchall()
+        self.index = index
+        self.noms = [nom for _, nom in stations]
+        self._noms_minuscules = [minuscules_ascii(nom) for nom in self.noms]
+        self._correspondances = {}
+        # Identifiant SQLite -> indice dense dans self.noms
+        ids_stations = np.array([id_station for id_station, _ in stations], dtype=np.int64)
+        indice_par_id = np.full(int(ids_stations.max(initial=0)) + 1, -1, dtype=np.int32)
+        indice_par_id[ids_stations] = np.arange(len(stations), dtype=np.int32)
+        self._indice_par_id = indice_par_id
+
+        curseur = conn.execute("SELECT id, origine_id, destination_id, depart_min, arrivee_min, duree_min FROM trajets")
+        trajets = np.fromiter(curseur, dtype=_TYPE_TRAJET)
+        origine = indice_par_id[trajets['origine']]
+        ordre = np.lexsort((trajets['id'], trajets['depart'], origine))
+
+        self.ids = trajets['id'][ordre]
+        self.origine = origine[ordre]
+        self.destination = indice_par_id[trajets['destination']][ordre]
+        self.depart = trajets['depart'][ordre]
+        self.arrivee = trajets['arrivee'][ordre]
+        self.duree = trajets['duree'][ordre]
+        # Les trajets de l'origine o sont dans [offsets[o], offsets[o + 1])
+        self.offsets = np.searchsorted(self.origine, np.arange(len(self.noms) + 1))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def stations_correspondantes(self, ville):
+        """
+        Indices des gares désignées par `ville` : résolues par l'index des gares s'il y en a un,
+        sinon gares dont le nom contient le nom de ville nettoyé (équivalent de `instr`).
+        """
+        if self.index is not None:
+            return self._indice_par_id[np.array(self.index.resoudre(ville), dtype=np.int64)]
+        motif = minuscules_ascii(clean_city_name(ville))
+        if motif not in self._correspondances:
+            if len(self._correspondances) >= 4096:  # saisies libres : on borne le mémo
+                self._correspondances.clear()
+            self._correspondances[motif] = np.array([i for i, nom in enumerate(self._noms_minuscules) if motif in nom],
+                                                    dtype=np.int32)
+        return self._correspondances[motif]
+
+    def _ligne(self, i):
+        return (self.noms[self.origine[i]], self.noms[self.destination[i]],
+                _HEURES[self.duree[i]], _HEURES[self.depart[i]], _HEURES[self.arrivee[i]])
+
+    def trouver_destinations_par_temps(self, ville_depart, temps_trajet_max_str):
+        """Trouve les villes accessibles depuis une ville de départ dans un temps de trajet donné."""
+        duree_max = heure_en_minutes(temps_trajet_max_str)
+        tranches = []
+        for o in self.stations_correspondantes(ville_depart):
+            debut, fin = self.offsets[o], self.offsets[o + 1]
+            duree = self.duree[debut:fin]
+            tranches.append(np.flatnonzero((duree > 0) & (duree <= duree_max)) + debut)
+        if not tranches:
+            return []
+        indices = np.concatenate(tranches)
+        indices = indices[np.lexsort((self.ids[indices], self.duree[indices]))]
+        return [self._ligne(i) for i in indices]
+
+    def trouver_train_ideal(self, ville_depart, ville_arrivee, heure_min_depart_str):
+        """
+        Trouve le premier train disponible après une heure donnée pour un trajet direct.
+        Retourne un tuple (origine, destination, duree, heure_depart, heure_arrivee) ou None.
+        """
+        heure_min = heure_en_minutes(heure_min_depart_str, arrondi_sup=True)
+        arrivees = self.stations_correspondantes(ville_arrivee)
+        meilleur = None
+        for o in self.stations_correspondantes(ville_depart):
+            debut, fin = self.offsets[o], self.offsets[o + 1]
+            debut += np.searchsorted(self.depart[debut:fin], heure_min, side='left')
+            destinations = self.destination[debut:fin]
+            correspond = destinations == arrivees[0] if len(arrivees) == 1 else np.isin(destinations, arrivees)
+            if not correspond.any():
+                continue
+            # La tranche est triée par (départ, id) : la première correspondance est la meilleure de cette origine.
+            i = debut + int(np.argmax(correspond))
+            if meilleur is None or (self.depart[i], self.ids[i]) < (self.depart[meilleur], self.ids[meilleur]):
+                meilleur = i
+        return None if meilleur is None else self._ligne(meilleur)
+
+    def fenetres_sur_place(self, ville_depart, heure_min_depart_str):
+        """
+        Comme `horaires.fenetres_sur_place`, en un passage sur les tranches des gares concernées :
+        {destination: (aller, retour, minutes entre l'arrivée de l'aller et le départ du retour)}.
+        """
+        heure_min = heure_en_minutes(heure_min_depart_str, arrondi_sup=True)
+        origines = self.stations_correspondantes(ville_depart)
+        tranches = []
+        for o in origines:
+            debut, fin = self.offsets[o], self.offsets[o + 1]
+            debut += np.searchsorted(self.depart[debut:fin], heure_min, side='left')
+            tranches.append(np.flatnonzero(self.duree[debut:fin] > 0) + debut)
+        if not tranches:
+            return {}
+        indices = np.concatenate(tranches)
+        indices = indices[np.lexsort((self.ids[indices], self.depart[indices]))]
+        # Premier aller de chaque destination : première occurrence dans l'ordre (départ, id).
+        _, premiers = np.unique(self.destination[indices], return_index=True)
+        allers = indices[premiers]
+        destinations = self.destination[allers]
+        arrivees = self.depart[allers].astype(np.int32) + self.duree[allers]
+        # Trains vers les gares de départ, triés comme tout le tableau par (origine, départ, id) :
+        # le retour d'une destination est le dernier de sa tranche, s'il part après l'arrivée de l'aller.
+        retours = np.flatnonzero(np.isin(self.destination, origines) & (self.duree > 0))
+        origines_retours = self.origine[retours]
+        debuts = np.searchsorted(origines_retours, destinations, side='left')
+        fins = np.searchsorted(origines_retours, destinations, side='right')
+        fenetres = {}
+        for i, d, arrivee, debut, fin in zip(allers, destinations, arrivees.tolist(), debuts, fins):
+            if debut == fin or self.depart[retours[fin - 1]] < arrivee:
+                continue
+            # Parmi les trains de la dernière heure de départ, le plus petit id (premier de la tranche).
+            tranche = retours[debut:fin]
+            j = tranche[np.searchsorted(self.depart[tranche], self.depart[tranche[-1]], side='left')]
+            fenetres[self.noms[d]] = (self._ligne(i), self._ligne(j), int(self.depart[j]) - arrivee)
+        return fenetres
@@ -0,0 +1,86 @@
+"""
+Connexions SQLite en lecture seule, une par thread.
+
+Une connexion unique partagée entre les threads de Gradio (`check_same_thread=False`)
+sérialise toutes les requêtes, et un curseur partagé mélange leurs résultats.
+`PoolLecture` ouvre paresseusement une connexion par thread :
+
+- en lecture seule par l'URI (`mode=ro`), et `immutable=1` pour une base qui ne change
+  pas pendant que l'application tourne (plus de verrous ni de contrôle de modification) ;
+- `PRAGMA query_only`, `mmap_size` (lecture par projection mémoire plutôt que par appels
+  système) et `cache_size` (cache de pages par connexion) ;
+- un cache de requêtes préparées par connexion (`cached_statements`) : une même chaîne SQL
+  n'est compilée qu'une fois par thread.
+
+La connexion d'un thread est fermée quand ce thread se termine (les pools de threads créés
+pour chaque recherche ne laissent ainsi ni descripteur, ni cache de pages, ni projection) :
+`pool._connexions` ne garde que celles des threads encore vivants.
+
+Les fonctions de requête qui attendent un curseur acceptent aussi bien une connexion
+(`pool.connexion()`), qui expose `execute`.
+"""
+
+import sqlite3
+import threading
+import weakref
+from urllib.request import pathname2url
+
+MMAP_OCTETS = 256 * 1024 * 1024
+CACHE_KIO = 64 * 1024
+NB_REQUETES_PREPAREES = 256
+
+
+class _Attache:
+    """Lien entre un thread et sa connexion : détruit avec les données locales du thread à sa fin."""
+
+    __slots__ = ('conn', '__weakref__')
+
+    def __init__(self, conn):
+        self.conn = conn
+
+
+class PoolLecture:
+    """Une connexion en lecture seule par thread vers `chemin`."""
+
+    def __init__(self, chemin, immuable=True, mmap_octets=MMAP_OCTETS, cache_kio=CACHE_KIO,
+                 nb_requetes_preparees=NB_REQUETES_PREPAREES):
+        self.uri = f"file:{pathname2url(chemin)}?mode=ro" + ("&immutable=1" if immuable else "")
+        self.mmap_octets, self.cache_kio, self.nb_requetes_preparees = mmap_octets, cache_kio, nb_requetes_preparees
+        self._local = threading.local()
+        self._connexions = set()
+        self._verrou = threading.Lock()
+
+    def _ouvrir(self):
+        # Chaque connexion ne sert qu'à son thread ; check_same_thread=False permet seulement à `fermer`
+        # de les fermer toutes depuis le thread principal.
+        conn = sqlite3.connect(self.uri, uri=True, check_same_thread=False,
+                               cached_statements=self.nb_requetes_preparees)
+        conn.execute("PRAGMA query_only = ON")
+        conn.execute(f"PRAGMA mmap_size = {int(self.mmap_octets)}")
+        conn.execute(f"PRAGMA cache_size = {-int(self.cache_kio)}")  # négatif : en Kio
+        with self._verrou:
+            self._connexions.add(conn)
+        return conn
+
+    def _liberer(self, conn):
+        with self._verrou:
+            if conn not in self._connexions:  # déjà fermée par `fermer`
+                return
+            self._connexions.discard(conn)
+        conn.close()
+
+    def connexion(self):
+        """Connexion du thread appelant (ouverte au premier appel, fermée à la fin du thread)."""
+        attache = getattr(self._local, 'attache', None)
+        if attache is None:
+            attache = self._local.attache = _Attache(self._ouvrir())
+            weakref.finalize(attache, self._liberer, attache.conn)
+        return attache.conn
+
+    def fermer(self):
+        """Ferme les connexions de tous les threads (à l'arrêt de l'application)."""
+        with self._verrou:
+            connexions, self._connexions = self._connexions, set()
+        for conn in connexions:
+            conn.close()
+        self._local = threading.local()
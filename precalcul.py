@@ -0,0 +1,340 @@
+"""
+Précalcul des recommandations pour toutes les gares de départ.
+
+La plupart des recherches reprennent quelques durées de trajet et de visite : on les calcule
+d'avance pour chaque gare de départ × tranche de temps de trajet maximum (`TEMPS_TRAJET_MAX`) ×
+tranche de temps sur place (`TEMPS_SUR_PLACE_H`), avec les fonctions de `train_project` :
+
+1. destinations candidates de chaque origine et de chaque tranche (`trouver_destinations_par_temps`
+   puis `destinations_uniques`) ; leur réunion donne les villes à évaluer ;
+2. chaque ville est évaluée une seule fois pour toutes les tranches de temps sur place (ses lieux,
+   puis un itinéraire optimisé par tranche) : son score ne dépend pas de la gare de départ. Les
+   villes sont réparties par lots sur un pool `multiprocessing` ; chaque lot terminé est enregistré,
+   une exécution interrompue reprend donc où elle s'était arrêtée ;
+3. top K de chaque (origine, tranche de trajet, tranche sur place) : score décroissant puis ordre
+   des candidats, comme `classement.classer_au_fil_de_l_eau`.
+
+Les lieux d'une ville ne sont récupérés qu'une fois (store local, ou Overpass par requêtes groupées) ;
+le géocodage passe par le gazetteer et par le cache disque commun aux processus, et les débits par
+hôte (`collecte.DEBITS_PAR_HOTE`) sont partagés entre les processus.
+
+Les trains ne sont pas stockés, seulement le trajet le plus court vers chaque destination : aller et
+retour dépendent de l'heure demandée, et la requête indexée qui les trouve coûte quelques dizaines
+de microsecondes. L'application lit le top K et ses itinéraires en une requête sur les clés primaires
+(`TableRecommandations.classement`) ; une recherche non couverte (autre tranche, correspondances,
+table trop ancienne) est calculée en direct.
+
+Usage :
+    python precalcul.py tgvmax.db --sortie recommandations.db --processus 8
+    python precalcul.py tgvmax.db --temps-max 01:00:00,02:00:00 --sur-place 4,5 --origines NICE,MARMANDE
+"""
+
+import argparse
+import functools
+import json
+import multiprocessing
+import os
+import sqlite3
+import time
+
+import horaires
+from classement import TOP_K
+from pool_sqlite import PoolLecture
+
+TEMPS_TRAJET_MAX = ("01:00:00", "01:30:00", "02:00:00", "02:30:00", "03:00:00")
+TEMPS_SUR_PLACE_H = (2, 3, 4, 5, 6, 8)
+TAILLE_LOT = 8
+INTERVALLE_RAPPORT_S = 5.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS itineraires (
+    id INTEGER PRIMARY KEY,
+    ville TEXT NOT NULL,
+    temps_sur_place_min INTEGER NOT NULL,
+    score INTEGER NOT NULL,
+    lieux TEXT NOT NULL,
+    UNIQUE (ville, temps_sur_place_min)
+);
+CREATE TABLE IF NOT EXISTS villes_evaluees (
+    ville TEXT PRIMARY KEY,
+    nb_lieux INTEGER NOT NULL,
+    maj REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS couvertures (
+    origines TEXT NOT NULL,
+    temps_trajet_max_min INTEGER NOT NULL,
+    temps_sur_place_min INTEGER NOT NULL,
+    maj REAL NOT NULL,
+    PRIMARY KEY (origines, temps_trajet_max_min, temps_sur_place_min)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS recommandations (
+    origines TEXT NOT NULL,
+    temps_trajet_max_min INTEGER NOT NULL,
+    temps_sur_place_min INTEGER NOT NULL,
+    rang INTEGER NOT NULL,
+    score INTEGER NOT NULL,
+    origine TEXT NOT NULL,
+    destination TEXT NOT NULL,
+    duree TEXT NOT NULL,
+    heure_depart TEXT NOT NULL,
+    heure_arrivee TEXT NOT NULL,
+    itineraire_id INTEGER NOT NULL REFERENCES itineraires(id),
+    PRIMARY KEY (origines, temps_trajet_max_min, temps_sur_place_min, rang)
+) WITHOUT ROWID;
+"""
+
+# `origines` : identifiants des gares de départ (JSON), tels que les résout l'index des gares.
+# Une combinaison couverte sans aucune destination renvoie une seule ligne, sans recommandation.
+SQL_CLASSEMENT = """
+SELECT c.maj, r.score, r.origine, r.destination, r.duree, r.heure_depart, r.heure_arrivee, i.lieux
+FROM couvertures c
+LEFT JOIN recommandations r ON r.origines = c.origines AND r.temps_trajet_max_min = c.temps_trajet_max_min
+                           AND r.temps_sur_place_min = c.temps_sur_place_min
+LEFT JOIN itineraires i ON i.id = r.itineraire_id
+WHERE c.origines = ? AND c.temps_trajet_max_min = ? AND c.temps_sur_place_min = ?
+ORDER BY r.rang
+"""
+
+
+def ouvrir(chemin):
+    conn = sqlite3.connect(chemin)
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def cle_origines(ids):
+    return json.dumps(list(ids))
+
+
+# --- Évaluation des villes (processus de travail) ---
+
+def _initialiser_processus(nb_processus):
+    """Débits par hôte répartis entre les processus : ensemble, ils respectent les politiques d'usage."""
+    import collecte
+    for hote in collecte.DEBITS_PAR_HOTE:
+        collecte.DEBITS_PAR_HOTE[hote] /= nb_processus
+    collecte.DEBIT_PAR_DEFAUT /= nb_processus
+
+
+def evaluer_villes(villes, temps_sur_place_min):
+    """
+    [(ville, nb_lieux, {temps sur place: itinéraire})] d'un lot de villes, comme `train_project.classer_destinations`.
+    `nb_lieux` vaut None pour une ville dont la collecte a échoué (réseau, disjoncteur, géocodage).
+    """
+    import train_project
+    from itineraire import optimiser_itineraire
+
+    if train_project.OVERPASS_PAR_LOT and train_project.obtenir_store_lieux() is None:
+        lieux_par_ville = train_project.get_lieux_touristiques_par_lot(villes)
+    else:
+        lieux_par_ville = {ville: train_project.get_lieux_touristiques(ville) for ville in villes}
+    resultats = []
+    for ville in villes:
+        lieux = lieux_par_ville.get(ville)
+        if lieux is None:
+            resultats.append((ville, None, {}))
+            continue
+        itineraires = {}
+        if lieux:
+            for temps in temps_sur_place_min:
+                itineraire, _ = optimiser_itineraire(lieux, temps)
+                itineraires[temps] = [lieu.en_dict() for lieu in itineraire]
+        resultats.append((ville, len(lieux), itineraires))
+    return resultats
+
+
+# --- Écriture ---
+
+def enregistrer_villes(conn, resultats):
+    """
+    Enregistre un lot de villes évaluées (point de reprise). Une ville sans lieux est notée comme telle ;
+    une ville en échec ne l'est pas : elle reste à évaluer.
+    """
+    with conn:
+        for ville, nb_lieux, itineraires in resultats:
+            if nb_lieux is None:
+                continue
+            for temps, lieux in itineraires.items():
+                conn.execute("INSERT INTO itineraires (ville, temps_sur_place_min, score, lieux) VALUES (?, ?, ?, ?) "
+                             "ON CONFLICT (ville, temps_sur_place_min) DO UPDATE SET score = excluded.score, lieux = excluded.lieux",
+                             (ville, temps, len(lieux), json.dumps(lieux, ensure_ascii=False, separators=(',', ':'))))
+            conn.execute("INSERT OR REPLACE INTO villes_evaluees VALUES (?, ?, ?)", (ville, nb_lieux, time.time()))
+
+
+def villes_a_evaluer(conn, villes, temps_sur_place_min, age_max_s=None, reessayer_vides=False):
+    """Villes sans évaluation à jour pour toutes les tranches de temps sur place (reprise d'une exécution)."""
+    limite = time.time() - age_max_s if age_max_s else 0
+    evaluees = {ville: (nb_lieux, maj) for ville, nb_lieux, maj in conn.execute("SELECT ville, nb_lieux, maj FROM villes_evaluees")}
+    tranches = {}
+    for ville, temps in conn.execute("SELECT ville, temps_sur_place_min FROM itineraires"):
+        tranches.setdefault(ville, set()).add(temps)
+    a_faire = []
+    for ville in villes:
+        nb_lieux, maj = evaluees.get(ville, (None, 0))
+        complete = nb_lieux == 0 and not reessayer_vides or bool(nb_lieux) and tranches.get(ville, set()) >= set(temps_sur_place_min)
+        if not complete or maj < limite:
+            a_faire.append(ville)
+    return a_faire
+
+
+def enregistrer_classements(conn, candidats, temps_sur_place_min, k=TOP_K):
+    """
+    Top K de chaque combinaison à partir des itinéraires enregistrés. `candidats` :
+    {(origines, temps_trajet_max_min): destinations uniques}. Une combinaison dont une destination n'a
+    pas été évaluée (collecte en échec) n'est pas couverte : l'application la calcule en direct.
+    Renvoie (nombre de combinaisons couvertes, nombre de combinaisons incomplètes).
+    """
+    scores = {(ville, temps): (id_itineraire, score) for id_itineraire, ville, temps, score
+              in conn.execute("SELECT id, ville, temps_sur_place_min, score FROM itineraires")}
+    evaluees = {ville for (ville,) in conn.execute("SELECT ville FROM villes_evaluees")}
+    maj, nb, incompletes = time.time(), 0, 0
+    with conn:
+        for (origines, temps_max), destinations in candidats.items():
+            if any(dest[1] not in evaluees for dest in destinations):
+                incompletes += len(temps_sur_place_min)
+                continue
+            for temps in temps_sur_place_min:
+                top = sorted((-scores[dest[1], temps][1], i, scores[dest[1], temps][0], dest)
+                             for i, dest in enumerate(destinations) if (dest[1], temps) in scores)[:k]
+                conn.execute("DELETE FROM recommandations WHERE origines = ? AND temps_trajet_max_min = ? "
+                             "AND temps_sur_place_min = ?", (origines, temps_max, temps))
+                for rang, (score, _, id_itineraire, dest) in enumerate(top, 1):
+                    conn.execute("INSERT INTO recommandations VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                 (origines, temps_max, temps, rang, -score, *dest[:5], id_itineraire))
+                conn.execute("INSERT OR REPLACE INTO couvertures VALUES (?, ?, ?, ?)", (origines, temps_max, temps, maj))
+                nb += 1
+    return nb, incompletes
+
+
+# --- Lecture pour l'application ---
+
+class TableRecommandations:
+    """Accès en lecture, une connexion par thread (pas `immutable` : un précalcul peut tourner en parallèle)."""
+
+    def __init__(self, chemin, age_max_s=None):
+        self.chemin, self.age_max_s = chemin, age_max_s
+        self._pool = PoolLecture(chemin, immuable=False)
+
+    def classement(self, origines, temps_trajet_max_min, temps_sur_place_min):
+        """
+        Top K [(score, dest_info, itinéraire)] précalculé ([] : aucune destination), ou None si la
+        combinaison n'est pas couverte ou trop ancienne.
+        """
+        from lieux import Lieu
+
+        lignes = self._pool.connexion().execute(
+            SQL_CLASSEMENT, (cle_origines(origines), temps_trajet_max_min, temps_sur_place_min)).fetchall()
+        if not lignes or self.age_max_s and lignes[0][0] < time.time() - self.age_max_s:
+            return None
+        return [(score, tuple(dest_info), [Lieu(**lieu) for lieu in json.loads(lieux)])
+                for _, score, *dest_info, lieux in lignes if score is not None]
+
+
+# --- Traitement par lots ---
+
+def precalculer(sortie, temps_trajet_max=TEMPS_TRAJET_MAX, temps_sur_place_h=TEMPS_SUR_PLACE_H, origines=None,
+                nb_processus=None, taille_lot=TAILLE_LOT, age_max_s=None, reessayer_vides=False, k=TOP_K):
+    """Précalcule les recommandations dans `sortie` (base `ESCAPADE_DB`) ; renvoie le rapport de débit."""
+    import train_project
+
+    nb_processus = nb_processus or os.cpu_count() or 1
+    temps_sur_place_min = sorted({int(heures * 60) for heures in temps_sur_place_h})
+    index = train_project.obtenir_index_gares()
+    if index is None:
+        raise RuntimeError("le précalcul demande l'index des gares (ESCAPADE_INDEX_GARES)")
+    if origines is None:
+        origines = [nom for (nom,) in train_project.obtenir_pool().connexion().execute(
+            "SELECT s.nom FROM stations s WHERE EXISTS (SELECT 1 FROM trajets t WHERE t.origine_id = s.id) ORDER BY s.nom")]
+    rapport = {'origines': len(origines), 'tranches_trajet': len(temps_trajet_max), 'tranches_sur_place': len(temps_sur_place_min),
+               'processus': nb_processus}
+
+    # 1. Destinations candidates de chaque origine et de chaque tranche de trajet (requêtes indexées).
+    debut = time.perf_counter()
+    candidats, villes = {}, {}
+    for nom in origines:
+        ids = index.resoudre(nom)
+        if not ids:
+            print(f"   -> {nom} : gare inconnue, ignorée")
+            continue
+        for tranche in temps_trajet_max:
+            destinations = train_project.destinations_uniques(train_project.trouver_destinations_par_temps(nom, tranche))
+            candidats[cle_origines(ids), horaires.heure_en_minutes(tranche)] = destinations
+            villes.update((dest[1], None) for dest in destinations)
+    rapport['candidats_s'] = round(time.perf_counter() - debut, 2)
+
+    # 2. Villes à évaluer (celles déjà enregistrées sont reprises telles quelles), par lots.
+    conn = ouvrir(sortie)
+    a_faire = villes_a_evaluer(conn, list(villes), temps_sur_place_min, age_max_s, reessayer_vides)
+    print(f"🔄 {len(candidats)} (origine, tranche) : {len(villes)} villes, dont {len(a_faire)} à évaluer "
+          f"par {nb_processus} processus.")
+    lots = [a_faire[i:i + taille_lot] for i in range(0, len(a_faire), taille_lot)]
+    evaluer = functools.partial(evaluer_villes, temps_sur_place_min=temps_sur_place_min)
+    debut = dernier_rapport = time.perf_counter()
+    nb_evaluees, nb_sans_lieux, nb_echecs = 0, 0, 0
+
+    def suivre(resultats):
+        nonlocal nb_evaluees, nb_sans_lieux, nb_echecs, dernier_rapport
+        enregistrer_villes(conn, resultats)
+        nb_evaluees += len(resultats)
+        nb_sans_lieux += sum(1 for _, nb_lieux, _ in resultats if nb_lieux == 0)
+        nb_echecs += sum(1 for _, nb_lieux, _ in resultats if nb_lieux is None)
+        maintenant = time.perf_counter()
+        if maintenant - dernier_rapport >= INTERVALLE_RAPPORT_S or nb_evaluees == len(a_faire):
+            dernier_rapport = maintenant
+            debit = nb_evaluees / max(maintenant - debut, 1e-9)
+            print(f"   -> {nb_evaluees}/{len(a_faire)} villes ({debit:.1f} villes/s, "
+                  f"reste ~{(len(a_faire) - nb_evaluees) / max(debit, 1e-9):.0f} s)")
+
+    if nb_processus == 1:
+        for lot in lots:
+            suivre(evaluer(lot))
+    elif lots:
+        # « spawn » : des processus neufs, qui importent train_project sans hériter des connexions ouvertes ici.
+        contexte = multiprocessing.get_context("spawn")
+        with contexte.Pool(nb_processus, initializer=_initialiser_processus, initargs=(nb_processus,)) as pool:
+            for resultats in pool.imap_unordered(evaluer, lots):
+                suivre(resultats)
+    duree = time.perf_counter() - debut
+    rapport.update({'villes': len(villes), 'villes_evaluees': nb_evaluees, 'villes_reprises': len(villes) - len(a_faire),
+                    'villes_sans_lieux': nb_sans_lieux, 'villes_en_echec': nb_echecs, 'evaluation_s': round(duree, 2),
+                    'villes_par_s': round(nb_evaluees / duree, 2) if duree else None,
+                    'itineraires_par_s': round(nb_evaluees * len(temps_sur_place_min) / duree, 1) if duree else None})
+
+    # 3. Top K de chaque combinaison.
+    debut = time.perf_counter()
+    rapport['combinaisons'], rapport['combinaisons_incompletes'] = enregistrer_classements(conn, candidats,
+                                                                                            temps_sur_place_min, k)
+    rapport['classement_s'] = round(time.perf_counter() - debut, 2)
+    conn.close()
+    return rapport
+
+
+def _liste(texte, conversion=str):
+    return [conversion(x.strip()) for x in texte.split(',') if x.strip()]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Précalcule les recommandations de toutes les gares de départ.")
+    parser.add_argument("db", help="chemin vers tgvmax.db")
+    parser.add_argument("--sortie", default="recommandations.db", help="table des recommandations (défaut : recommandations.db)")
+    parser.add_argument("--temps-max", type=_liste, default=list(TEMPS_TRAJET_MAX), help="tranches HH:MM:SS, séparées par des virgules")
+    parser.add_argument("--sur-place", type=lambda texte: _liste(texte, float), default=list(TEMPS_SUR_PLACE_H),
+                        help="tranches en heures, séparées par des virgules")
+    parser.add_argument("--origines", type=_liste, help="gares de départ (toutes par défaut)")
+    parser.add_argument("--processus", type=int, help="processus de travail (défaut : nombre de CPU)")
+    parser.add_argument("--lot", type=int, default=TAILLE_LOT, help="villes par tâche (et par requête Overpass groupée)")
+    parser.add_argument("--age-max-jours", type=float, help="réévaluer les villes plus anciennes (défaut : reprise seule)")
+    parser.add_argument("--reessayer-vides", action="store_true", help="réévaluer les villes enregistrées sans lieux")
+    args = parser.parse_args()
+
+    # Lu par train_project à l'import, ici et dans les processus de travail.
+    os.environ["ESCAPADE_DB"] = args.db
+    debut = time.perf_counter()
+    rapport = precalculer(args.sortie, args.temps_max, args.sur_place, args.origines, args.processus, args.lot,
+                          args.age_max_jours * 24 * 3600 if args.age_max_jours else None, args.reessayer_vides)
+    rapport['total_s'] = round(time.perf_counter() - debut, 2)
+    print(f"✅ {rapport['combinaisons']} combinaisons enregistrées dans {args.sortie} en {rapport['total_s']} s.")
+    if rapport['villes_en_echec']:
+        print(f"⚠️ {rapport['villes_en_echec']} villes en échec (réseau, disjoncteur, géocodage) : "
+              f"{rapport['combinaisons_incompletes']} combinaisons non couvertes, relancer pour les reprendre.")
+    print(json.dumps(rapport, ensure_ascii=False))
@@ -0,0 +1,292 @@
+"""
+Base locale des lieux touristiques, indexée par un R-tree SQLite.
+
+Au lieu d'interroger Overpass à chaque recherche, on importe un extrait OSM (.osm XML)
+ou un export JSON d'Overpass dans `lieux.db`. Les mêmes filtres de tags et le même
+calcul de `temps_visite_min` / `score_pertinence` que `lieux.extraire_lieux` sont
+appliqués à l'import ; une requête par emprise devient une recherche dans le R-tree. Un extrait
+régional est lu deux fois en flux, sans être gardé en mémoire : seuls les lieux touristiques et les
+coordonnées des nœuds de leurs ways le sont.
+
+Le contenu est organisé par régions (une emprise nommée, par exemple une ville) :
+rafraîchir une région remplace uniquement ses lieux.
+
+Usage :
+    python store_lieux.py importer nice.osm --region NICE --bbox 43.64,43.76,7.18,7.33
+    python store_lieux.py importer export_overpass.json --region PACA
+    python store_lieux.py rafraichir --region NICE --bbox 43.64,43.76,7.18,7.33   # via Overpass
+    python store_lieux.py rafraichir --gazetteer tgvmax.db --age-max-jours 30     # toutes les villes du gazetteer
+"""
+
+import argparse
+import sqlite3
+import time
+import xml.etree.ElementTree as ET
+
+from classement import ResumeVille
+from lieux import Lieu, elements_overpass, est_touristique, lieu_depuis_element
+from pool_sqlite import PoolLecture
+
+TABLE_LIEUX = """
+CREATE TABLE IF NOT EXISTS lieux (
+    id INTEGER PRIMARY KEY,
+    region TEXT NOT NULL,
+    osm_type TEXT NOT NULL,
+    osm_id INTEGER NOT NULL,
+    nom TEXT NOT NULL,
+    latitude REAL NOT NULL,
+    longitude REAL NOT NULL,
+    temps_visite_min INTEGER NOT NULL,
+    score_pertinence INTEGER NOT NULL
+)"""
+INDEX_REGION = "CREATE INDEX IF NOT EXISTS idx_lieux_region ON lieux(region)"
+
+SCHEMA = TABLE_LIEUX + ";\n" + INDEX_REGION + """;
+CREATE VIRTUAL TABLE IF NOT EXISTS lieux_rtree USING rtree(id, min_lat, max_lat, min_lon, max_lon);
+CREATE TABLE IF NOT EXISTS regions (
+    nom TEXT PRIMARY KEY,
+    sud REAL, nord REAL, ouest REAL, est REAL,
+    source TEXT,
+    nb_lieux INTEGER NOT NULL,
+    maj REAL NOT NULL
+);
+"""
+
+# Un lieu présent dans plusieurs régions qui se chevauchent n'est renvoyé qu'une fois, dans l'ordre
+# de sortie d'Overpass (nœuds puis ways, par identifiant).
+SQL_LIEUX_BBOX = """
+SELECT l.nom, l.latitude, l.longitude, l.temps_visite_min, l.score_pertinence
+FROM lieux_rtree r
+JOIN lieux l ON l.id = r.id
+WHERE r.min_lat >= ? AND r.max_lat <= ? AND r.min_lon >= ? AND r.max_lon <= ?
+GROUP BY l.osm_type, l.osm_id
+ORDER BY l.osm_type, l.osm_id
+"""
+
+# Résumé d'une emprise pour le classement (voir classement.py) : nombre de lieux par durée de visite.
+SQL_RESUME_BBOX = """
+SELECT temps_visite_min, COUNT(*), SUM(score_pertinence)
+FROM (SELECT l.temps_visite_min, l.score_pertinence
+      FROM lieux_rtree r
+      JOIN lieux l ON l.id = r.id
+      WHERE r.min_lat >= ? AND r.max_lat <= ? AND r.min_lon >= ? AND r.max_lon <= ?
+      GROUP BY l.osm_type, l.osm_id)
+GROUP BY temps_visite_min
+ORDER BY temps_visite_min
+"""
+
+
+def ouvrir(chemin):
+    conn = sqlite3.connect(chemin)
+    conn.executescript(SCHEMA)
+    _retirer_tags(conn)
+    return conn
+
+
+def _retirer_tags(conn):
+    """Retire la colonne `tags` des stores créés avant qu'on cesse de l'écrire (jamais relue)."""
+    if 'tags' not in {ligne[1] for ligne in conn.execute("PRAGMA table_info(lieux)")}:
+        return
+    colonnes = "id, region, osm_type, osm_id, nom, latitude, longitude, temps_visite_min, score_pertinence"
+    with conn:  # copie de la table, en une transaction : DROP COLUMN n'existe qu'à partir de SQLite 3.35
+        conn.execute("BEGIN")
+        conn.execute("DROP INDEX IF EXISTS idx_lieux_region")
+        conn.execute("ALTER TABLE lieux RENAME TO lieux_avec_tags")
+        conn.execute(TABLE_LIEUX)
+        conn.execute(f"INSERT INTO lieux ({colonnes}) SELECT {colonnes} FROM lieux_avec_tags")
+        conn.execute("DROP TABLE lieux_avec_tags")
+        conn.execute(INDEX_REGION)
+    conn.execute("VACUUM")
+
+
+# --- Lecture des sources ---
+
+def _elements_json(chemin, types):
+    with open(chemin, encoding='utf-8') as fichier:
+        for element in elements_overpass(iter(lambda: fichier.read(1 << 16), "")):
+            if element.get('type') in types:
+                yield element
+
+
+def _elements_xml(chemin, types):
+    """Éléments `types` d'un extrait OSM XML au format Overpass JSON, un à un : l'arbre est vidé après chaque élément."""
+    contexte = ET.iterparse(chemin, events=('start', 'end'))
+    _, racine = next(contexte)
+    for evenement, noeud in contexte:
+        if evenement != 'end' or noeud.tag not in ('node', 'way', 'relation'):
+            continue
+        if noeud.tag in types:
+            element = {'type': noeud.tag, 'id': int(noeud.get('id')),
+                       'tags': {tag.get('k'): tag.get('v') for tag in noeud.iter('tag')}}
+            if noeud.tag == 'node':
+                element['lat'], element['lon'] = float(noeud.get('lat')), float(noeud.get('lon'))
+            else:
+                element['nodes'] = [int(nd.get('ref')) for nd in noeud.iter('nd')]
+            yield element
+        racine.clear()
+
+
+def _elements_touristiques(lire):
+    """
+    Éléments touristiques (filtre de la requête Overpass) d'une source lue deux fois par `lire(types)`,
+    sans la garder en mémoire : le premier passage relève les nœuds des ways touristiques sans centre, le
+    second ne garde que les coordonnées de ces nœuds et produit les lieux au fil de la lecture (ces
+    ways à la fin, leur centre calculé comme la moyenne de leurs nœuds).
+    """
+    utiles = set()
+    for element in lire(('way',)):
+        if 'center' not in element and est_touristique(element.get('tags', {})):
+            utiles.update(element.get('nodes', ()))
+    coordonnees, sans_centre = {}, []
+    for element in lire(('node', 'way')):
+        if element['type'] == 'node' and element['id'] in utiles and 'lat' in element:
+            coordonnees[element['id']] = (element['lat'], element['lon'])
+        if not est_touristique(element.get('tags', {})):
+            continue
+        if element['type'] == 'way' and 'center' not in element:
+            sans_centre.append(element)
+        else:
+            yield element
+    for element in sans_centre:
+        points = [coordonnees[ref] for ref in element.pop('nodes', ()) if ref in coordonnees]
+        if points:
+            element['center'] = {'lat': sum(p[0] for p in points) / len(points),
+                                 'lon': sum(p[1] for p in points) / len(points)}
+        yield element
+
+
+def elements_overpass_json(chemin):
+    """Éléments touristiques d'un export JSON d'Overpass (`out center;` ou `out body;` avec les nœuds des ways)."""
+    return _elements_touristiques(lambda types: _elements_json(chemin, types))
+
+
+def elements_osm_xml(chemin):
+    """Éléments touristiques (nœuds et ways, au format Overpass JSON) d'un extrait OSM XML, lu en flux."""
+    return _elements_touristiques(lambda types: _elements_xml(chemin, types))
+
+
+def elements_overpass_live(bbox):
+    """Éléments renvoyés par l'API Overpass pour une emprise (sud, nord, ouest, est)."""
+    from client_http import client
+    from lieux import DELAI_HTTP_S, OVERPASS_URL, elements_reponse, requete_overpass
+    with client.get(OVERPASS_URL, params={'data': requete_overpass(bbox)}, timeout=DELAI_HTTP_S, stream=True) as response:
+        response.raise_for_status()
+        return list(elements_reponse(response))
+
+
+# --- Écriture ---
+
+def _dans_bbox(latitude, longitude, bbox):
+    if bbox is None:
+        return True
+    s, n, w, e = bbox
+    return s <= latitude <= n and w <= longitude <= e
+
+
+def rafraichir_region(conn, region, elements, bbox=None, source=None):
+    """
+    Remplace les lieux de `region` par ceux de `elements` (filtrés comme la requête Overpass
+    et, si `bbox` est donnée, limités à cette emprise). Renvoie le nombre de lieux enregistrés.
+    """
+    lignes = []
+    for element in elements:
+        if element['type'] not in ('node', 'way') or not est_touristique(element.get('tags', {})):
+            continue
+        lieu = lieu_depuis_element(element)
+        if lieu is None or not _dans_bbox(lieu.latitude, lieu.longitude, bbox):
+            continue
+        lignes.append((region, element['type'], element['id'], lieu.nom, lieu.latitude, lieu.longitude,
+                       lieu.temps_visite_min, lieu.score_pertinence))
+    with conn:
+        conn.execute("DELETE FROM lieux_rtree WHERE id IN (SELECT id FROM lieux WHERE region = ?)", (region,))
+        conn.execute("DELETE FROM lieux WHERE region = ?", (region,))
+        for ligne in lignes:
+            curseur = conn.execute("INSERT INTO lieux (region, osm_type, osm_id, nom, latitude, longitude, "
+                                   "temps_visite_min, score_pertinence) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", ligne)
+            conn.execute("INSERT INTO lieux_rtree VALUES (?, ?, ?, ?, ?)",
+                         (curseur.lastrowid, ligne[4], ligne[4], ligne[5], ligne[5]))
+        sud, nord, ouest, est = bbox or (None, None, None, None)
+        conn.execute("INSERT OR REPLACE INTO regions VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                     (region, sud, nord, ouest, est, source, len(lignes), time.time()))
+    return len(lignes)
+
+
+def regions_a_rafraichir(conn, emprises, age_max_s):
+    """Régions {nom: bbox} absentes du store ou plus anciennes que `age_max_s`."""
+    maj = dict(conn.execute("SELECT nom, maj FROM regions"))
+    limite = time.time() - age_max_s
+    return {nom: bbox for nom, bbox in emprises.items() if maj.get(nom, 0) < limite}
+
+
+# --- Lecture pour l'application ---
+
+class StoreLieux:
+    """Accès en lecture au store, une connexion par thread (pas `immutable` : `rafraichir` peut tourner en parallèle)."""
+
+    def __init__(self, chemin):
+        self.chemin = chemin
+        self._pool = PoolLecture(chemin, immuable=False)
+
+    def _connexion(self):
+        return self._pool.connexion()
+
+    def lieux_dans_bbox(self, bbox):
+        """Lieux d'une emprise (sud, nord, ouest, est), au même format que `lieux.lieux_dans_bbox`."""
+        lignes = self._connexion().execute(SQL_LIEUX_BBOX, tuple(bbox)).fetchall()
+        return [Lieu(*ligne) for ligne in lignes]
+
+    def resume_bbox(self, bbox):
+        """`classement.ResumeVille` d'une emprise, calculé dans l'index sans charger les lieux."""
+        lignes = self._connexion().execute(SQL_RESUME_BBOX, tuple(bbox)).fetchall()
+        return ResumeVille(tuple((temps, nb) for temps, nb, _ in lignes), sum(pertinents for _, _, pertinents in lignes))
+
+    def lieux_par_lot(self, emprises):
+        """{nom: lieux} pour plusieurs emprises, comme `lieux.lieux_par_lot`."""
+        return {nom: self.lieux_dans_bbox(bbox) for nom, bbox in emprises.items()}
+
+
+def _bbox(texte):
+    return tuple(float(x) for x in texte.split(','))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Base locale des lieux touristiques (R-tree SQLite).")
+    parser.add_argument("--store", default="lieux.db", help="chemin de la base des lieux (défaut : lieux.db)")
+    commandes = parser.add_subparsers(dest="commande", required=True)
+
+    importer = commandes.add_parser("importer", help="importer un extrait .osm ou un export JSON d'Overpass")
+    importer.add_argument("fichier")
+    importer.add_argument("--region", required=True)
+    importer.add_argument("--bbox", type=_bbox, help="sud,nord,ouest,est : ne garder que les lieux de cette emprise")
+
+    rafraichir = commandes.add_parser("rafraichir", help="recharger des régions depuis l'API Overpass")
+    rafraichir.add_argument("--region")
+    rafraichir.add_argument("--bbox", type=_bbox, help="sud,nord,ouest,est")
+    rafraichir.add_argument("--gazetteer", help="tgvmax.db : une région par ville géocodée du gazetteer")
+    rafraichir.add_argument("--age-max-jours", type=float, default=0, help="ne recharger que les régions plus anciennes")
+    args = parser.parse_args()
+
+    connexion = ouvrir(args.store)
+    if args.commande == "importer":
+        lecteur = elements_osm_xml if args.fichier.endswith('.osm') else elements_overpass_json
+        nb = rafraichir_region(connexion, args.region, lecteur(args.fichier), args.bbox, args.fichier)
+        print(f"✅ {nb} lieux importés dans la région {args.region}.")
+    else:
+        if args.gazetteer:
+            gazetteer = sqlite3.connect(args.gazetteer)
+            emprises = {nom: (s, n, w, e) for nom, s, n, w, e in gazetteer.execute(
+                "SELECT DISTINCT nom_nettoye, sud, nord, ouest, est FROM stations WHERE sud IS NOT NULL")}
+            gazetteer.close()
+        elif args.region and args.bbox:
+            emprises = {args.region: args.bbox}
+        else:
+            parser.error("rafraichir demande --region et --bbox, ou --gazetteer")
+        a_faire = regions_a_rafraichir(connexion, emprises, args.age_max_jours * 24 * 3600)
+        print(f"🔄 {len(a_faire)} région(s) à rafraîchir sur {len(emprises)}.")
+        for region, bbox in a_faire.items():
+            try:
+                nb = rafraichir_region(connexion, region, elements_overpass_live(bbox), bbox, "overpass")
+                print(f"   -> {region} : {nb} lieux")
+            except Exception as e:
+                print(f"   -> {region} : échec ({e}), région conservée telle quelle")
+    connexion.close()
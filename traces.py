@@ -0,0 +1,356 @@
+"""
+Traces et métriques des recherches d'escapade.
+
+Quand une recherche est lente, il faut savoir où est passé le temps : SQL, géocodage, Overpass,
+itinéraire ou carte. Ce module fournit :
+
+- des étapes chronométrées (`with etape("sql.destinations"):`, ou le décorateur `trace`) et des
+  compteurs (`compter("lieux", 42)`), agrégés globalement (`Metriques`, format texte Prometheus)
+  et par recherche ;
+- un contexte de recherche (`requete`, `requete_en_flux` pour un générateur) propagé aux threads
+  de travail par `propager`, et à la fin de chaque recherche une ligne de journal JSON (durée,
+  étapes, compteurs) sur le logger `escapade.requetes`. La durée d'une étape y est cumulée sur
+  tous ses appels, threads de travail compris : elle peut dépasser celle de la recherche ;
+- un serveur HTTP minimal (`demarrer_serveur_metriques`) qui expose `/metrics` ;
+- un profileur par échantillonnage, optionnel (`SEUIL_PROFIL_MS`) : pendant une recherche, les
+  piles de ses threads sont relevées toutes les `INTERVALLE_PROFIL_S` ; si elle dépasse le seuil,
+  elles sont écrites au format « folded » (une pile par ligne, `f1;f2;f3 nb`) dans
+  `DOSSIER_PROFILS`, que lisent flamegraph.pl, speedscope ou inferno pour tracer le flame graph.
+
+Désactivé (`ESCAPADE_TRACES=0` ou `activer(False)`), `etape` renvoie un gestionnaire de contexte
+vide partagé et `compter` retourne aussitôt : le coût se réduit à un test de booléen.
+"""
+
+import contextvars
+import itertools
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from contextlib import nullcontext
+from functools import wraps
+
+ACTIF = os.environ.get("ESCAPADE_TRACES", "1") != "0"
+# Profileur : seuil de durée (ms) au-delà duquel le profil d'une recherche est écrit ; 0 = désactivé.
+SEUIL_PROFIL_MS = float(os.environ.get("ESCAPADE_PROFIL_SEUIL_MS", "0"))
+INTERVALLE_PROFIL_S = 0.005
+DOSSIER_PROFILS = os.environ.get("ESCAPADE_PROFILS", "profils")
+# Bornes (secondes) de l'histogramme des durées d'étapes.
+BORNES_DUREE_S = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+journal = logging.getLogger("escapade.requetes")
+if not journal.handlers:
+    _sortie = logging.StreamHandler(sys.stdout)
+    _sortie.setFormatter(logging.Formatter("%(message)s"))
+    journal.addHandler(_sortie)
+    journal.setLevel(logging.INFO)
+    journal.propagate = False
+
+_requete = contextvars.ContextVar("requete_escapade", default=None)
+_RIEN = nullcontext()
+_numeros = itertools.count(1)
+
+
+def activer(actif=True):
+    global ACTIF
+    ACTIF = actif
+
+
+def _nom_serie(nom, etiquettes):
+    return nom if not etiquettes else nom + "{" + ",".join(f'{cle}="{valeur}"' for cle, valeur in etiquettes) + "}"
+
+
+class Metriques:
+    """Compteurs et histogrammes de durées agrégés sur toutes les recherches."""
+
+    def __init__(self, bornes_s=BORNES_DUREE_S):
+        self.bornes_s = bornes_s
+        self._compteurs = Counter()  # (nom, etiquettes) -> total
+        self._durees = {}  # (nom, etiquettes) -> [nb par seau (dont +Inf)..., somme, nb]
+        self._verrou = threading.Lock()
+
+    def compter(self, nom, n, etiquettes=()):
+        with self._verrou:
+            self._compteurs[nom, etiquettes] += n
+
+    def observer(self, nom, duree_s, etiquettes=()):
+        with self._verrou:
+            serie = self._durees.get((nom, etiquettes))
+            if serie is None:
+                serie = self._durees[nom, etiquettes] = [0] * (len(self.bornes_s) + 3)
+            serie[bisect_left(self.bornes_s, duree_s)] += 1  # dernier seau : +Inf
+            serie[-2] += duree_s
+            serie[-1] += 1
+
+    def vider(self):
+        with self._verrou:
+            self._compteurs.clear()
+            self._durees.clear()
+
+    def texte(self):
+        """Exposition au format texte de Prometheus (version 0.0.4)."""
+        with self._verrou:
+            compteurs = sorted(self._compteurs.items())
+            durees = sorted((cle, list(serie)) for cle, serie in self._durees.items())
+        lignes = []
+        for nom in sorted({nom for (nom, _), _ in compteurs}):
+            lignes += [f"# HELP escapade_{nom}_total Compteur « {nom} » des recherches.",
+                       f"# TYPE escapade_{nom}_total counter"]
+            lignes += [f"{_nom_serie(f'escapade_{nom}_total', etiquettes)} {total}"
+                       for (autre, etiquettes), total in compteurs if autre == nom]
+        if durees:
+            lignes += ["# HELP escapade_etape_duree_secondes Durée des étapes des recherches.",
+                       "# TYPE escapade_etape_duree_secondes histogram"]
+        for (nom, etiquettes), serie in durees:
+            etiquettes = (('etape', nom),) + etiquettes
+            cumul = 0
+            for borne, nb in zip(self.bornes_s + (float('inf'),), serie[:-2]):
+                cumul += nb
+                le = "+Inf" if borne == float('inf') else repr(borne)
+                lignes.append(f"{_nom_serie('escapade_etape_duree_secondes_bucket', etiquettes + (('le', le),))} {cumul}")
+            lignes.append(f"{_nom_serie('escapade_etape_duree_secondes_sum', etiquettes)} {serie[-2]:.6f}")
+            lignes.append(f"{_nom_serie('escapade_etape_duree_secondes_count', etiquettes)} {serie[-1]}")
+        return "\n".join(lignes) + "\n"
+
+
+metriques = Metriques()
+
+
+class _Echantillonneur(threading.Thread):
+    """Relève les piles des threads d'une recherche toutes les `intervalle_s` secondes."""
+
+    def __init__(self, requete, intervalle_s):
+        super().__init__(name=f"profil-{requete.numero}", daemon=True)
+        self.requete, self.intervalle_s = requete, intervalle_s
+        self.piles = Counter()
+        self.arret = threading.Event()
+
+    def run(self):
+        while not self.arret.wait(self.intervalle_s):
+            threads = set(self.requete.threads)
+            for ident, cadre in sys._current_frames().items():
+                if ident not in threads:
+                    continue
+                pile = []
+                while cadre is not None:
+                    code = cadre.f_code
+                    pile.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{cadre.f_lineno})")
+                    cadre = cadre.f_back
+                self.piles[";".join(reversed(pile))] += 1
+
+
+class Requete:
+    """Une recherche : étapes, compteurs, threads qui travaillent pour elle."""
+
+    def __init__(self, nom, attributs):
+        self.nom, self.attributs = nom, attributs
+        self.numero = next(_numeros)
+        self.debut = time.perf_counter()
+        self.etapes = defaultdict(lambda: [0, 0.0])  # nom -> [nb, durée totale (s)]
+        self.compteurs = Counter()
+        self.threads = set()
+        self._verrou = threading.Lock()
+        self._profil = None
+        if SEUIL_PROFIL_MS > 0:
+            self._profil = _Echantillonneur(self, INTERVALLE_PROFIL_S)
+            self._profil.start()
+
+    def terminer(self, erreur=None):
+        duree_ms = (time.perf_counter() - self.debut) * 1000
+        metriques.observer(self.nom, duree_ms / 1000)
+        entree = {'requete': self.numero, 'nom': self.nom, **self.attributs, 'duree_ms': round(duree_ms, 1),
+                  'etapes': {nom: {'nb': nb, 'duree_ms': round(duree * 1000, 1)}
+                             for nom, (nb, duree) in sorted(self.etapes.items(), key=lambda e: -e[1][1])},
+                  'compteurs': dict(sorted(self.compteurs.items()))}
+        if erreur is not None:
+            entree['erreur'] = repr(erreur)
+        if self._profil is not None:
+            self._profil.arret.set()
+            self._profil.join()
+            if duree_ms >= SEUIL_PROFIL_MS and self._profil.piles:
+                entree['profil'] = ecrire_profil(self._profil.piles, f"{self.nom}-{self.numero}")
+        journal.info(json.dumps(entree, ensure_ascii=False, default=str))
+
+
+def ecrire_profil(piles, nom, dossier=None):
+    """Écrit les piles {pile: nb d'échantillons} au format folded ; renvoie le chemin du fichier."""
+    dossier = dossier or DOSSIER_PROFILS
+    os.makedirs(dossier, exist_ok=True)
+    chemin = os.path.join(dossier, f"{nom}.folded")
+    with open(chemin, "w", encoding="utf-8") as fichier:
+        for pile, nb in piles.most_common():
+            fichier.write(f"{pile} {nb}\n")
+    return chemin
+
+
+class _Etape:
+    __slots__ = ('nom', 'etiquettes', 'debut')
+
+    def __init__(self, nom, etiquettes):
+        self.nom, self.etiquettes = nom, etiquettes
+
+    def __enter__(self):
+        self.debut = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        duree = time.perf_counter() - self.debut
+        metriques.observer(self.nom, duree, self.etiquettes)
+        requete = _requete.get()
+        if requete is not None:
+            with requete._verrou:
+                serie = requete.etapes[self.nom]
+                serie[0] += 1
+                serie[1] += duree
+        return False
+
+
+def etape(nom, **etiquettes):
+    """Gestionnaire de contexte qui chronomètre l'étape `nom` (étiquettes : séries Prometheus distinctes)."""
+    if not ACTIF:
+        return _RIEN
+    return _Etape(nom, tuple(sorted(etiquettes.items())))
+
+
+def trace(nom):
+    """Décorateur : chaque appel de la fonction est une étape `nom`."""
+    def decorer(fonction):
+        @wraps(fonction)
+        def tracee(*args, **kwargs):
+            if not ACTIF:
+                return fonction(*args, **kwargs)
+            with _Etape(nom, ()):
+                return fonction(*args, **kwargs)
+        return tracee
+    return decorer
+
+
+def compter(nom, n=1, **etiquettes):
+    """Ajoute `n` au compteur `nom` (global, et de la recherche en cours)."""
+    if not ACTIF:
+        return
+    etiquettes = tuple(sorted(etiquettes.items()))
+    metriques.compter(nom, n, etiquettes)
+    requete = _requete.get()
+    if requete is not None:
+        with requete._verrou:
+            requete.compteurs[_nom_serie(nom, etiquettes)] += n
+
+
+class _Activation:
+    """Rend `requete` courante dans le thread appelant le temps d'un bloc."""
+    __slots__ = ('requete', 'jeton', 'ident')
+
+    def __init__(self, requete):
+        self.requete = requete
+
+    def __enter__(self):
+        self.jeton = _requete.set(self.requete)
+        self.ident = threading.get_ident()
+        with self.requete._verrou:
+            self.requete.threads.add(self.ident)
+
+    def __exit__(self, *exc):
+        with self.requete._verrou:
+            self.requete.threads.discard(self.ident)
+        _requete.reset(self.jeton)
+        return False
+
+
+def propager(fonction):
+    """
+    `fonction` exécutée dans la recherche en cours, depuis un autre thread (pool de threads) :
+    à appeler dans le thread de la recherche, avant `pool.submit`/`pool.map`.
+    """
+    requete = _requete.get()
+    if requete is None:
+        return fonction
+
+    @wraps(fonction)
+    def dans_la_requete(*args, **kwargs):
+        with _Activation(requete):
+            return fonction(*args, **kwargs)
+    return dans_la_requete
+
+
+def requete(nom, **attributs):
+    """Gestionnaire de contexte d'une recherche : étapes et compteurs, journal JSON à la sortie."""
+    if not ACTIF:
+        return _RIEN
+    return _BlocRequete(Requete(nom, attributs))
+
+
+class _BlocRequete:
+    __slots__ = ('requete', 'activation')
+
+    def __init__(self, requete):
+        self.requete = requete
+
+    def __enter__(self):
+        self.activation = _Activation(self.requete)
+        self.activation.__enter__()
+        return self.requete
+
+    def __exit__(self, type_exc, exc, trace_exc):
+        self.activation.__exit__()
+        self.requete.terminer(exc)
+        return False
+
+
+def requete_en_flux(nom, generateur, **attributs):
+    """
+    Comme `requete`, pour une recherche qui produit ses résultats par un générateur : la recherche
+    n'est courante que pendant chaque `next` (Gradio peut reprendre le générateur dans un autre
+    thread), et se termine quand le générateur est épuisé ou fermé.
+    """
+    if not ACTIF:
+        yield from generateur
+        return
+    courante = Requete(nom, attributs)
+    erreur = None
+    try:
+        while True:
+            with _Activation(courante):
+                try:
+                    valeur = next(generateur)
+                except StopIteration:
+                    return
+            yield valeur
+    except BaseException as e:
+        erreur = e
+        raise
+    finally:
+        generateur.close()
+        courante.terminer(None if isinstance(erreur, GeneratorExit) else erreur)
+
+
+def demarrer_serveur_metriques(port, hote="127.0.0.1"):
+    """
+    Sert `/metrics` (texte Prometheus) dans un thread ; renvoie le serveur (`shutdown()` pour l'arrêter).
+    Local par défaut : les métriques (villes recherchées, hôtes appelés) ne sont exposées ailleurs que sur demande.
+    """
+    # http.server (email, http.client...) coûte plus à importer que tout ce module : seulement ici.
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class GestionnaireMetriques(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/metrics", "/"):
+                self.send_error(404)
+                return
+            corps = metriques.texte().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(corps)))
+            self.end_headers()
+            self.wfile.write(corps)
+
+        def log_message(self, format, *args):
+            pass
+
+    serveur = ThreadingHTTPServer((hote, port), GestionnaireMetriques)
+    threading.Thread(target=serveur.serve_forever, name="metriques", daemon=True).start()
+    return serveur
@@ -1,162 +1,368 @@
 
 
 # ==============================================================================
-# BLOC 1 : INSTALLATION, IMPORTS ET CONFIGURATION
+# BLOC 1 : IMPORTS ET CONFIGURATION
 # ==============================================================================
-
+# Importer ce module n'a pas d'effet de bord : la base, l'index des gares, le moteur horaire, le
+# store des lieux et le géocodeur sont ouverts à leur première utilisation (`obtenir_*`), et les
+# bibliothèques lourdes (gradio, folium, geopy, requests, numpy) importées par les fonctions qui
+# s'en servent. Points d'entrée : `servir()` (interface Gradio et métriques) et `chercher()` (une
+# recherche dans le terminal), voir BLOC 4 et `python train_project.py --help`.
+
+import argparse
+import functools
+import logging
+import os
 import sqlite3
-import pandas as pd
-from geopy.geocoders import Nominatim
-from geopy.distance import geodesic
-import folium
-import requests
-import re
+import threading
+import time
+from contextlib import closing
 from datetime import datetime, timedelta
-import gradio as gr
-import gradio_folium as grf
 
+import carte
+import gazetteer
+import horaires
+import traces
+from cache_resultats import TAILLE_MAX, TTL_S, CacheResultats
+from classement import (TOP_K, ChargeurParLots, ResumesVilles, borne_score, classer_au_fil_de_l_eau, ordre_evaluation,
+                        resumer_lieux)
+from villes import clean_city_name, minuscules_ascii
 
-db_path = r"/content/drive/MyDrive/Colab Notebook/SNCF/tgvmax.db"
-try:
-    conn = sqlite3.connect(db_path, check_same_thread=False)
-    cur = conn.cursor()
-    print("✅ Connexion à la base de données réussie.")
-except Exception as e:
-    print(f"❌ Erreur de connexion à la base de données : {e}")
+db_path = os.environ.get("ESCAPADE_DB", r"/content/drive/MyDrive/Colab Notebook/SNCF/tgvmax.db")
+# immutable=1 suppose que la base ne change pas pendant que l'application tourne ; "0" si un import
+# (gazetteer.py, horaires.py) peut la modifier en parallèle.
+BASE_IMMUABLE = os.environ.get("ESCAPADE_BASE_IMMUABLE", "1") != "0"
 
+# Index des noms de gares (repli des accents, arbre préfixe, trigrammes) : saisie libre -> identifiants
+# exacts, requêtes par égalité et autocomplétion de la ville de départ. "0" : ancien filtre par `instr`.
+INDEX_GARES = os.environ.get("ESCAPADE_INDEX_GARES", "1") != "0"
 
-geolocator = Nominatim(user_agent="mon_appli_itineraire_gradio", timeout=10)
+# Moteur horaire : "sqlite" (par défaut) ou "numpy" (tout en mémoire, sans curseur partagé).
+MOTEUR = os.environ.get("ESCAPADE_MOTEUR", "sqlite")
 
-# ==============================================================================
-# BLOC 2 : VOS FONCTIONS UTILITAIRES ET PRINCIPALES (INCHANGÉES)
-# ==============================================================================
+# Requêtes Overpass groupées (plusieurs villes par requête) ; "0" pour une requête par ville.
+OVERPASS_PAR_LOT = os.environ.get("ESCAPADE_OVERPASS_LOT", "1") != "0"
+
+# Lieux touristiques : base locale indexée (voir store_lieux.py) si elle existe, API Overpass sinon.
+CHEMIN_STORE_LIEUX = os.environ.get("ESCAPADE_STORE_LIEUX", "lieux.db")
+
+# Recommandations précalculées (voir precalcul.py) si la table existe : une recherche couverte est servie
+# par une lecture indexée ; les lignes plus anciennes que ESCAPADE_PRECALCUL_AGE_MAX_J jours sont ignorées.
+CHEMIN_RECOMMANDATIONS = os.environ.get("ESCAPADE_PRECALCUL", "recommandations.db")
+AGE_MAX_RECOMMANDATIONS_S = float(os.environ.get("ESCAPADE_PRECALCUL_AGE_MAX_J", "7")) * 24 * 3600
+
+# Résumés des lieux des villes déjà évaluées : bornes du classement quand il n'y a pas de store local.
+resumes_villes = ResumesVilles()
+
+# Résultats des recherches récentes (LRU + TTL), recherches identiques simultanées regroupées.
+cache_escapades = CacheResultats(int(os.environ.get("ESCAPADE_CACHE_RESULTATS_TAILLE", TAILLE_MAX)),
+                                 float(os.environ.get("ESCAPADE_CACHE_RESULTATS_TTL_S", TTL_S)))
+# Diagnostics (taux de succès du cache...) au niveau DEBUG : logging.getLogger("escapade").setLevel(logging.DEBUG).
+journal = logging.getLogger("escapade")
+
+# Affichage progressif : classement provisoire rafraîchi au plus toutes les INTERVALLE_FLUX_S secondes.
+INTERVALLE_FLUX_S = 0.25
+NB_LIGNES_CLASSEMENT = 10
+
+# Carte : couches GeoJSON (défaut), "cluster" ou "marqueurs" (voir carte.py) ; fonds de carte par ville de départ.
+MODE_CARTE = os.environ.get("ESCAPADE_MODE_CARTE", carte.MODE_CARTE)
+cartes_de_base = carte.CartesDeBase()
+
+# Métriques au format Prometheus sur http://ESCAPADE_METRIQUES_HOTE:ESCAPADE_METRIQUES_PORT/metrics
+# (démarrées par `servir`) ; port "0" pour ne pas les servir. Locales par défaut, "0.0.0.0" pour
+# qu'un Prometheus distant les collecte.
+PORT_METRIQUES = int(os.environ.get("ESCAPADE_METRIQUES_PORT", "9464"))
+HOTE_METRIQUES = os.environ.get("ESCAPADE_METRIQUES_HOTE", "127.0.0.1")
+
+# Recherches traitées en même temps par l'interface, les suivantes attendent dans la file de Gradio
+# (1 par défaut, comme Gradio ; voir benchmarks/charge.py pour le dimensionner).
+CONCURRENCE_INTERFACE = int(os.environ.get("ESCAPADE_CONCURRENCE", "1"))
+
+# Trajets avec correspondances (Connection Scan) : changement minimum en gare, en minutes.
+CORRESPONDANCE_MIN = 10
+
+NOMINATIM_DOMAINE = os.environ.get("ESCAPADE_NOMINATIM_DOMAINE", "nominatim.openstreetmap.org")
+CHEMIN_CACHE_GEOCODAGE = os.environ.get("ESCAPADE_CACHE_GEOCODAGE", "cache_geocodage.db")
+
+def ressource(ouvrir):
+    """
+    Ressource partagée ouverte par `ouvrir()` au premier appel, une seule fois même entre threads.
+    Un échec n'est pas gardé : l'appel suivant réessaie.
+    """
+    verrou, ouverte = threading.Lock(), []
+
+    @functools.wraps(ouvrir)
+    def obtenir():
+        if not ouverte:
+            with verrou:
+                if not ouverte:
+                    ouverte.append(ouvrir())
+        return ouverte[0]
+
+    obtenir.fermer = ouverte.clear
+    return obtenir
+
+@ressource
+def obtenir_pool():
+    """Prépare la base (seules écritures de l'application), puis une connexion en lecture seule par thread."""
+    from pool_sqlite import PoolLecture
 
-def clean_city_name(city_name):
-    if not isinstance(city_name, str):
-        return ""
-    cleaned_name = re.sub(r'\s*\([^)]*\)$', '', city_name).strip()
-    cleaned_name = re.sub(r'\s*(ST JEAN|MATABIAU|VILLE BOURBON|ST CHARLES|PART DIEU|SAINT LAUD|MONTPARNASSE|EST|NORD|LYON|AUSTERLITZ)\s*$', '', cleaned_name, flags=re.IGNORECASE).strip()
-    if cleaned_name.lower() == "toulouse":
-        return "TOULOUSE"
-    return cleaned_name
-
-def estimer_temps_visite(tags):
-    if tags.get('tourism') == 'museum' or tags.get('historic') == 'castle':
-        return 120
-    if tags.get('historic') in ['cathedral', 'church']:
-        return 45
-    if tags.get('tourism') == 'attraction' or tags.get('historic') == 'monument':
-        return 30
-    if tags.get('leisure') == 'park':
-        return 60
-    return 20
-
-def calculer_temps_trajet_a_pied(coords1, coords2, vitesse_kmh=4.5):
-    if not coords1 or not coords2:
-        return 0
     try:
-        distance_km = geodesic(coords1, coords2).kilometers
-    except ValueError:
-        return 0
-    return round((distance_km / vitesse_kmh) * 60)
+        with closing(sqlite3.connect(db_path)) as conn:
+            print("✅ Connexion à la base de données réussie.")
+            if not horaires.schema_normalise_present(conn):
+                print("⏳ Construction du schéma horaire normalisé (une seule fois)...")
+                horaires.construire_schema_normalise(conn)
+            gazetteer.ajouter_colonnes_geo(conn)
+    except Exception as e:
+        print(f"❌ Erreur de connexion à la base de données : {e}")
+        raise
+    return PoolLecture(db_path, immuable=BASE_IMMUABLE)
+
+@ressource
+def obtenir_index_gares():
+    """Index des noms de gares, ou None (désactivé, ou indisponible : filtre par nom)."""
+    if not INDEX_GARES:
+        return None
+    from index_gares import IndexGares
 
-def trouver_destinations_par_temps(ville_depart, temps_trajet_max_str):
-    pattern = f"%{clean_city_name(ville_depart)}%"
-    sql = "SELECT Origine, Destination, strftime('%H:%M:%S', (julianday(Heure_arrivee) - julianday(Heure_depart)) * 86400, 'unixepoch') AS duree, TIME(Heure_depart) AS heure_depart, TIME(Heure_arrivee) AS heure_arrivee FROM tgvmax_trajets WHERE LOWER(Origine) LIKE LOWER(?) AND duree > '00:00:00' AND duree <= ? ORDER BY duree"
-    cur.execute(sql, (pattern, temps_trajet_max_str))
-    return cur.fetchall()
+    try:
+        index = IndexGares.depuis_base(obtenir_pool().connexion())
+    except Exception as e:
+        print(f"❌ Index des gares indisponible, filtre par nom : {e}")
+        return None
+    print(f"✅ Index des gares construit ({len(index)} gares).")
+    return index
+
+@ressource
+def obtenir_moteur():
+    """Moteur NumPy si ESCAPADE_MOTEUR=numpy (None sinon, ou s'il ne peut être chargé : SQLite)."""
+    if MOTEUR != "numpy":
+        return None
+    try:
+        from moteur_numpy import MoteurHoraires
+        moteur = MoteurHoraires(obtenir_pool().connexion(), obtenir_index_gares())
+    except Exception as e:
+        print(f"❌ Moteur NumPy indisponible, utilisation de SQLite : {e}")
+        return None
+    print(f"✅ Moteur NumPy chargé ({len(moteur)} trajets).")
+    return moteur
+
+@ressource
+def obtenir_store_lieux():
+    """Store local des lieux s'il existe, None sinon (API Overpass)."""
+    if not os.path.exists(CHEMIN_STORE_LIEUX):
+        return None
+    from store_lieux import StoreLieux
+    return StoreLieux(CHEMIN_STORE_LIEUX)
+
+@ressource
+def obtenir_recommandations():
+    """Table des recommandations précalculées si elle existe, None sinon (calcul en direct)."""
+    if not os.path.exists(CHEMIN_RECOMMANDATIONS):
+        return None
+    from precalcul import TableRecommandations
+    return TableRecommandations(CHEMIN_RECOMMANDATIONS, AGE_MAX_RECOMMANDATIONS_S)
+
+@ressource
+def obtenir_geocodeur():
+    """
+    Géocodeur Nominatim avec cache. Il passe par le client HTTP partagé : pool keep-alive, reprises,
+    disjoncteur et limiteur de Nominatim (1 requête/s) communs à tous les threads de collecte.
+    """
+    from geopy.geocoders import Nominatim
+    from client_http import adaptateur_geopy
+    from geocodage import CacheGeocodage
+
+    geolocator = Nominatim(user_agent="mon_appli_itineraire_gradio", timeout=10, domain=NOMINATIM_DOMAINE,
+                           scheme="http" if NOMINATIM_DOMAINE.startswith(("localhost", "127.0.0.1")) else "https",
+                           adapter_factory=adaptateur_geopy())
+    return CacheGeocodage(geolocator, CHEMIN_CACHE_GEOCODAGE)
 
+# ==============================================================================
+# BLOC 2 : VOS FONCTIONS UTILITAIRES ET PRINCIPALES (INCHANGÉES)
+# ==============================================================================
+
+@traces.trace("horaires.destinations")
+def trouver_destinations_par_temps(ville_depart, temps_trajet_max_str, date_voyage=None):
+    # Le moteur NumPy confond les dates : une recherche datée passe par l'index (origine, jour) de SQLite.
+    moteur, jour = obtenir_moteur(), horaires.jour_du_voyage(date_voyage)
+    if moteur is not None and jour is None:
+        return moteur.trouver_destinations_par_temps(ville_depart, temps_trajet_max_str)
+    return horaires.trouver_destinations_par_temps(obtenir_pool().connexion(), ville_depart, temps_trajet_max_str,
+                                                   obtenir_index_gares(), jour)
+
+@traces.trace("localisation")
+def localiser_gare(nom_gare):
+    """Coordonnées d'une gare : gazetteer hors ligne d'abord, géocodeur (avec cache) sinon."""
+    return gazetteer.localiser_station(obtenir_pool().connexion(), nom_gare) or obtenir_geocodeur().localiser(nom_gare)
+
+@traces.trace("lieux")
 def get_lieux_touristiques(nom_ville):
-    nom_ville_nettoye = clean_city_name(nom_ville)
+    """Lieux d'une ville ([] : aucun, ou ville introuvable), ou None si le géocodage ou la collecte a échoué."""
     try:
-        location = geolocator.geocode(nom_ville_nettoye, exactly_one=True)
-        if not location or 'boundingbox' not in location.raw:
-            return []
+        location = localiser_gare(nom_ville)
     except Exception:
+        return None
+    if not location or not location.boundingbox:
         return []
-    bbox = location.raw['boundingbox']
-    s, n, w, e = [float(x) for x in bbox]
-    overpass_url = "http://overpass-api.de/api/interpreter"
-    overpass_query = f"""[out:json][timeout:25];(node["tourism"~"museum|attraction|gallery|viewpoint"]({s},{w},{n},{e});way["tourism"~"museum|attraction|gallery|viewpoint"]({s},{w},{n},{e});node["historic"~"castle|monument|ruins|cathedral|church"]({s},{w},{n},{e});way["historic"~"castle|monument|ruins|cathedral|church"]({s},{w},{n},{e}););out center;"""
+    store_lieux = obtenir_store_lieux()
+    if store_lieux is not None:
+        return store_lieux.lieux_dans_bbox(location.boundingbox)
+    from lieux import lieux_dans_bbox
+    return lieux_dans_bbox(location.boundingbox)
+
+@traces.trace("lieux.resume")
+def resume_lieux_touristiques(nom_ville):
+    """Résumé des lieux d'une ville pour borner son score : store local, sinon villes déjà évaluées, sinon None."""
+    store_lieux = obtenir_store_lieux()
+    if store_lieux is None:
+        return resumes_villes.lire(nom_ville)
     try:
-        response = requests.get(overpass_url, params={'data': overpass_query})
-        data = response.json()
-        lieux = []
-        for element in data.get('elements', []):
-            tags = element.get('tags', {})
-            if 'name' not in tags:
-                continue
-            lat, lon = (element.get('lat'), element.get('lon')) if element['type'] == 'node' else (element.get('center', {}).get('lat'), element.get('center', {}).get('lon'))
-            if not lat or not lon:
-                continue
-            lieux.append({'nom': tags['name'], 'latitude': lat, 'longitude': lon, 'tags': tags, 'temps_visite_min': estimer_temps_visite(tags), 'score_pertinence': 1 if 'wikipedia' in tags else 0})
-        return lieux
-    except requests.exceptions.RequestException:
-        return []
+        location = localiser_gare(nom_ville)
+    except Exception:
+        return None
+    if not location or not location.boundingbox:
+        return resumer_lieux([])
+    return store_lieux.resume_bbox(location.boundingbox)
 
-def creer_itineraire_visite_avec_trajet(lieux_tries, temps_disponible_min):
-    itineraire, temps_total = [], 0
-    if not lieux_tries:
-        return [], 0
-    premier_lieu = lieux_tries[0]
-    if premier_lieu['temps_visite_min'] <= temps_disponible_min:
-        itineraire.append(premier_lieu)
-        temps_total += premier_lieu['temps_visite_min']
+@traces.trace("lieux.lot")
+def get_lieux_touristiques_par_lot(noms_villes):
+    """
+    Lieux de plusieurs villes en quelques requêtes Overpass groupées : {nom: lieux}, comme
+    `get_lieux_touristiques` (None : échec du géocodage ou de la collecte).
+    """
+    emprises, lieux_par_ville = {}, {}
+    for nom_ville in noms_villes:
+        try:
+            location = localiser_gare(nom_ville)
+        except Exception:
+            lieux_par_ville[nom_ville] = None
+            continue
+        if location and location.boundingbox:
+            emprises[nom_ville] = location.boundingbox
+        else:
+            lieux_par_ville[nom_ville] = []
+    store_lieux = obtenir_store_lieux()
+    if store_lieux is not None:
+        lieux_par_ville.update(store_lieux.lieux_par_lot(emprises))
     else:
-        return [], 0
-    for lieu_candidat in lieux_tries[1:]:
-        dernier_lieu = itineraire[-1]
-        coords1, coords2 = (dernier_lieu['latitude'], dernier_lieu['longitude']), (lieu_candidat['latitude'], lieu_candidat['longitude'])
-        temps_trajet = calculer_temps_trajet_a_pied(coords1, coords2)
-        if temps_total + temps_trajet + lieu_candidat['temps_visite_min'] <= temps_disponible_min:
-            lieu_candidat['trajet_depuis_precedent'] = temps_trajet
-            itineraire.append(lieu_candidat)
-            temps_total += temps_trajet + lieu_candidat['temps_visite_min']
-    return itineraire, temps_total
-
-def trouver_train_ideal(ville_depart, ville_arrivee, heure_min_depart_str):
+        from lieux import lieux_par_lot
+        lieux_par_ville.update(lieux_par_lot(emprises))
+    return lieux_par_ville
+
+@traces.trace("horaires.train")
+def trouver_train_ideal(ville_depart, ville_arrivee, heure_min_depart_str, date_voyage=None):
     """
-    Trouve le premier train disponible après une heure donnée pour un trajet direct.
+    Trouve le premier train disponible après une heure donnée pour un trajet direct
+    (circulant le `date_voyage` 'AAAA-MM-JJ' s'il est donné, toutes dates confondues sinon).
     Retourne un tuple (origine, destination, duree, heure_depart, heure_arrivee) ou None.
     """
-    pattern_dep, pattern_arr = f"%{clean_city_name(ville_depart)}%", f"%{clean_city_name(ville_arrivee)}%"
-    sql = "SELECT Origine, Destination, strftime('%H:%M:%S', (julianday(Heure_arrivee) - julianday(Heure_depart)) * 86400, 'unixepoch') AS duree, TIME(Heure_depart) AS heure_depart, TIME(Heure_arrivee) AS heure_arrivee FROM tgvmax_trajets WHERE LOWER(Origine) LIKE LOWER(?) AND LOWER(Destination) LIKE LOWER(?) AND TIME(Heure_depart) >= ? ORDER BY TIME(Heure_depart) ASC LIMIT 1"
-    cur.execute(sql, (pattern_dep, pattern_arr, heure_min_depart_str))
-    return cur.fetchone()
+    moteur, jour = obtenir_moteur(), horaires.jour_du_voyage(date_voyage)
+    if moteur is not None and jour is None:
+        return moteur.trouver_train_ideal(ville_depart, ville_arrivee, heure_min_depart_str)
+    return horaires.trouver_train_ideal(obtenir_pool().connexion(), ville_depart, ville_arrivee, heure_min_depart_str,
+                                        obtenir_index_gares(), jour)
+
+@traces.trace("horaires.fenetres")
+def fenetres_sur_place(ville_depart, heure_min_depart_str, date_voyage=None):
+    """
+    {destination: (aller, retour, minutes sur place)} de toutes les destinations directes en une requête :
+    premier aller après l'heure donnée, dernier retour du jour. Les villes sans retour possible sont absentes.
+    """
+    moteur, jour = obtenir_moteur(), horaires.jour_du_voyage(date_voyage)
+    if moteur is not None and jour is None:
+        return moteur.fenetres_sur_place(ville_depart, heure_min_depart_str)
+    return horaires.fenetres_sur_place(obtenir_pool().connexion(), ville_depart, heure_min_depart_str,
+                                       obtenir_index_gares(), jour)
+
+_reseaux, _verrou_reseaux = {}, threading.Lock()
+
+def _ouvrir_reseau(jour):
+    from correspondances import ReseauConnexions
+    return ReseauConnexions(obtenir_pool().connexion(), obtenir_index_gares(), jour)
 
+@traces.trace("horaires.reseau")
+def obtenir_reseau(date_voyage=None):
+    """
+    Réseau pour les trajets avec correspondances (Connection Scan), chargé à la première demande :
+    un par date de voyage demandée (quelques dizaines au plus dans l'export), plus celui de toutes les dates.
+    """
+    jour = horaires.jour_du_voyage(date_voyage)
+    with _verrou_reseaux:
+        obtenir = _reseaux.get(jour)
+        if obtenir is None:
+            obtenir = _reseaux[jour] = ressource(functools.partial(_ouvrir_reseau, jour))
+    return obtenir()
+
+@traces.trace("horaires.trajet")
+def trouver_trajet(ville_depart, ville_arrivee, heure_min_depart_str, nb_correspondances_max=0, date_voyage=None):
+    """
+    Trajet arrivant le plus tôt après une heure donnée, direct ou avec correspondances.
+    Retourne (resume, etapes) où resume a la forme d'un train direct, ou (None, []).
+    """
+    if nb_correspondances_max == 0:
+        train = trouver_train_ideal(ville_depart, ville_arrivee, heure_min_depart_str, date_voyage)
+        return (train, [train]) if train else (None, [])
+    trajet = obtenir_reseau(date_voyage).trajet_au_plus_tot(ville_depart, ville_arrivee, heure_min_depart_str,
+                                                            nb_correspondances_max, CORRESPONDANCE_MIN)
+    return trajet if trajet else (None, [])
+
+def formater_correspondances(etapes):
+    """Détail des trains successifs d'un trajet avec correspondances (vide pour un trajet direct)."""
+    if len(etapes) < 2:
+        return ""
+    lignes = "".join(f"  - {e[0]} ({e[3][:5]}) → {e[1]} ({e[4][:5]})\n" for e in etapes)
+    return f"- *{len(etapes) - 1} correspondance(s) :*\n" + lignes
+
+def construire_carte_de_base(ville_depart):
+    """Fond de carte centré sur la ville de départ, avec son marqueur ; None si elle n'est pas localisée."""
+    import folium
+
+    try:
+        index_gares = obtenir_index_gares()
+        loc_depart = (index_gares is not None and gazetteer.localiser_ville(obtenir_pool().connexion(), index_gares, ville_depart)) \
+            or obtenir_geocodeur().localiser(ville_depart)
+    except Exception:
+        return None
+    if not loc_depart:
+        return None
+    m = folium.Map(location=[loc_depart.latitude, loc_depart.longitude], zoom_start=7)
+    folium.Marker(location=[loc_depart.latitude, loc_depart.longitude], popup=f"<b>Départ : {carte.nom_court(ville_depart)}</b>", icon=folium.Icon(color='red', icon='train', prefix='fa')).add_to(m)
+    return m
+
+@traces.trace("carte")
 def generer_carte_recommandation(ville_depart, destinations, itineraire_choisi, ville_choisie):
     """Génère la carte Folium finale avec toutes les informations."""
-    ville_depart_nettoyee = clean_city_name(ville_depart)
-    try:
-        loc_depart = geolocator.geocode(ville_depart_nettoyee)
-        m = folium.Map(location=[loc_depart.latitude, loc_depart.longitude], zoom_start=7)
-    except:
-        m = folium.Map(location=[46.2276, 2.2137], zoom_start=5)
+    import folium
 
-    if loc_depart:
-        folium.Marker(location=[loc_depart.latitude, loc_depart.longitude], popup=f"<b>Départ : {ville_depart}</b>", icon=folium.Icon(color='red', icon='train', prefix='fa')).add_to(m)
+    m = cartes_de_base.obtenir(minuscules_ascii(clean_city_name(ville_depart)), lambda: construire_carte_de_base(ville_depart))
+    if m is None:
+        m = folium.Map(location=[46.2276, 2.2137], zoom_start=5)
 
     try:
-        loc_choisie = geolocator.geocode(clean_city_name(ville_choisie))
+        loc_choisie = localiser_gare(ville_choisie)
         if loc_choisie:
             folium.Circle(location=[loc_choisie.latitude, loc_choisie.longitude], radius=8000, color='red', fill=True, fill_color='red', fill_opacity=0.2).add_to(m)
     except:
         pass
 
-    for dest in destinations:
+    # Une seule requête (jointure sur `stations`) pour toutes les destinations ; le géocodeur ne sert
+    # plus que pour les gares absentes du gazetteer.
+    coordonnees = gazetteer.coordonnees_stations(obtenir_pool().connexion(), {dest[1] for dest in destinations})
+    points_destinations = []
+    for dest in {dest[1]: dest for dest in reversed(destinations)}.values():  # un point par gare
         if dest[1] != ville_choisie:
             try:
-                loc_dest = geolocator.geocode(clean_city_name(dest[1]))
+                loc_dest = coordonnees.get(dest[1]) or obtenir_geocodeur().localiser(dest[1])
                 if loc_dest:
-                    folium.Marker(location=[loc_dest.latitude, loc_dest.longitude], popup=f"<i>{dest[1]}</i><br>Durée : {dest[2]}", icon=folium.Icon(color='blue', icon='info-sign')).add_to(m)
+                    points_destinations.append((loc_dest.latitude, loc_dest.longitude, carte.popup_destination(dest[1], dest[2])))
             except:
                 continue
+    carte.ajouter_points(m, points_destinations, 'destination', MODE_CARTE)
 
-    for i, lieu in enumerate(itineraire_choisi):
-        popup_html = f"<b>{i+1}. {lieu['nom']}</b><br>Visite: {lieu['temps_visite_min']} min"
-        if 'trajet_depuis_precedent' in lieu:
-            popup_html = f"Trajet: {lieu['trajet_depuis_precedent']} min<br>" + popup_html
-        folium.Marker(location=[lieu['latitude'], lieu['longitude']], popup=popup_html, icon=folium.Icon(color='green', icon='camera', prefix='fa')).add_to(m)
+    points_etapes = [(lieu.latitude, lieu.longitude, carte.popup_etape(i + 1, lieu)) for i, lieu in enumerate(itineraire_choisi)]
+    carte.ajouter_points(m, points_etapes, 'etape', MODE_CARTE)
 
     # Return the Folium map object instead of saving it
     return m
@@ -165,10 +371,162 @@ def generer_carte_recommandation(ville_depart, destinations, itineraire_choisi,
 # BLOC 3 : LA FONCTION PRINCIPALE POUR GRADIO
 # ==============================================================================
 
-def trouver_escapade(ville_depart, heure_depart_souhaitee_str, temps_trajet_max, temps_sur_place_heures, progress=gr.Progress()):
+def cle_escapade(ville_depart, heure_depart_souhaitee_str, temps_trajet_max, temps_sur_place_heures, nb_correspondances_max=0, date_voyage=None):
+    """Entrées normalisées comme les utilisent les requêtes (gares désignées ou ville nettoyée, heures en minutes, jour)."""
+    index_gares = obtenir_index_gares()
+    gares = index_gares.resoudre(ville_depart) if index_gares is not None else minuscules_ascii(clean_city_name(ville_depart))
+    return (gares, horaires.heure_en_minutes(heure_depart_souhaitee_str, arrondi_sup=True),
+            horaires.heure_en_minutes(temps_trajet_max), int(temps_sur_place_heures * 60), int(nb_correspondances_max or 0),
+            horaires.jour_du_voyage(date_voyage))
+
+def sans_progression(*args, **kwargs):
+    """Suivi de progression hors de l'interface : ignoré."""
+
+def trouver_escapade_en_flux(ville_depart, heure_depart_souhaitee_str, temps_trajet_max, temps_sur_place_heures, nb_correspondances_max=0, date_voyage=None, progress=sans_progression):
+    """
+    Point d'entrée de l'interface (générateur) : résultat en cache pour des entrées équivalentes,
+    sinon les étapes du calcul au fur et à mesure. Seules les recherches ayant abouti sont gardées
+    (un échec peut venir d'une panne réseau). Chaque recherche est tracée (voir traces.py).
+    """
+    yield from traces.requete_en_flux(
+        "trouver_escapade",
+        etapes_escapade(ville_depart, heure_depart_souhaitee_str, temps_trajet_max, temps_sur_place_heures,
+                        nb_correspondances_max, date_voyage, progress),
+        ville_depart=ville_depart, heure_depart=heure_depart_souhaitee_str, temps_trajet_max=temps_trajet_max,
+        temps_sur_place_heures=temps_sur_place_heures, nb_correspondances_max=nb_correspondances_max,
+        date_voyage=date_voyage)
+
+def etapes_escapade(ville_depart, heure_depart_souhaitee_str, temps_trajet_max, temps_sur_place_heures, nb_correspondances_max=0, date_voyage=None, progress=sans_progression):
+    """Étapes de `trouver_escapade_en_flux`, hors traçage."""
+    calculer = lambda: calculer_escapade(ville_depart, heure_depart_souhaitee_str, temps_trajet_max,
+                                         temps_sur_place_heures, nb_correspondances_max, date_voyage, progress)
+    try:
+        cle = cle_escapade(ville_depart, heure_depart_souhaitee_str, temps_trajet_max, temps_sur_place_heures,
+                           nb_correspondances_max, date_voyage)
+    except (ValueError, IndexError):
+        yield from calculer()
+        return
+    yield from cache_escapades.obtenir_en_flux(cle, calculer, garder=lambda resultat: resultat[1] is not None)
+    if journal.isEnabledFor(logging.DEBUG):
+        stats = cache_escapades.statistiques()
+        journal.debug("cache des recherches : %.0f %% de succès, %d + %d évictions (taille + TTL)",
+                      100 * stats['taux_succes'], stats['evictions_taille'], stats['evictions_ttl'])
+
+def date_invalide(date_voyage):
+    """Vrai si `date_voyage` est renseignée mais n'est pas une date 'AAAA-MM-JJ' (par exemple '02/05/2024')."""
+    try:
+        horaires.jour_du_voyage(date_voyage)
+    except ValueError:
+        return True
+    return False
+
+def trouver_escapade(ville_depart, heure_depart_souhaitee_str, temps_trajet_max, temps_sur_place_heures, nb_correspondances_max=0, date_voyage=None, progress=sans_progression):
+    """Comme `trouver_escapade_en_flux`, sans les étapes intermédiaires : renvoie (markdown, carte)."""
+    resultat = None
+    for resultat in trouver_escapade_en_flux(ville_depart, heure_depart_souhaitee_str, temps_trajet_max,
+                                             temps_sur_place_heures, nb_correspondances_max, date_voyage, progress):
+        pass
+    return resultat
+
+def formater_classement_provisoire(scores, nb_traites, nb_total, nb_elagues):
+    """Markdown du classement en cours : `scores` [(score, dest_info)] des villes déjà évaluées."""
+    resultat_md = f"### ⏳ Classement provisoire ({nb_traites}/{nb_total} destinations analysées"
+    resultat_md += f", dont {nb_elagues} écartées)\n" if nb_elagues else ")\n"
+    if not scores:
+        return resultat_md + "Analyse des premières destinations en cours...\n"
+    resultat_md += "| # | Destination | Lieux à visiter | Trajet |\n|---|---|---|---|\n"
+    for rang, (score, dest_info) in enumerate(sorted(scores, key=lambda entree: -entree[0])[:NB_LIGNES_CLASSEMENT], 1):
+        resultat_md += f"| {rang} | **{dest_info[1]}** | {score} | {dest_info[2]} |\n"
+    return resultat_md
+
+def destinations_uniques(destinations_candidates):
+    """Une entrée par gare d'arrivée (son trajet le plus court), dans l'ordre du classement."""
+    return list({dest[1]: dest for dest in reversed(destinations_candidates)}.values())
+
+@traces.trace("precalcul")
+def classement_precalcule(ville_depart, temps_trajet_max, temps_sur_place_min, budgets=None):
+    """
+    Top K [(score, dest_info, itinéraire)] de la table précalculée, ou None si elle ne couvre pas la recherche
+    ou si l'une de ses villes n'offre pas tout le temps sur place demandé (`budgets` {ville: minutes}).
+    """
+    table, index_gares = obtenir_recommandations(), obtenir_index_gares()
+    if table is None or index_gares is None:
+        return None
+    top = table.classement(index_gares.resoudre(ville_depart), horaires.heure_en_minutes(temps_trajet_max),
+                           temps_sur_place_min)
+    if top and budgets is not None and any(budgets.get(dest_info[1], 0) < temps_sur_place_min for _, dest_info, _ in top):
+        traces.compter("precalcul", resultat="fenetre")
+        return None
+    traces.compter("precalcul", resultat="miss" if top is None else "hit")
+    return top
+
+def classer_destinations(destinations_uniques_list, temps_sur_place_min, progress=sans_progression, budgets=None):
+    """
+    Évalue les destinations (lieux, itinéraire) et produit le classement provisoire au fur et à mesure
+    (générateur) ; renvoie le top K final [(score, dest_info, itinéraire)]. `budgets` {ville: minutes}
+    donne le temps réellement utilisable sur place quand il est plus court que `temps_sur_place_min`.
+    """
+    from itineraire import optimiser_itineraire
+    from lieux import TEMPS_VISITE_MIN
+
+    yield formater_classement_provisoire([], 0, len(destinations_uniques_list), 0), None
+
+    budget = lambda nom_ville: min(temps_sur_place_min, (budgets or {}).get(nom_ville, temps_sur_place_min))
+
+    # Borne du nombre de visites par ville (résumé de ses lieux : store local ou villes déjà évaluées) ;
+    # sans résumé, aucune ville ne peut dépasser temps_sur_place // TEMPS_VISITE_MIN visites.
+    bornes = []
+    for dest_info in destinations_uniques_list:
+        resume, temps = resume_lieux_touristiques(dest_info[1]), budget(dest_info[1])
+        bornes.append(borne_score(resume, temps) if resume else temps // TEMPS_VISITE_MIN)
+
+    if OVERPASS_PAR_LOT and obtenir_store_lieux() is None:
+        # Requêtes Overpass groupées, lancées seulement pour les villes qui arrivent à l'évaluation.
+        from lieux import TAILLE_LOT
+
+        lots = ChargeurParLots((destinations_uniques_list[i][1] for i in ordre_evaluation(bornes)),
+                               get_lieux_touristiques_par_lot, TAILLE_LOT)
+        chercher_lieux = lambda nom_ville: lots.obtenir(nom_ville, [])
+    else:
+        chercher_lieux = get_lieux_touristiques
+
+    def evaluer_destination(dest_info):
+        lieux = chercher_lieux(dest_info[1])
+        if lieux is None:  # échec de la collecte : rien à mémoriser, une prochaine recherche réessaiera
+            return None
+        resumes_villes.enregistrer(dest_info[1], resumer_lieux(lieux))
+        if not lieux:  # ville sans lieux : sa borne (-1) l'écartera des prochaines recherches
+            return None
+        traces.compter("lieux", len(lieux))
+        with traces.etape("itineraire"):
+            itineraire_ville, _ = optimiser_itineraire(lieux, budget(dest_info[1]))
+        return len(itineraire_ville), itineraire_ville
+
+    def suivre(termines, total, dest_info):
+        progress(termines / total * 0.8 + 0.1, desc=f"Analyzing {dest_info[1]}...") # Progress from 0.1 to 0.9
+
+    # Appels Overpass/Nominatim en parallèle ; les villes qui ne peuvent plus entrer dans le top K ne sont pas évaluées.
+    # Classement provisoire affiché dès la première ville évaluée, puis au plus toutes les INTERVALLE_FLUX_S.
+    top_destinations, nb_elagues, scores, dernier_affichage = [], 0, [], 0
+    for dest_info, resultat, top_destinations, traites, nb_elagues in classer_au_fil_de_l_eau(
+            destinations_uniques_list, evaluer_destination, bornes, TOP_K):
+        suivre(traites, len(destinations_uniques_list), dest_info)
+        if resultat is not None:
+            scores.append((resultat[0], dest_info))
+            if len(scores) == 1 or time.monotonic() - dernier_affichage >= INTERVALLE_FLUX_S:
+                dernier_affichage = time.monotonic()
+                yield formater_classement_provisoire(scores, traites, len(destinations_uniques_list), nb_elagues), None
+    print(f"   -> {len(destinations_uniques_list) - nb_elagues} destinations évaluées, {nb_elagues} écartées par leur borne.")
+    traces.compter("destinations_candidates", len(destinations_uniques_list))
+    traces.compter("destinations_elaguees", nb_elagues)
+    return top_destinations
+
+def calculer_escapade(ville_depart, heure_depart_souhaitee_str, temps_trajet_max, temps_sur_place_heures, nb_correspondances_max=0, date_voyage=None, progress=sans_progression):
     """
-    Cette fonction unique prend toutes les entrées de l'utilisateur et retourne
-    les sorties formatées pour l'interface Gradio.
+    Cette fonction unique prend toutes les entrées de l'utilisateur et produit
+    les sorties (markdown, carte) pour l'interface Gradio, au fur et à mesure :
+    classement provisoire à chaque ville évaluée, itinéraire, puis itinéraire et carte.
+    Sans `date_voyage` ('AAAA-MM-JJ'), les horaires de toutes les dates chargées sont confondus.
     """
     progress(0, desc="Starting search...")
 
@@ -176,50 +534,68 @@ def trouver_escapade(ville_depart, heure_depart_souhaitee_str, temps_trajet_max,
     temps_sur_place_min = int(temps_sur_place_heures * 60)
     # Use the directly provided HH:MM:SS string
     heure_depart_str = heure_depart_souhaitee_str
+    nb_correspondances_max = int(nb_correspondances_max or 0)
+    date_voyage = date_voyage or None
 
     # --- 2. Exécuter recherche ---
     progress(0.1, desc="Finding potential destinations...")
-    destinations_candidates = trouver_destinations_par_temps(ville_depart, temps_trajet_max)
-    destinations_uniques_dict = {dest[1]: dest for dest in reversed(destinations_candidates)}
-    destinations_uniques_list = list(destinations_uniques_dict.values())
-
+    if nb_correspondances_max == 0:
+        destinations_candidates = trouver_destinations_par_temps(ville_depart, temps_trajet_max, date_voyage)
+    else:
+        # Avec correspondances : arrivée au plus tard `temps_trajet_max` après l'heure de départ souhaitée
+        trajets = obtenir_reseau(date_voyage).destinations_avec_correspondances(
+            ville_depart, heure_depart_str, temps_trajet_max, nb_correspondances_max, CORRESPONDANCE_MIN)
+        destinations_candidates = [resume for resume, _ in trajets]
+    destinations_uniques_list = destinations_uniques(destinations_candidates)
+
+    # Trajets directs : aller et dernier retour de chaque destination en une requête. Les villes sans retour
+    # le jour même sont écartées avant toute recherche de lieux, et l'itinéraire de visite tient dans le
+    # temps réellement disponible entre les deux trains.
+    fenetres, budgets = None, None
+    if nb_correspondances_max == 0:
+        fenetres = fenetres_sur_place(ville_depart, heure_depart_str, date_voyage)
+        budgets = {nom: min(temps_sur_place_min, fenetre) for nom, (_, _, fenetre) in fenetres.items()}
+        destinations_uniques_list = [dest for dest in destinations_uniques_list if budgets.get(dest[1], 0) > 0]
+
+    # Classement précalculé (precalcul.py, toutes dates confondues) pour les recherches sans correspondance
+    # ni date qu'il couvre ; sinon évaluation des destinations en direct.
+    top_destinations = classement_precalcule(ville_depart, temps_trajet_max, temps_sur_place_min, budgets) \
+        if nb_correspondances_max == 0 and date_voyage is None else None
+    if top_destinations is None:
+        top_destinations = yield from classer_destinations(destinations_uniques_list, temps_sur_place_min, progress,
+                                                           budgets)
     meilleure_destination_info, meilleur_itineraire_visite, max_score = None, [], -1
-
-    total_destinations = len(destinations_uniques_list)
-    for i, dest_info in enumerate(destinations_uniques_list):
-        ville_arrivee = dest_info[1] # Get the destination name
-        progress((i + 1) / total_destinations * 0.8 + 0.1, desc=f"Analyzing {ville_arrivee}...") # Progress from 0.1 to 0.9
-
-        lieux = get_lieux_touristiques(ville_arrivee)
-        if not lieux:
-            continue
-        lieux_tries = sorted(lieux, key=lambda x: x['score_pertinence'], reverse=True)
-        itineraire_ville, _ = creer_itineraire_visite_avec_trajet(lieux_tries, temps_sur_place_min)
-        score_actuel = len(itineraire_ville)
-        if score_actuel > max_score:
-            max_score, meilleure_destination_info, meilleur_itineraire_visite = score_actuel, dest_info, itineraire_ville
+    if top_destinations:
+        max_score, meilleure_destination_info, meilleur_itineraire_visite = top_destinations[0]
 
     progress(0.9, desc="Formatting results...")
     # --- 3. Formater les sorties pour Gradio ---
     if not meilleure_destination_info:
         resultat_md = "### Désolé, aucune destination trouvée...\n" \
                       "Aucune destination ne correspond à tous vos critères. Essayez d'augmenter le temps de trajet ou le temps sur place."
-        return resultat_md, None
+        yield resultat_md, None
+        return
 
     ville_recommandee = meilleure_destination_info[1]
-    train_aller = trouver_train_ideal(ville_depart, ville_recommandee, heure_depart_str)
+    if fenetres is not None:
+        train_aller = fenetres[ville_recommandee][0]
+        etapes_aller = [train_aller]
+    else:
+        train_aller, etapes_aller = trouver_trajet(ville_depart, ville_recommandee, heure_depart_str, nb_correspondances_max, date_voyage)
 
     if not train_aller:
         resultat_md = f"### Destination trouvée: {ville_recommandee}, mais...\n" \
                       f"Désolé, aucun train aller trouvé depuis {ville_depart} après {heure_depart_str}."
-        return resultat_md, None
+        yield resultat_md, None
+        return
 
     # Construction du texte de résultat en Markdown
     resultat_md = f"## 🏆 Votre Escapade Recommandée : **{ville_recommandee}**\n---\n"
 
     # Itinéraire détaillé
     resultat_md += "### 🚆 Itinéraire Détaillé\n"
-    resultat_md += f"**1. Train Aller**\n- Départ de **{train_aller[0]}** à **{train_aller[3]}**\n- Arrivée à **{train_aller[1]}** à **{train_aller[4]}**\n- *Durée : {train_aller[2]}*\n\n"
+    resultat_md += f"**1. Train Aller**\n- Départ de **{train_aller[0]}** à **{train_aller[3]}**\n- Arrivée à **{train_aller[1]}** à **{train_aller[4]}**\n- *Durée : {train_aller[2]}*\n"
+    resultat_md += formater_correspondances(etapes_aller) + "\n"
 
     resultat_md += "**2. Visite sur Place**\n"
     if meilleur_itineraire_visite:
@@ -228,16 +604,16 @@ def trouver_escapade(ville_depart, heure_depart_souhaitee_str, temps_trajet_max,
 
         for i, lieu in enumerate(meilleur_itineraire_visite):
             if i > 0:
-                temps_trajet_a_pied_min = lieu.get('trajet_depuis_precedent', 0)
+                temps_trajet_a_pied_min = lieu.trajet_depuis_precedent or 0
                 # Ensure addition with timedelta
                 heure_arrivee_lieu_dt = heure_actuelle_dt + timedelta(minutes=temps_trajet_a_pied_min)
                 resultat_md += f"- *🚶 Trajet à pied : ~{temps_trajet_a_pied_min} min (Arrivée estimée : {heure_arrivee_lieu_dt.strftime('%H:%M')})*\n"
                 heure_actuelle_dt = heure_arrivee_lieu_dt
 
-            temps_visite_lieu_min = lieu['temps_visite_min']
+            temps_visite_lieu_min = lieu.temps_visite_min
              # Ensure addition with timedelta
             heure_fin_visite_lieu_dt = heure_actuelle_dt + timedelta(minutes=temps_visite_lieu_min)
-            resultat_md += f"- 🏛️ Visite de **{lieu['nom']}** ({temps_visite_lieu_min} min). (Fin estimée : {heure_fin_visite_lieu_dt.strftime('%H:%M')})\n"
+            resultat_md += f"- 🏛️ Visite de **{lieu.nom}** ({temps_visite_lieu_min} min). (Fin estimée : {heure_fin_visite_lieu_dt.strftime('%H:%M')})\n"
             heure_actuelle_dt = heure_fin_visite_lieu_dt
 
         heure_fin_visite_totale_dt = heure_actuelle_dt
@@ -245,12 +621,14 @@ def trouver_escapade(ville_depart, heure_depart_souhaitee_str, temps_trajet_max,
          resultat_md += "     Aucun itinéraire de visite détaillé trouvé pour cette destination dans le temps imparti.\n"
          # If no visit itinerary is found, the end of the visit is just the arrival time + buffer
          heure_arrivee_aller_dt = datetime.strptime(train_aller[4], '%H:%M:%S')
-         heure_fin_visite_totale_dt = heure_arrivee_aller_dt + timedelta(minutes=30) # Add a small buffer
+         marge_min = 30 if fenetres is None else min(30, fenetres[ville_recommandee][2])
+         heure_fin_visite_totale_dt = heure_arrivee_aller_dt + timedelta(minutes=marge_min) # Add a small buffer
 
 
     # Calcul du train retour
     heure_min_depart_retour_str = heure_fin_visite_totale_dt.strftime('%H:%M:%S')
-    train_retour = trouver_train_ideal(ville_recommandee, ville_depart, heure_min_depart_retour_str)
+    train_retour, etapes_retour = trouver_trajet(ville_recommandee, ville_depart, heure_min_depart_retour_str, nb_correspondances_max,
+                                                  date_voyage)
 
 
     resultat_md += "\n**3. Train Retour**\n"
@@ -262,6 +640,7 @@ def trouver_escapade(ville_depart, heure_depart_souhaitee_str, temps_trajet_max,
              temps_trajet_retour_td += timedelta(days=1)
 
         resultat_md += f"- Départ de **{train_retour[0]}** à **{train_retour[3]}** ({heure_depart_retour_dt.strftime('%H:%M')})\n- Arrivée à **{train_retour[1]}** à **{train_retour[4]}** ({heure_arrivee_retour_dt.strftime('%H:%M')})\n- *Durée : {train_retour[2]}*\n"
+        resultat_md += formater_correspondances(etapes_retour)
 
         # Calcul du temps total
         heure_depart_aller_dt = datetime.strptime(train_aller[3], '%H:%M:%S') # Use departure time of the first train
@@ -279,52 +658,145 @@ def trouver_escapade(ville_depart, heure_depart_souhaitee_str, temps_trajet_max,
          resultat_md += f"- *Aucun train retour trouvé depuis {ville_recommandee} vers {ville_depart} après {heure_min_depart_retour_str}.*"
 
 
+    if len(top_destinations) > 1:
+        resultat_md += "\n\n### 🧭 Autres destinations possibles\n"
+        for score, dest_info, _ in top_destinations[1:]:
+            resultat_md += f"- **{dest_info[1]}** : {score} lieu(x) à visiter (trajet {dest_info[2]})\n"
+
+    yield resultat_md, None
+
     progress(0.95, desc="Generating map...")
     # Génération de la carte (returns Folium map object)
     carte_finale = generer_carte_recommandation(ville_depart, destinations_candidates, meilleur_itineraire_visite, ville_recommandee)
 
     progress(1.0, desc="Done!")
 
-    # Return the Markdown result and the Folium map object
-    return resultat_md, carte_finale
+    # Yield the Markdown result and the Folium map object
+    yield resultat_md, carte_finale
 
 
 # ==============================================================================
-# BLOC 4 : CRÉATION ET LANCEMENT DE L'INTERFACE GRADIO
+# BLOC 4 : INTERFACE GRADIO ET POINTS D'ENTRÉE
 # ==============================================================================
 
-with gr.Blocks(theme=gr.themes.Soft()) as demo:
-    gr.Markdown("# 🚄 Trouvez votre prochaine escapade en train")
-    gr.Markdown("Entrez vos critères de voyage pour obtenir une recommandation de destination et un itinéraire complet.")
-
-    with gr.Row():
-        with gr.Column(scale=1):
-            ville_depart_input = gr.Textbox(label="📍 Ville de départ", value="MARMANDE")
-            # Use gr.Textbox for time input
-            heure_depart_input = gr.Textbox(label="🕗 Heure de départ souhaitée (HH:MM:SS)", value="08:00:00", info="Format HH:MM:SS")
-            temps_trajet_max_input = gr.Textbox(label="🚆 Temps de trajet maximum", value="02:00:00", info="Format HH:MM:SS")
-            temps_sur_place_input = gr.Slider(label="⏳ Temps souhaité sur place (en heures)", minimum=1, maximum=12, step=0.5, value=5)
-            btn = gr.Button("Trouver mon escapade !", variant="primary")
-
-        with gr.Column(scale=2):
-            resultat_output = gr.Markdown(label="Votre Itinéraire Recommandé")
-            # Use gradio_folium.Folium to display the map object
-            carte_output = grf.Folium(label="Carte du Voyage")
-
-    btn.click(fn=trouver_escapade,
-              inputs=[ville_depart_input, heure_depart_input, temps_trajet_max_input, temps_sur_place_input],
-              outputs=[resultat_output, carte_output]) # carte_output is now a Folium component
-
-    gr.Examples(
-        examples=[
-            ["ANTIBES", "09:00:00", "02:00:00", 5],
-            ["NICE", "09:00:00", "01:30:00", 4],
-            ["BORDEAUX ST JEAN", "07:30:00", "02:00:00", 8],
-            ["MARSEILLE ST CHARLES", "10:00:00", "01:45:00", 5]
-        ],
-        inputs=[ville_depart_input, heure_depart_input, temps_trajet_max_input, temps_sur_place_input],
-    )
-
-print("🚀 Lancement de l'interface Gradio...")
-# share=True crée un lien public temporaire pour partager votre application
-demo.launch(debug=True, share=True)
+def construire_interface():
+    """Interface Gradio (non lancée) ; l'index des gares est ouvert pour l'autocomplétion."""
+    import gradio as gr
+    import gradio_folium as grf
+
+    index_gares = obtenir_index_gares()
+
+    def suggerer_gares(saisie: gr.KeyUpData):
+        """Suggestions de gares pour la saisie en cours de la ville de départ."""
+        return gr.update(choices=index_gares.completer(saisie.input_value))
+
+    def rechercher(ville_depart, heure_depart_souhaitee_str, temps_trajet_max, temps_sur_place_heures, nb_correspondances_max=0, date_voyage="", progress=gr.Progress()):
+        date_voyage = date_voyage.strip() or None
+        if date_invalide(date_voyage):
+            yield f"### Date invalide : {date_voyage}\n" \
+                  "Indiquez la date du voyage au format AAAA-MM-JJ (par exemple 2024-05-02), ou laissez le champ vide " \
+                  "pour chercher sur toutes les dates.", None
+            return
+        yield from trouver_escapade_en_flux(ville_depart, heure_depart_souhaitee_str, temps_trajet_max,
+                                            temps_sur_place_heures, nb_correspondances_max, date_voyage, progress)
+
+    with gr.Blocks(theme=gr.themes.Soft()) as demo:
+        gr.Markdown("# 🚄 Trouvez votre prochaine escapade en train")
+        gr.Markdown("Entrez vos critères de voyage pour obtenir une recommandation de destination et un itinéraire complet.")
+
+        with gr.Row():
+            with gr.Column(scale=1):
+                # Saisie libre avec suggestions de l'index des gares, mises à jour à chaque touche.
+                ville_depart_input = gr.Dropdown(label="📍 Ville de départ", value="MARMANDE", choices=["MARMANDE"],
+                                                 allow_custom_value=True, filterable=True)
+                # Use gr.Textbox for time input
+                heure_depart_input = gr.Textbox(label="🕗 Heure de départ souhaitée (HH:MM:SS)", value="08:00:00", info="Format HH:MM:SS")
+                temps_trajet_max_input = gr.Textbox(label="🚆 Temps de trajet maximum", value="02:00:00", info="Format HH:MM:SS")
+                temps_sur_place_input = gr.Slider(label="⏳ Temps souhaité sur place (en heures)", minimum=1, maximum=12, step=0.5, value=5)
+                correspondances_input = gr.Slider(label="🔁 Correspondances maximum", minimum=0, maximum=2, step=1, value=0, info="0 = trains directs uniquement")
+                date_voyage_input = gr.Textbox(label="📅 Date du voyage", value="", info="Format AAAA-MM-JJ, vide = toutes les dates")
+                btn = gr.Button("Trouver mon escapade !", variant="primary")
+
+            with gr.Column(scale=2):
+                resultat_output = gr.Markdown(label="Votre Itinéraire Recommandé")
+                # Use gradio_folium.Folium to display the map object
+                carte_output = grf.Folium(label="Carte du Voyage")
+
+        if index_gares is not None:
+            ville_depart_input.key_up(fn=suggerer_gares, inputs=None, outputs=ville_depart_input,
+                                      queue=False, show_progress="hidden")
+
+        # Générateur : Gradio affiche chaque étape (classement provisoire, itinéraire, carte) dès qu'elle est produite.
+        btn.click(fn=rechercher,
+                  inputs=[ville_depart_input, heure_depart_input, temps_trajet_max_input, temps_sur_place_input, correspondances_input,
+                          date_voyage_input],
+                  outputs=[resultat_output, carte_output]) # carte_output is now a Folium component
+
+        gr.Examples(
+            examples=[
+                ["ANTIBES", "09:00:00", "02:00:00", 5],
+                ["NICE", "09:00:00", "01:30:00", 4],
+                ["BORDEAUX ST JEAN", "07:30:00", "02:00:00", 8],
+                ["MARSEILLE ST CHARLES", "10:00:00", "01:45:00", 5]
+            ],
+            inputs=[ville_depart_input, heure_depart_input, temps_trajet_max_input, temps_sur_place_input],
+        )
+    return demo
+
+def servir(partage=True, hote=None, port=None, debug=True):
+    """Ouvre les ressources, démarre le serveur de métriques et lance l'interface (bloquant)."""
+    obtenir_pool()
+    obtenir_moteur()
+    if PORT_METRIQUES:
+        try:
+            traces.demarrer_serveur_metriques(PORT_METRIQUES, HOTE_METRIQUES)
+            print(f"📈 Métriques sur http://{HOTE_METRIQUES}:{PORT_METRIQUES}/metrics.")
+        except OSError as e:
+            print(f"❌ Serveur de métriques indisponible : {e}")
+    demo = construire_interface().queue(default_concurrency_limit=CONCURRENCE_INTERFACE)
+    print("🚀 Lancement de l'interface Gradio...")
+    # share=True crée un lien public temporaire pour partager votre application
+    demo.launch(debug=debug, share=partage, server_name=hote, server_port=port)
+
+def chercher(ville_depart, heure_depart_souhaitee_str="08:00:00", temps_trajet_max="02:00:00", temps_sur_place_heures=5,
+             nb_correspondances_max=0, chemin_carte=None, date_voyage=None):
+    """Recherche hors interface : renvoie le markdown du résultat, écrit la carte en HTML si demandé."""
+    resultat_md, carte_finale = trouver_escapade(ville_depart, heure_depart_souhaitee_str, temps_trajet_max,
+                                                 temps_sur_place_heures, nb_correspondances_max, date_voyage)
+    if chemin_carte and carte_finale is not None:
+        carte_finale.save(chemin_carte)
+    return resultat_md
+
+def argument_date(texte):
+    """Type argparse de `--date` : la date telle que saisie, refusée si elle n'est pas au format 'AAAA-MM-JJ'."""
+    if date_invalide(texte):
+        raise argparse.ArgumentTypeError(f"date invalide : {texte!r} (format AAAA-MM-JJ)")
+    return texte
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Escapades en train TGVmax : interface Gradio ou recherche en ligne de commande.")
+    commandes = parser.add_subparsers(dest="commande")
+
+    serveur = commandes.add_parser("servir", help="lancer l'interface Gradio (commande par défaut)")
+    serveur.add_argument("--hote", help="adresse d'écoute (défaut de Gradio : 127.0.0.1)")
+    serveur.add_argument("--port", type=int, help="port de l'interface (défaut de Gradio : 7860)")
+    serveur.add_argument("--sans-partage", action="store_true", help="pas de lien public temporaire")
+
+    recherche = commandes.add_parser("chercher", help="afficher une escapade en markdown")
+    recherche.add_argument("ville_depart")
+    recherche.add_argument("--heure", default="08:00:00", help="heure de départ souhaitée (HH:MM:SS)")
+    recherche.add_argument("--temps-max", default="02:00:00", help="temps de trajet maximum (HH:MM:SS)")
+    recherche.add_argument("--sur-place", type=float, default=5, help="heures sur place")
+    recherche.add_argument("--correspondances", type=int, default=0, help="correspondances maximum")
+    recherche.add_argument("--carte", help="fichier HTML où écrire la carte")
+    recherche.add_argument("--date", type=argument_date, help="date du voyage (AAAA-MM-JJ, défaut : toutes les dates)")
+    args = parser.parse_args()
+
+    if args.commande == "chercher":
+        print(chercher(args.ville_depart, args.heure, args.temps_max, args.sur_place, args.correspondances, args.carte,
+                       args.date))
+    elif args.commande == "servir":
+        servir(partage=not args.sans_partage, hote=args.hote, port=args.port)
+    else:
+        servir()
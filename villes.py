@@ -0,0 +1,27 @@
+"""Normalisation des noms de villes et de gares."""
+
+import re
+import string
+
+# SQLite LOWER() ne passe en minuscules que les lettres ASCII : on fait de même.
+_MINUSCULES_ASCII = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+# Motifs de `clean_city_name`, compilés une fois pour toutes.
+_MENTION_FINALE = re.compile(r'\s*\([^)]*\)$')
+_SUFFIXE_GARE = re.compile(r'\s*(ST JEAN|MATABIAU|VILLE BOURBON|ST CHARLES|PART DIEU|SAINT LAUD|MONTPARNASSE|EST|NORD|LYON|AUSTERLITZ)\s*$', re.IGNORECASE)
+
+
+def clean_city_name(city_name):
+    """Nettoie le nom d'une ville en supprimant les mentions comme '(intramuros)' et les gares."""
+    if not isinstance(city_name, str):
+        return ""
+    cleaned_name = _MENTION_FINALE.sub('', city_name).strip()
+    cleaned_name = _SUFFIXE_GARE.sub('', cleaned_name).strip()
+    if cleaned_name.lower() == "toulouse":
+        return "TOULOUSE"
+    return cleaned_name
+
+
+def minuscules_ascii(texte):
+    """Équivalent Python de LOWER() de SQLite (seules les lettres ASCII sont converties)."""
+    return texte.translate(_MINUSCULES_ASCII)